@@ -1,10 +1,15 @@
 """多智能体旅行规划系统"""
 
 import json
-from typing import Dict, Any, List
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from hello_agents import SimpleAgent
-from hello_agents.tools import MCPTool
 from ..services.llm_service import get_llm
+from ..services.amap_service import get_amap_mcp_tool, get_amap_service
+from ..services.plan_cache import get_plan_cache, is_cacheable, make_plan_cache_key, redate_plan
 from ..models.schemas import TripRequest, TripPlan, DayPlan, Attraction, Meal, WeatherInfo, Location, Hotel
 from ..config import get_settings
 
@@ -152,6 +157,15 @@ PLANNER_AGENT_PROMPT = """你是行程规划专家。你的任务是根据景点
 """
 
 
+@dataclass
+class StageAgents:
+    """一次规划使用的一组Agent"""
+    attraction: SimpleAgent
+    weather: SimpleAgent
+    hotel: SimpleAgent
+    planner: SimpleAgent
+
+
 class MultiAgentTripPlanner:
     """多智能体旅行规划系统"""
 
@@ -163,62 +177,79 @@ class MultiAgentTripPlanner:
             settings = get_settings()
             self.llm = get_llm()
 
-            # 创建共享的MCP工具(只创建一次)
-            print("  - 创建共享MCP工具...")
-            self.amap_tool = MCPTool(
-                name="amap",
-                description="高德地图服务",
-                server_command=["uvx", "amap-mcp-server"],
-                env={"AMAP_MAPS_API_KEY": settings.amap_api_key},
-                auto_expand=True
+            # 并行执行配置: 景点/天气/酒店三个Agent互不依赖,可以同时运行
+            self.parallel_enabled = settings.agent_parallel_enabled
+            self.stage_timeout = settings.agent_stage_timeout
+            # 每次规划3个阶段,最多agent_max_concurrency个规划同时进行
+            self._executor = ThreadPoolExecutor(
+                max_workers=3 * max(1, settings.agent_max_concurrency),
+                thread_name_prefix="trip-agent"
             )
 
-            # 创建景点搜索Agent
-            print("  - 创建景点搜索Agent...")
-            self.attraction_agent = SimpleAgent(
-                name="景点搜索专家",
-                llm=self.llm,
-                system_prompt=ATTRACTION_AGENT_PROMPT
-            )
-            self.attraction_agent.add_tool(self.amap_tool)
-
-            # 创建天气查询Agent
-            print("  - 创建天气查询Agent...")
-            self.weather_agent = SimpleAgent(
-                name="天气查询专家",
-                llm=self.llm,
-                system_prompt=WEATHER_AGENT_PROMPT
-            )
-            self.weather_agent.add_tool(self.amap_tool)
-
-            # 创建酒店推荐Agent
-            print("  - 创建酒店推荐Agent...")
-            self.hotel_agent = SimpleAgent(
-                name="酒店推荐专家",
-                llm=self.llm,
-                system_prompt=HOTEL_AGENT_PROMPT
-            )
-            self.hotel_agent.add_tool(self.amap_tool)
-
-            # 创建行程规划Agent(不需要工具)
-            print("  - 创建行程规划Agent...")
-            self.planner_agent = SimpleAgent(
-                name="行程规划专家",
-                llm=self.llm,
-                system_prompt=PLANNER_AGENT_PROMPT
-            )
+            # 旅行计划缓存: 相同城市/天数/交通/住宿/偏好的请求复用已生成的行程
+            self.plan_cache = get_plan_cache() if settings.plan_cache_enabled else None
+            self.plan_cache_ttl = settings.plan_cache_ttl
+
+            # 获取共享的MCP工具(与地图服务共用同一个MCP连接池)
+            print("  - 获取共享MCP工具...")
+            self.amap_tool = get_amap_mcp_tool()
+
+            # 各Agent在每次规划时重新创建(共用LLM和MCP工具),
+            # 这里先创建一组用于校验配置
+            print("  - 创建景点/天气/酒店/行程规划Agent...")
+            agents = self._create_agents()
 
             print(f"✅ 多智能体系统初始化成功")
-            print(f"   景点搜索Agent: {len(self.attraction_agent.list_tools())} 个工具")
-            print(f"   天气查询Agent: {len(self.weather_agent.list_tools())} 个工具")
-            print(f"   酒店推荐Agent: {len(self.hotel_agent.list_tools())} 个工具")
+            print(f"   景点搜索Agent: {len(agents.attraction.list_tools())} 个工具")
+            print(f"   天气查询Agent: {len(agents.weather.list_tools())} 个工具")
+            print(f"   酒店推荐Agent: {len(agents.hotel.list_tools())} 个工具")
 
         except Exception as e:
             print(f"❌ 多智能体系统初始化失败: {str(e)}")
             import traceback
             traceback.print_exc()
             raise
-    
+
+    def _create_agents(self) -> StageAgents:
+        """
+        创建一次规划使用的Agent
+
+        SimpleAgent会在实例中保存对话历史,并发的规划请求如果共用同一组Agent,
+        历史会互相穿插,因此每次规划都使用独立的Agent。
+
+        Returns:
+            景点/天气/酒店/行程规划Agent
+        """
+        attraction_agent = SimpleAgent(
+            name="景点搜索专家",
+            llm=self.llm,
+            system_prompt=ATTRACTION_AGENT_PROMPT
+        )
+        attraction_agent.add_tool(self.amap_tool)
+
+        weather_agent = SimpleAgent(
+            name="天气查询专家",
+            llm=self.llm,
+            system_prompt=WEATHER_AGENT_PROMPT
+        )
+        weather_agent.add_tool(self.amap_tool)
+
+        hotel_agent = SimpleAgent(
+            name="酒店推荐专家",
+            llm=self.llm,
+            system_prompt=HOTEL_AGENT_PROMPT
+        )
+        hotel_agent.add_tool(self.amap_tool)
+
+        # 行程规划Agent不需要工具
+        planner_agent = SimpleAgent(
+            name="行程规划专家",
+            llm=self.llm,
+            system_prompt=PLANNER_AGENT_PROMPT
+        )
+
+        return StageAgents(attraction_agent, weather_agent, hotel_agent, planner_agent)
+
     def plan_trip(self, request: TripRequest) -> TripPlan:
         """
         使用多智能体协作生成旅行计划
@@ -238,32 +269,31 @@ class MultiAgentTripPlanner:
             print(f"偏好: {', '.join(request.preferences) if request.preferences else '无'}")
             print(f"{'='*60}\n")
 
-            # 步骤1: 景点搜索Agent搜索景点
-            print("📍 步骤1: 搜索景点...")
-            attraction_query = self._build_attraction_query(request)
-            attraction_response = self.attraction_agent.run(attraction_query)
-            print(f"景点搜索结果: {attraction_response[:200]}...\n")
+            # 命中计划缓存时只需平移日期并刷新天气
+            cached_plan = self._get_cached_plan(request)
+            if cached_plan is not None:
+                return cached_plan
 
-            # 步骤2: 天气查询Agent查询天气
-            print("🌤️  步骤2: 查询天气...")
-            weather_query = f"请查询{request.city}的天气信息"
-            weather_response = self.weather_agent.run(weather_query)
-            print(f"天气查询结果: {weather_response[:200]}...\n")
+            agents = self._create_agents()
 
-            # 步骤3: 酒店推荐Agent搜索酒店
-            print("🏨 步骤3: 搜索酒店...")
-            hotel_query = f"请搜索{request.city}的{request.accommodation}酒店"
-            hotel_response = self.hotel_agent.run(hotel_query)
-            print(f"酒店搜索结果: {hotel_response[:200]}...\n")
+            # 步骤1-3: 景点/天气/酒店信息收集(互不依赖)
+            attraction_response, weather_response, hotel_response = self._gather_info(request, agents)
 
             # 步骤4: 行程规划Agent整合信息生成计划
             print("📋 步骤4: 生成行程计划...")
             planner_query = self._build_planner_query(request, attraction_response, weather_response, hotel_response)
-            planner_response = self.planner_agent.run(planner_query)
+            planner_response = agents.planner.run(planner_query)
             print(f"行程规划结果: {planner_response[:300]}...\n")
 
-            # 解析最终计划
-            trip_plan = self._parse_response(planner_response, request)
+            # 解析最终计划(只缓存解析成功的计划,不缓存备用计划)
+            try:
+                trip_plan = self._extract_plan(planner_response)
+            except Exception as e:
+                print(f"⚠️  解析响应失败: {str(e)}")
+                print(f"   将使用备用方案生成计划")
+                return self._create_fallback_plan(request)
+
+            self._store_cached_plan(request, trip_plan)
 
             print(f"{'='*60}")
             print(f"✅ 旅行计划生成完成!")
@@ -277,6 +307,195 @@ class MultiAgentTripPlanner:
             traceback.print_exc()
             return self._create_fallback_plan(request)
     
+    def plan_trip_stream(
+        self,
+        request: TripRequest,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式生成旅行计划,每完成一个阶段产出一个进度事件
+
+        事件类型:
+            - stage: 景点/天气/酒店阶段完成 {"stage", "status", "preview"}
+            - planner_token: 行程规划Agent输出的文本片段 {"delta"}
+            - plan: 最终旅行计划 {"data", "cached", "fallback"}
+            - cancelled: 客户端断开,剩余阶段已取消
+
+        Args:
+            request: 旅行请求
+            cancel_event: 取消信号(客户端断开时设置)
+
+        Yields:
+            进度事件字典
+        """
+        cancel_event = cancel_event or threading.Event()
+
+        def cancelled() -> Dict[str, Any]:
+            print("⚠️  客户端已断开,取消剩余规划阶段")
+            return {"event": "cancelled"}
+
+        cached_plan = self._get_cached_plan(request)
+        if cached_plan is not None:
+            yield {"event": "plan", "data": cached_plan.model_dump(), "cached": True, "fallback": False}
+            return
+
+        agents = self._create_agents()
+
+        # 步骤1-3: 信息收集,每个阶段完成时推送进度
+        results: Dict[str, str] = {}
+        for name, _, response, ok in self._iter_info_results(request, agents, cancel_event):
+            results[name] = response
+            yield {
+                "event": "stage",
+                "stage": name,
+                "status": "done" if ok else "failed",
+                "preview": response[:200]
+            }
+
+        if cancel_event.is_set():
+            yield cancelled()
+            return
+
+        # 步骤4: 行程规划Agent,逐片段推送LLM输出
+        print("📋 步骤4: 生成行程计划(流式)...")
+        planner_query = self._build_planner_query(
+            request, results["attractions"], results["weather"], results["hotels"]
+        )
+        chunks = []
+        for chunk in agents.planner.stream_run(planner_query):
+            if cancel_event.is_set():
+                yield cancelled()
+                return
+            chunks.append(chunk)
+            yield {"event": "planner_token", "delta": chunk}
+
+        try:
+            trip_plan = self._extract_plan("".join(chunks))
+        except Exception as e:
+            print(f"⚠️  解析响应失败: {str(e)}")
+            print(f"   将使用备用方案生成计划")
+            yield {"event": "plan", "data": self._create_fallback_plan(request).model_dump(), "cached": False, "fallback": True}
+            return
+
+        self._store_cached_plan(request, trip_plan)
+        yield {"event": "plan", "data": trip_plan.model_dump(), "cached": False, "fallback": False}
+
+    def _build_info_queries(
+        self,
+        request: TripRequest,
+        agents: StageAgents
+    ) -> List[Tuple[str, str, SimpleAgent, str]]:
+        """构建三个信息收集阶段: (阶段名, 显示标签, Agent, 查询)"""
+        return [
+            ("attractions", "📍 景点搜索", agents.attraction, self._build_attraction_query(request)),
+            ("weather", "🌤️  天气查询", agents.weather, f"请查询{request.city}的天气信息"),
+            ("hotels", "🏨 酒店搜索", agents.hotel, f"请搜索{request.city}的{request.accommodation}酒店"),
+        ]
+
+    def _gather_info(self, request: TripRequest, agents: StageAgents) -> Tuple[str, str, str]:
+        """
+        收集景点/天气/酒店信息
+
+        Args:
+            request: 旅行请求
+            agents: 本次规划使用的Agent
+
+        Returns:
+            (景点信息, 天气信息, 酒店信息)
+        """
+        results = {name: response for name, _, response, _ in self._iter_info_results(request, agents)}
+        return results["attractions"], results["weather"], results["hotels"]
+
+    def _iter_info_results(
+        self,
+        request: TripRequest,
+        agents: StageAgents,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Iterator[Tuple[str, str, str, bool]]:
+        """
+        执行景点/天气/酒店Agent,每完成一个阶段就产出一个结果
+
+        并行模式下三个Agent同时运行(fan-out),按完成先后产出结果(fan-in);
+        每个阶段都有独立的超时时间,从该阶段开始执行时计时(不含在线程池中排队的时间),
+        失败或超时的阶段用占位说明代替,
+        行程规划Agent仍然可以基于其余信息生成计划。
+
+        Args:
+            request: 旅行请求
+            agents: 本次规划使用的Agent
+            cancel_event: 取消信号(客户端断开时设置),设置后不再等待剩余阶段
+
+        Yields:
+            (阶段名, 显示标签, 结果文本, 是否成功)
+        """
+        stages = self._build_info_queries(request, agents)
+
+        if not self.parallel_enabled:
+            for step, (name, label, agent, query) in enumerate(stages, start=1):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                print(f"{label} (步骤{step})...")
+                response = agent.run(query)
+                print(f"{label}结果: {response[:200]}...\n")
+                yield name, label, response, True
+            return
+
+        print(f"⚡ 步骤1-3: 并行执行 {len(stages)} 个信息收集Agent (超时 {self.stage_timeout}s)...")
+        started = time.monotonic()
+        stage_started: Dict[str, float] = {}
+
+        def run_stage(name: str, agent: SimpleAgent, query: str) -> str:
+            stage_started[name] = time.monotonic()
+            return agent.run(query)
+
+        pending = {
+            self._executor.submit(run_stage, name, agent, query): (name, label)
+            for name, label, agent, query in stages
+        }
+
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    print("⚠️  请求已取消,停止等待信息收集Agent")
+                    return
+
+                # 已开始的阶段从开始执行时计时;仍在排队的阶段多给一个超时周期,
+                # 避免线程池被卡住的Agent占满时无限等待
+                now = time.monotonic()
+                deadlines = {
+                    future: stage_started.get(name, started + self.stage_timeout) + self.stage_timeout
+                    for future, (name, _) in pending.items()
+                }
+                for future, deadline in deadlines.items():
+                    if deadline > now or future.done():
+                        continue
+                    # 线程无法被强制终止,这里只是不再等待它的结果
+                    future.cancel()
+                    name, label = pending.pop(future)
+                    print(f"⚠️  {label}超时({self.stage_timeout}s),使用部分结果继续规划")
+                    yield name, label, f"({label}超时,暂无相关信息,请根据常识合理安排)", False
+                if not pending:
+                    break
+
+                # 分段等待以便及时响应取消信号
+                remaining = min([0.5] + [deadline - now for deadline in deadlines.values() if deadline > now])
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, label = pending.pop(future)
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        print(f"⚠️  {label}失败: {str(e)},使用部分结果继续规划")
+                        yield name, label, f"({label}失败,暂无相关信息,请根据常识合理安排)", False
+                        continue
+                    print(f"{label}结果: {response[:200]}...\n")
+                    yield name, label, response, True
+        finally:
+            for future in pending:
+                future.cancel()
+
+        print(f"⏱️  信息收集耗时: {time.monotonic() - started:.2f}s\n")
+
     def _build_attraction_query(self, request: TripRequest) -> str:
         """构建景点搜索查询 - 直接包含工具调用"""
         keywords = []
@@ -324,6 +543,80 @@ class MultiAgentTripPlanner:
 
         return query
     
+    def _get_cached_plan(self, request: TripRequest) -> Optional[TripPlan]:
+        """
+        查询计划缓存,命中时把计划平移到请求日期并刷新实时天气
+
+        Args:
+            request: 旅行请求
+
+        Returns:
+            旅行计划,未命中时返回None
+        """
+        if self.plan_cache is None or not is_cacheable(request):
+            return None
+
+        cached = self.plan_cache.get(make_plan_cache_key(request), namespace="trip_plan")
+        if cached is None:
+            return None
+
+        print("⚡ 命中旅行计划缓存,平移日期并刷新天气...")
+        try:
+            weather_info = get_amap_service().get_weather(request.city)
+        except Exception as e:
+            print(f"⚠️  实时天气查询失败: {str(e)}")
+            weather_info = []
+
+        trip_plan = redate_plan(cached, request, weather_info)
+
+        print(f"{'='*60}")
+        print(f"✅ 旅行计划生成完成(缓存)!")
+        print(f"{'='*60}\n")
+        return trip_plan
+
+    def _store_cached_plan(self, request: TripRequest, trip_plan: TripPlan):
+        """把新生成的计划写入缓存"""
+        if self.plan_cache is None or not is_cacheable(request):
+            return
+        self.plan_cache.set(make_plan_cache_key(request), trip_plan.model_copy(deep=True), self.plan_cache_ttl)
+
+    def _extract_plan(self, response: str) -> TripPlan:
+        """
+        从Agent响应中提取旅行计划
+
+        Args:
+            response: Agent响应文本
+
+        Returns:
+            旅行计划
+
+        Raises:
+            ValueError: 响应中没有可解析的计划
+        """
+        # 尝试从响应中提取JSON
+        # 查找JSON代码块
+        if "```json" in response:
+            json_start = response.find("```json") + 7
+            json_end = response.find("```", json_start)
+            json_str = response[json_start:json_end].strip()
+        elif "```" in response:
+            json_start = response.find("```") + 3
+            json_end = response.find("```", json_start)
+            json_str = response[json_start:json_end].strip()
+        elif "{" in response and "}" in response:
+            # 直接查找JSON对象
+            json_start = response.find("{")
+            json_end = response.rfind("}") + 1
+            json_str = response[json_start:json_end]
+        else:
+            raise ValueError("响应中未找到JSON数据")
+
+        # 解析JSON
+        data = json.loads(json_str)
+
+        # 转换为TripPlan对象
+        return TripPlan(**data)
+
     def _parse_response(self, response: str, request: TripRequest) -> TripPlan:
         """
         解析Agent响应
@@ -336,31 +629,7 @@ class MultiAgentTripPlanner:
             旅行计划
         """
         try:
-            # 尝试从响应中提取JSON
-            # 查找JSON代码块
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "```" in response:
-                json_start = response.find("```") + 3
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "{" in response and "}" in response:
-                # 直接查找JSON对象
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-            else:
-                raise ValueError("响应中未找到JSON数据")
-            
-            # 解析JSON
-            data = json.loads(json_str)
-            
-            # 转换为TripPlan对象
-            trip_plan = TripPlan(**data)
-            
-            return trip_plan
+            return self._extract_plan(response)
             
         except Exception as e:
             print(f"⚠️  解析响应失败: {str(e)}")
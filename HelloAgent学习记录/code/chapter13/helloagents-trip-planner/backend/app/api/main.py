@@ -3,6 +3,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from ..config import get_settings, validate_config, print_config
+from ..services.executor import run_blocking, shutdown_executors
+from ..services.amap_service import get_amap_service, shutdown_amap_mcp_pool
 from .routes import trip, poi, map as map_routes
 
 # 获取配置
@@ -50,6 +52,13 @@ async def startup_event():
         print(f"\n❌ 配置验证失败:\n{e}")
         print("\n请检查.env文件并确保所有必要的配置项都已设置")
         raise
+
+    # 预热高德MCP连接池: 启动子进程是阻塞操作,放到执行器中完成,避免第一个请求承担启动耗时
+    try:
+        await run_blocking(get_amap_service)
+        print("✅ 高德地图MCP连接池预热完成")
+    except Exception as e:
+        print(f"⚠️  高德地图MCP连接池预热失败,将在首次请求时重试: {e}")
     
     print("\n" + "="*60)
     print("📚 API文档: http://localhost:8000/docs")
@@ -62,6 +71,8 @@ async def shutdown_event():
     """应用关闭事件"""
     print("\n" + "="*60)
     print("👋 应用正在关闭...")
+    shutdown_executors()
+    shutdown_amap_mcp_pool()
     print("="*60 + "\n")
 
 
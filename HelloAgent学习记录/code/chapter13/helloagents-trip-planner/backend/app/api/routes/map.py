@@ -9,7 +9,8 @@ from ...models.schemas import (
     RouteResponse,
     WeatherResponse
 )
-from ...services.amap_service import get_amap_service
+from ...services.amap_service import get_amap_service_async, get_amap_cache
+from ...config import get_settings
 
 router = APIRouter(prefix="/map", tags=["地图服务"])
 
@@ -38,10 +39,10 @@ async def search_poi(
     """
     try:
         # 获取服务实例
-        service = get_amap_service()
+        service = await get_amap_service_async()
         
         # 搜索POI
-        pois = service.search_poi(keywords, city, citylimit)
+        pois = await service.search_poi_async(keywords, city, citylimit)
         
         return POISearchResponse(
             success=True,
@@ -77,10 +78,10 @@ async def get_weather(
     """
     try:
         # 获取服务实例
-        service = get_amap_service()
+        service = await get_amap_service_async()
         
         # 查询天气
-        weather_info = service.get_weather(city)
+        weather_info = await service.get_weather_async(city)
         
         return WeatherResponse(
             success=True,
@@ -114,10 +115,10 @@ async def plan_route(request: RouteRequest):
     """
     try:
         # 获取服务实例
-        service = get_amap_service()
+        service = await get_amap_service_async()
         
         # 规划路线
-        route_info = service.plan_route(
+        route_info = await service.plan_route_async(
             origin_address=request.origin_address,
             destination_address=request.destination_address,
             origin_city=request.origin_city,
@@ -139,6 +140,19 @@ async def plan_route(request: RouteRequest):
         )
 
 
+@router.get(
+    "/cache/stats",
+    summary="缓存统计",
+    description="查看高德地图调用缓存的命中/未命中/淘汰统计"
+)
+async def cache_stats():
+    """缓存统计"""
+    return {
+        "enabled": get_settings().amap_cache_enabled,
+        "stats": get_amap_cache().stats()
+    }
+
+
 @router.get(
     "/health",
     summary="健康检查",
@@ -148,12 +162,13 @@ async def health_check():
     """健康检查"""
     try:
         # 检查服务是否可用
-        service = get_amap_service()
+        service = await get_amap_service_async()
         
         return {
             "status": "healthy",
             "service": "map-service",
-            "mcp_tools_count": len(service.mcp_tool._available_tools)
+            "mcp_tools_count": len(service.mcp_tool._available_tools),
+            "mcp_pool": service.mcp_tool.pool.stats()
         }
     except Exception as e:
         raise HTTPException(
@@ -3,7 +3,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from ...services.amap_service import get_amap_service
+from ...config import get_settings
+from ...models.schemas import TripPlan
+from ...services.amap_service import get_amap_service_async
 from ...services.unsplash_service import get_unsplash_service
 
 router = APIRouter(prefix="/poi", tags=["POI"])
@@ -33,10 +35,10 @@ async def get_poi_detail(poi_id: str):
         POI详情响应
     """
     try:
-        amap_service = get_amap_service()
+        amap_service = await get_amap_service_async()
         
         # 调用高德地图POI详情API
-        result = amap_service.get_poi_detail(poi_id)
+        result = await amap_service.get_poi_detail_async(poi_id)
         
         return POIDetailResponse(
             success=True,
@@ -69,8 +71,8 @@ async def search_poi(keywords: str, city: str = "北京"):
         搜索结果
     """
     try:
-        amap_service = get_amap_service()
-        result = amap_service.search_poi(keywords, city)
+        amap_service = await get_amap_service_async()
+        result = await amap_service.search_poi_async(keywords, city)
 
         return {
             "success": True,
@@ -104,19 +106,15 @@ async def get_attraction_photo(name: str):
     try:
         unsplash_service = get_unsplash_service()
 
-        # 搜索景点图片
-        photo_url = unsplash_service.get_photo_url(f"{name} China landmark")
-
-        if not photo_url:
-            # 如果没找到,尝试只用景点名称搜索
-            photo_url = unsplash_service.get_photo_url(name)
+        # 搜索景点图片(带缓存, 依次尝试 "<名称> China landmark" 和 "<名称>")
+        photo = await unsplash_service.resolve_attraction_photo_async(name)
 
         return {
             "success": True,
             "message": "获取图片成功",
             "data": {
                 "name": name,
-                "photo_url": photo_url
+                "photo_url": photo.get("url") if photo else None
             }
         }
 
@@ -127,3 +125,58 @@ async def get_attraction_photo(name: str):
             detail=f"获取景点图片失败: {str(e)}"
         )
 
+
+
+@router.post(
+    "/photos/batch",
+    summary="批量获取景点图片",
+    description="一次性获取旅行计划中所有景点的图片"
+)
+async def get_trip_photos(trip_plan: TripPlan):
+    """
+    批量获取景点图片
+
+    Args:
+        trip_plan: 旅行计划
+
+    Returns:
+        景点名称 -> 图片URL
+    """
+    try:
+        unsplash_service = get_unsplash_service()
+
+        names = [
+            attraction.name
+            for day in trip_plan.days
+            for attraction in day.attractions
+        ]
+        photos = await unsplash_service.resolve_attraction_photos_async(
+            names,
+            concurrency=get_settings().unsplash_batch_concurrency
+        )
+
+        return {
+            "success": True,
+            "message": "获取图片成功",
+            "data": {
+                name: photo.get("url") if photo else None
+                for name, photo in photos.items()
+            }
+        }
+
+    except Exception as e:
+        print(f"❌ 批量获取景点图片失败: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"批量获取景点图片失败: {str(e)}"
+        )
+
+
+@router.get(
+    "/photos/cache/stats",
+    summary="图片缓存统计",
+    description="查看景点图片缓存的命中统计"
+)
+async def photo_cache_stats():
+    """图片缓存统计"""
+    return get_unsplash_service().cache.stats()
@@ -1,12 +1,18 @@
 """旅行规划API路由"""
 
+import json
+import threading
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from ...models.schemas import (
     TripRequest,
     TripPlanResponse,
     ErrorResponse
 )
 from ...agents.trip_planner_agent import get_trip_planner_agent
+from ...services.executor import run_agent, run_blocking, stream_agent
+from ...services.plan_cache import get_plan_cache
+from ...config import get_settings
 
 router = APIRouter(prefix="/trip", tags=["旅行规划"])
 
@@ -35,13 +41,13 @@ async def plan_trip(request: TripRequest):
         print(f"   天数: {request.travel_days}")
         print(f"{'='*60}\n")
 
-        # 获取Agent实例
+        # 获取Agent实例(首次调用会启动MCP服务,同样放到执行器中)
         print("🔄 获取多智能体系统实例...")
-        agent = get_trip_planner_agent()
+        agent = await run_agent(get_trip_planner_agent)
 
-        # 生成旅行计划
+        # 生成旅行计划(在有界Agent执行器中运行,不阻塞事件循环)
         print("🚀 开始生成旅行计划...")
-        trip_plan = agent.plan_trip(request)
+        trip_plan = await run_agent(agent.plan_trip, request)
 
         print("✅ 旅行计划生成成功,准备返回响应\n")
 
@@ -61,6 +67,66 @@ async def plan_trip(request: TripRequest):
         )
 
 
+@router.post(
+    "/plan/stream",
+    summary="流式生成旅行计划",
+    description="以SSE事件流的形式推送规划进度: 各信息收集阶段完成、行程规划输出片段,最后推送完整计划"
+)
+async def plan_trip_stream(request: TripRequest):
+    """
+    流式生成旅行计划
+
+    每个事件的格式为 `event: <类型>\\ndata: <JSON>\\n\\n`;
+    客户端断开连接后,尚未开始的阶段会被取消。
+
+    Args:
+        request: 旅行请求参数
+
+    Returns:
+        text/event-stream 响应
+    """
+    print(f"\n📥 收到流式旅行规划请求: {request.city}, {request.travel_days}天")
+    cancel_event = threading.Event()
+
+    async def event_stream():
+        yield _format_sse("start", {"city": request.city, "travel_days": request.travel_days})
+        try:
+            agent = await run_agent(get_trip_planner_agent)
+            async for event in stream_agent(agent.plan_trip_stream, request, cancel_event=cancel_event):
+                yield _format_sse(event.pop("event"), event)
+            yield _format_sse("done", {})
+        except Exception as e:
+            print(f"❌ 流式生成旅行计划失败: {str(e)}")
+            yield _format_sse("error", {"message": f"生成旅行计划失败: {str(e)}"})
+        finally:
+            # 客户端断开时生成器被关闭,通知后台停止剩余阶段
+            cancel_event.set()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """格式化SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get(
+    "/cache/stats",
+    summary="计划缓存统计",
+    description="查看旅行计划缓存的命中率"
+)
+async def plan_cache_stats():
+    """计划缓存统计"""
+    return {
+        "enabled": get_settings().plan_cache_enabled,
+        "stats": get_plan_cache().stats()
+    }
+
+
 @router.get(
     "/health",
     summary="健康检查",
@@ -70,7 +136,7 @@ async def health_check():
     """健康检查"""
     try:
         # 检查Agent是否可用
-        agent = get_trip_planner_agent()
+        agent = await run_blocking(get_trip_planner_agent)
         
         return {
             "status": "healthy",
@@ -37,12 +37,42 @@ class Settings(BaseSettings):
     # Unsplash API配置
     unsplash_access_key: str = ""
     unsplash_secret_key: str = ""
+    unsplash_cache_path: str = "data/photo_cache.db"  # 景点图片缓存数据库
+    unsplash_cache_ttl: int = 30 * 24 * 3600  # 找到图片的缓存时间: 30天
+    unsplash_negative_cache_ttl: int = 24 * 3600  # 未找到图片的缓存时间: 1天
+    unsplash_batch_concurrency: int = 4  # 批量获取图片的最大并发数
 
     # LLM配置 (从环境变量读取,由HelloAgents管理)
     openai_api_key: str = ""
     openai_base_url: str = "https://api.openai.com/v1"
     openai_model: str = "gpt-4"
 
+    # 多智能体并行配置
+    agent_parallel_enabled: bool = True  # 景点/天气/酒店三个Agent是否并行执行
+    agent_stage_timeout: float = 60.0  # 单个信息收集Agent的超时时间(秒)
+
+    # 旅行计划缓存配置
+    plan_cache_enabled: bool = True
+    plan_cache_ttl: int = 6 * 3600  # 缓存计划的过期时间(秒)
+    plan_cache_max_entries: int = 256
+
+    # 阻塞任务执行器配置
+    agent_max_concurrency: int = 2  # 同时运行的旅行规划任务数量上限
+    io_max_workers: int = 16  # 地图/图片等阻塞I/O调用的线程数
+
+    # 高德地图MCP连接池配置
+    amap_mcp_pool_size: int = 4  # 常驻 amap-mcp-server 进程数量
+    amap_mcp_call_timeout: float = 30.0  # 单次工具调用超时(秒)
+    amap_mcp_health_interval: float = 30.0  # 健康检查间隔(秒)
+
+    # 高德地图调用缓存配置(TTL单位: 秒)
+    amap_cache_enabled: bool = True
+    amap_cache_max_entries: int = 2048
+    amap_cache_weather_ttl: int = 600  # 天气: 10分钟
+    amap_cache_poi_ttl: int = 6 * 3600  # POI搜索: 6小时
+    amap_cache_route_ttl: int = 3600  # 路线规划: 1小时
+    amap_cache_static_ttl: int = 7 * 24 * 3600  # POI详情/地理编码: 7天
+
     # 日志配置
     log_level: str = "INFO"
 
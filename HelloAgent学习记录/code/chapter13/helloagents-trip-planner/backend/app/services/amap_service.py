@@ -1,58 +1,274 @@
 """高德地图MCP服务封装"""
 
+import json
+import re
+import threading
 from typing import List, Dict, Any, Optional
-from hello_agents.tools import MCPTool
 from ..config import get_settings
 from ..models.schemas import Location, POIInfo, WeatherInfo
+from .cache import TTLCache
+from .executor import run_blocking
+from .mcp_pool import MCPClientPool, PooledMCPTool
 
-# 全局MCP工具实例
+# 全局MCP连接池和工具实例
+_amap_mcp_pool = None
 _amap_mcp_tool = None
 
+# 全局高德调用缓存实例
+_amap_cache = None
 
-def get_amap_mcp_tool() -> MCPTool:
+# 保护上面的单例及 _amap_service 的初始化,避免并发请求各自启动一个连接池
+# (获取工具时会再获取连接池,因此使用可重入锁)
+_amap_init_lock = threading.RLock()
+
+
+def get_amap_mcp_pool() -> MCPClientPool:
+    """
+    获取高德地图MCP连接池(单例模式)
+
+    连接池维护多个常驻的 amap-mcp-server 进程,
+    地图服务和旅行规划Agent共享同一个连接池。
+
+    Returns:
+        MCPClientPool实例
+    """
+    global _amap_mcp_pool
+
+    if _amap_mcp_pool is None:
+        with _amap_init_lock:
+            if _amap_mcp_pool is None:
+                settings = get_settings()
+
+                if not settings.amap_api_key:
+                    raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
+
+                _amap_mcp_pool = MCPClientPool(
+                    server_command=["uvx", "amap-mcp-server"],
+                    env={"AMAP_MAPS_API_KEY": settings.amap_api_key},
+                    size=settings.amap_mcp_pool_size,
+                    call_timeout=settings.amap_mcp_call_timeout,
+                    health_check_interval=settings.amap_mcp_health_interval
+                )
+
+    return _amap_mcp_pool
+
+
+def get_amap_mcp_tool() -> PooledMCPTool:
     """
     获取高德地图MCP工具实例(单例模式)
     
     Returns:
-        MCPTool实例
+        基于连接池的MCPTool实例
     """
     global _amap_mcp_tool
     
     if _amap_mcp_tool is None:
-        settings = get_settings()
-        
-        if not settings.amap_api_key:
-            raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
-        
-        # 创建MCP工具
-        _amap_mcp_tool = MCPTool(
-            name="amap",
-            description="高德地图服务,支持POI搜索、路线规划、天气查询等功能",
-            server_command=["uvx", "amap-mcp-server"],
-            env={"AMAP_MAPS_API_KEY": settings.amap_api_key},
-            auto_expand=True  # 自动展开为独立工具
-        )
-        
-        print(f"✅ 高德地图MCP工具初始化成功")
-        print(f"   工具数量: {len(_amap_mcp_tool._available_tools)}")
-        
-        # 打印可用工具列表
-        if _amap_mcp_tool._available_tools:
-            print("   可用工具:")
-            for tool in _amap_mcp_tool._available_tools[:5]:  # 只打印前5个
-                print(f"     - {tool.get('name', 'unknown')}")
-            if len(_amap_mcp_tool._available_tools) > 5:
-                print(f"     ... 还有 {len(_amap_mcp_tool._available_tools) - 5} 个工具")
+        with _amap_init_lock:
+            if _amap_mcp_tool is None:
+                _amap_mcp_tool = _create_amap_mcp_tool()
     
     return _amap_mcp_tool
 
 
+def _create_amap_mcp_tool() -> PooledMCPTool:
+    """创建基于共享连接池的高德MCP工具并打印可用工具"""
+    # 创建MCP工具(调用通过共享连接池执行)
+    tool = PooledMCPTool(
+        pool=get_amap_mcp_pool(),
+        name="amap",
+        description="高德地图服务,支持POI搜索、路线规划、天气查询等功能",
+        auto_expand=True  # 自动展开为独立工具
+    )
+    
+    print(f"✅ 高德地图MCP工具初始化成功")
+    print(f"   工具数量: {len(tool._available_tools)}")
+    
+    # 打印可用工具列表
+    if tool._available_tools:
+        print("   可用工具:")
+        for item in tool._available_tools[:5]:  # 只打印前5个
+            print(f"     - {item.get('name', 'unknown')}")
+        if len(tool._available_tools) > 5:
+            print(f"     ... 还有 {len(tool._available_tools) - 5} 个工具")
+
+    return tool
+
+
+def shutdown_amap_mcp_pool():
+    """关闭高德地图MCP连接池(应用关闭时调用)"""
+    global _amap_mcp_pool, _amap_mcp_tool, _amap_service
+
+    with _amap_init_lock:
+        if _amap_mcp_pool is not None:
+            _amap_mcp_pool.close()
+
+        _amap_mcp_pool = None
+        _amap_mcp_tool = None
+        _amap_service = None
+
+
+def get_amap_cache() -> TTLCache:
+    """获取高德调用缓存实例(单例模式)"""
+    global _amap_cache
+
+    if _amap_cache is None:
+        with _amap_init_lock:
+            if _amap_cache is None:
+                settings = get_settings()
+                _amap_cache = TTLCache(max_entries=settings.amap_cache_max_entries)
+
+    return _amap_cache
+
+
+def _get_tool_ttl(tool_name: str) -> int:
+    """根据工具名获取缓存TTL(秒)"""
+    settings = get_settings()
+
+    if tool_name == "maps_weather":
+        return settings.amap_cache_weather_ttl
+    if tool_name in ("maps_geo", "maps_search_detail"):
+        return settings.amap_cache_static_ttl
+    if tool_name.startswith("maps_direction_"):
+        return settings.amap_cache_route_ttl
+    return settings.amap_cache_poi_ttl
+
+
+def _make_cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """构建缓存键: 工具名 + 规范化参数(去除首尾空白、忽略空值、按键排序)"""
+    normalized = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in arguments.items()
+        if value is not None and value != ""
+    }
+    return f"{tool_name}:{json.dumps(normalized, ensure_ascii=False, sort_keys=True)}"
+
+
+class AmapToolError(RuntimeError):
+    """高德MCP工具返回了错误结果"""
+
+
+# 高德接口成功时 status 为 "1"
+_SUCCESS_STATUSES = ("1", "ok", "success", "true")
+
+
+def _check_tool_result(tool_name: str, result: str) -> str:
+    """
+    检查高德MCP工具的返回结果
+
+    结果为空、包含 error 字段或 status 不是成功值时抛出 AmapToolError,
+    这样错误结果不会被写入缓存。无法解析为JSON的文本原样返回。
+
+    Args:
+        tool_name: MCP工具名
+        result: 工具返回的原始文本
+
+    Returns:
+        原始文本
+    """
+    if not result or not str(result).strip():
+        raise AmapToolError(f"高德工具 {tool_name} 返回空结果")
+
+    json_match = re.search(r'\{.*\}', result, re.DOTALL)
+    if not json_match:
+        return result
+
+    try:
+        data = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return result
+
+    if not isinstance(data, dict):
+        return result
+
+    if data.get("error"):
+        raise AmapToolError(f"高德工具 {tool_name} 返回错误: {data['error']}")
+
+    status = data.get("status")
+    if status is not None and str(status).strip().lower() not in _SUCCESS_STATUSES:
+        info = data.get("info") or data.get("message") or status
+        raise AmapToolError(f"高德工具 {tool_name} 调用未成功: {info}")
+
+    return result
+
+
+def _parse_weather(result: str) -> List[WeatherInfo]:
+    """
+    解析 maps_weather 的返回结果
+
+    兼容 {"forecasts": [{"casts": [...]}]} 和 {"forecasts": [...]} 两种结构,
+    无法解析时返回空列表。
+    """
+    json_match = re.search(r'\{.*\}', result, re.DOTALL)
+    if not json_match:
+        return []
+
+    try:
+        data = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return []
+
+    casts = []
+    for forecast in data.get("forecasts", []) or []:
+        if isinstance(forecast, dict) and "casts" in forecast:
+            casts.extend(forecast.get("casts") or [])
+        else:
+            casts.append(forecast)
+
+    weather_list = []
+    for cast in casts:
+        if not isinstance(cast, dict) or not cast.get("date"):
+            continue
+        weather_list.append(WeatherInfo(
+            date=cast["date"],
+            day_weather=cast.get("dayweather", ""),
+            night_weather=cast.get("nightweather", ""),
+            day_temp=cast.get("daytemp", 0),
+            night_temp=cast.get("nighttemp", 0),
+            wind_direction=cast.get("daywind", ""),
+            wind_power=cast.get("daypower", "")
+        ))
+
+    return weather_list
+
+
 class AmapService:
     """高德地图服务封装类"""
     
     def __init__(self):
         """初始化服务"""
         self.mcp_tool = get_amap_mcp_tool()
+        self.cache = get_amap_cache() if get_settings().amap_cache_enabled else None
+
+    def _call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        调用高德MCP工具(带缓存)
+
+        相同工具和参数的调用在TTL内直接返回缓存结果,
+        并发的相同请求只会触发一次MCP调用。
+
+        Args:
+            tool_name: MCP工具名
+            arguments: 工具参数
+
+        Returns:
+            工具返回的原始文本
+
+        Raises:
+            AmapToolError: 工具返回错误结果
+        """
+        def load() -> str:
+            # 调用失败或返回错误结果时抛出异常,避免把错误结果写入缓存
+            return _check_tool_result(tool_name, self.mcp_tool.call_tool(tool_name, arguments))
+
+        if self.cache is None:
+            return load()
+
+        return self.cache.get_or_load(
+            _make_cache_key(tool_name, arguments),
+            load,
+            ttl=_get_tool_ttl(tool_name),
+            namespace=tool_name
+        )
     
     def search_poi(self, keywords: str, city: str, citylimit: bool = True) -> List[POIInfo]:
         """
@@ -68,14 +284,10 @@ class AmapService:
         """
         try:
             # 调用MCP工具
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_text_search",
-                "arguments": {
-                    "keywords": keywords,
-                    "city": city,
-                    "citylimit": str(citylimit).lower()
-                }
+            result = self._call_tool("maps_text_search", {
+                "keywords": keywords,
+                "city": city,
+                "citylimit": str(citylimit).lower()
             })
             
             # 解析结果
@@ -102,18 +314,13 @@ class AmapService:
         """
         try:
             # 调用MCP工具
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_weather",
-                "arguments": {
-                    "city": city
-                }
+            result = self._call_tool("maps_weather", {
+                "city": city
             })
             
             print(f"天气查询结果: {result[:200]}...")
             
-            # TODO: 解析实际的天气数据
-            return []
+            return _parse_weather(result)
             
         except Exception as e:
             print(f"❌ 天气查询失败: {str(e)}")
@@ -170,11 +377,7 @@ class AmapService:
                     arguments["destination_city"] = destination_city
             
             # 调用MCP工具
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": tool_name,
-                "arguments": arguments
-            })
+            result = self._call_tool(tool_name, arguments)
             
             print(f"路线规划结果: {result[:200]}...")
             
@@ -201,11 +404,7 @@ class AmapService:
             if city:
                 arguments["city"] = city
 
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_geo",
-                "arguments": arguments
-            })
+            result = self._call_tool("maps_geo", arguments)
 
             print(f"地理编码结果: {result[:200]}...")
 
@@ -227,12 +426,8 @@ class AmapService:
             POI详情信息
         """
         try:
-            result = self.mcp_tool.run({
-                "action": "call_tool",
-                "tool_name": "maps_search_detail",
-                "arguments": {
-                    "id": poi_id
-                }
+            result = self._call_tool("maps_search_detail", {
+                "id": poi_id
             })
 
             print(f"POI详情结果: {result[:200]}...")
@@ -253,6 +448,42 @@ class AmapService:
             print(f"❌ 获取POI详情失败: {str(e)}")
             return {}
 
+    # ============ 异步接口(供async路由使用,不阻塞事件循环) ============
+
+    async def search_poi_async(self, keywords: str, city: str, citylimit: bool = True) -> List[POIInfo]:
+        """异步搜索POI"""
+        return await run_blocking(self.search_poi, keywords, city, citylimit)
+
+    async def get_weather_async(self, city: str) -> List[WeatherInfo]:
+        """异步查询天气"""
+        return await run_blocking(self.get_weather, city)
+
+    async def plan_route_async(
+        self,
+        origin_address: str,
+        destination_address: str,
+        origin_city: Optional[str] = None,
+        destination_city: Optional[str] = None,
+        route_type: str = "walking"
+    ) -> Dict[str, Any]:
+        """异步规划路线"""
+        return await run_blocking(
+            self.plan_route,
+            origin_address=origin_address,
+            destination_address=destination_address,
+            origin_city=origin_city,
+            destination_city=destination_city,
+            route_type=route_type
+        )
+
+    async def geocode_async(self, address: str, city: Optional[str] = None) -> Optional[Location]:
+        """异步地理编码"""
+        return await run_blocking(self.geocode, address, city)
+
+    async def get_poi_detail_async(self, poi_id: str) -> Dict[str, Any]:
+        """异步获取POI详情"""
+        return await run_blocking(self.get_poi_detail, poi_id)
+
 
 # 创建全局服务实例
 _amap_service = None
@@ -263,7 +494,15 @@ def get_amap_service() -> AmapService:
     global _amap_service
     
     if _amap_service is None:
-        _amap_service = AmapService()
+        with _amap_init_lock:
+            if _amap_service is None:
+                _amap_service = AmapService()
     
     return _amap_service
 
+
+async def get_amap_service_async() -> AmapService:
+    """异步获取高德地图服务实例,首次创建(启动MCP连接池)在I/O执行器中完成"""
+    if _amap_service is not None:
+        return _amap_service
+    return await run_blocking(get_amap_service)
@@ -0,0 +1,164 @@
+"""进程内TTL缓存
+
+- 每个条目有独立的过期时间(TTL)
+- 超过容量时按LRU淘汰
+- 同一个key的并发未命中只会触发一次实际调用(请求合并),其余调用方等待同一个结果
+- 线程安全: 服务方法运行在执行器线程中,缓存需要支持多线程并发访问
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 缓存未命中标记(缓存值本身可能为None)
+_MISSING = object()
+
+
+class TTLCache:
+    """带TTL、LRU容量上限和请求合并的缓存"""
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数,超过后淘汰最久未使用的条目
+        """
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._namespace_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def get(self, key: Hashable, namespace: str = "default") -> Optional[Any]:
+        """读取未过期的缓存值,不存在时返回None(计入命中统计)"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                self._namespace_stats[namespace]["misses"] += 1
+                return None
+            self.hits += 1
+            self._namespace_stats[namespace]["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """写入缓存值"""
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        ttl: float,
+        namespace: str = "default"
+    ) -> Any:
+        """
+        读取缓存,未命中时调用loader加载并写入缓存
+
+        同一个key同时只有一个调用方真正执行loader,其他调用方等待其结果。
+        loader抛出的异常会传递给所有等待者,且不会被缓存。
+
+        Args:
+            key: 缓存键
+            loader: 未命中时的加载函数
+            ttl: 过期时间(秒)
+            namespace: 统计分组名称(例如工具名)
+
+        Returns:
+            缓存值或新加载的值
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                self._namespace_stats[namespace]["hits"] += 1
+                return value
+
+            future = self._inflight.get(key)
+            if future is not None:
+                # 已有相同请求正在进行,等待它的结果
+                self.coalesced += 1
+                self._namespace_stats[namespace]["hits"] += 1
+                is_leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+                self._namespace_stats[namespace]["misses"] += 1
+                is_leader = True
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, value, ttl)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """清空缓存(不重置统计信息)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.coalesced + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "inflight": len(self._inflight),
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "by_namespace": {name: dict(counts) for name, counts in self._namespace_stats.items()},
+            }
+
+    def _lookup(self, key: Hashable) -> Any:
+        """查找未过期的条目,不存在时返回_MISSING(调用方需持有锁)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING
+
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        """写入条目并执行LRU淘汰(调用方需持有锁)"""
+        if ttl <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,154 @@
+"""阻塞任务执行器
+
+MCP子进程调用、requests请求和Agent运行都是同步阻塞的,
+直接在 async 路由里调用会卡住整个事件循环。这里提供两个有界线程池:
+
+- I/O执行器: 用于地图、图片等短小的阻塞调用
+- Agent执行器: 用于耗时的旅行规划任务,并发数量受 AGENT_MAX_CONCURRENCY 限制
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+from ..config import get_settings
+
+T = TypeVar("T")
+
+# 全局执行器实例
+_io_executor: Optional[ThreadPoolExecutor] = None
+_agent_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """获取I/O执行器(单例模式)"""
+    global _io_executor
+
+    if _io_executor is None:
+        settings = get_settings()
+        _io_executor = ThreadPoolExecutor(
+            max_workers=settings.io_max_workers,
+            thread_name_prefix="blocking-io"
+        )
+
+    return _io_executor
+
+
+def get_agent_executor() -> ThreadPoolExecutor:
+    """获取Agent执行器(单例模式)"""
+    global _agent_executor
+
+    if _agent_executor is None:
+        settings = get_settings()
+        _agent_executor = ThreadPoolExecutor(
+            max_workers=settings.agent_max_concurrency,
+            thread_name_prefix="agent-run"
+        )
+
+    return _agent_executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在I/O执行器中运行阻塞函数
+
+    Args:
+        func: 同步函数
+        *args, **kwargs: 函数参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+
+async def run_agent(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在Agent执行器中运行耗时的Agent任务
+
+    超出并发上限的任务会在线程池队列中排队,不会占用事件循环。
+
+    Args:
+        func: 同步函数
+        *args, **kwargs: 函数参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_agent_executor(), partial(func, *args, **kwargs))
+
+
+async def stream_agent(
+    func: Callable[..., Iterator[T]],
+    *args: Any,
+    cancel_event: threading.Event,
+    **kwargs: Any
+) -> AsyncIterator[T]:
+    """
+    在Agent执行器中运行同步生成器,并以异步迭代器的形式逐项返回
+
+    消费方停止迭代(例如客户端断开连接)时会设置 cancel_event,
+    同步生成器应在各阶段之间检查它并尽早退出。
+
+    Args:
+        func: 返回同步迭代器的函数
+        *args, **kwargs: 函数参数
+        cancel_event: 取消信号
+
+    Yields:
+        生成器产出的每一项
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    def put(item: Any, error: Optional[BaseException] = None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # 事件循环已关闭
+            cancel_event.set()
+
+    def produce():
+        iterator = func(*args, **kwargs)
+        try:
+            for item in iterator:
+                if cancel_event.is_set():
+                    break
+                put(item)
+        except BaseException as e:
+            put(finished, e)
+            return
+        finally:
+            # 提前退出时关闭生成器,让其清理未完成的阶段
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        put(finished)
+
+    loop.run_in_executor(get_agent_executor(), produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        cancel_event.set()
+
+
+def shutdown_executors():
+    """关闭所有执行器(应用关闭时调用)"""
+    global _io_executor, _agent_executor
+
+    for executor in (_io_executor, _agent_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    _io_executor = None
+    _agent_executor = None
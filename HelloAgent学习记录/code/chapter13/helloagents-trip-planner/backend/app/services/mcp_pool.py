@@ -0,0 +1,356 @@
+"""MCP服务器连接池
+
+MCPTool.run 每次调用都会新建一个 MCPClient,即重新启动一次
+`uvx amap-mcp-server` 子进程,每次调用都要承担进程启动和握手的开销。
+这里维护N个常驻的MCP服务器进程(每个工作者一个独立的事件循环线程),
+调用会被分派给空闲的工作者; 崩溃或超时的工作者会在后台重启,
+健康检查线程会定期ping空闲的工作者。
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+from hello_agents.tools import MCPTool
+from hello_agents.protocols.mcp.client import MCPClient
+
+
+class MCPPoolError(RuntimeError):
+    """连接池调用失败"""
+
+
+class _MCPWorker:
+    """持有一个常驻MCP服务器进程的工作者"""
+
+    def __init__(self, index: int, server_command: List[str], env: Dict[str, str], startup_timeout: float):
+        self.index = index
+        self.server_command = server_command
+        self.env = env
+        self.startup_timeout = startup_timeout
+
+        self.client: Optional[MCPClient] = None
+        self.healthy = False
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+
+        # 每个工作者使用独立的事件循环线程,MCP会话始终在同一个循环中使用
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever,
+            name=f"mcp-worker-{index}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def _submit(self, coro, timeout: Optional[float]) -> Any:
+        """在工作者的事件循环中执行协程"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def _connect(self):
+        client = MCPClient(self.server_command, env=self.env)
+        await client.__aenter__()
+        self.client = client
+
+    async def _disconnect(self):
+        client, self.client = self.client, None
+        if client is not None:
+            try:
+                await client.__aexit__(None, None, None)
+            except Exception as e:
+                print(f"⚠️  MCP工作者#{self.index}断开连接时出错: {str(e)}")
+
+    def start(self):
+        """启动MCP服务器进程并建立会话"""
+        self._submit(self._connect(), self.startup_timeout)
+        self.healthy = True
+
+    def restart(self):
+        """重启MCP服务器进程"""
+        self.healthy = False
+        self.restarts += 1
+        try:
+            self._submit(self._disconnect(), self.startup_timeout)
+        except Exception:
+            pass
+        self.start()
+
+    def ping(self, timeout: float) -> bool:
+        """检查会话是否可用"""
+        if self.client is None:
+            return False
+        try:
+            return bool(self._submit(self.client.ping(), timeout))
+        except Exception:
+            return False
+
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: float) -> Any:
+        """调用MCP工具"""
+        if self.client is None:
+            raise MCPPoolError(f"MCP工作者#{self.index}未连接")
+        self.calls += 1
+        return self._submit(self.client.call_tool(tool_name, arguments), timeout)
+
+    def list_tools(self, timeout: float) -> List[Dict[str, Any]]:
+        """列出MCP工具"""
+        if self.client is None:
+            raise MCPPoolError(f"MCP工作者#{self.index}未连接")
+        return self._submit(self.client.list_tools(), timeout)
+
+    def close(self):
+        """关闭会话并停止事件循环"""
+        try:
+            self._submit(self._disconnect(), self.startup_timeout)
+        except Exception:
+            pass
+        self.healthy = False
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class MCPClientPool:
+    """MCP服务器连接池"""
+
+    def __init__(
+        self,
+        server_command: List[str],
+        env: Optional[Dict[str, str]] = None,
+        size: int = 4,
+        call_timeout: float = 30.0,
+        acquire_timeout: float = 60.0,
+        startup_timeout: float = 60.0,
+        health_check_interval: float = 30.0
+    ):
+        """
+        初始化连接池并启动所有工作者
+
+        Args:
+            server_command: MCP服务器启动命令
+            env: 传递给MCP服务器的环境变量
+            size: 工作者(服务器进程)数量
+            call_timeout: 单次工具调用超时(秒)
+            acquire_timeout: 等待空闲工作者的超时(秒)
+            startup_timeout: 启动/重启服务器进程的超时(秒)
+            health_check_interval: 健康检查间隔(秒), <=0 表示不做健康检查
+        """
+        self.server_command = server_command
+        self.env = env or {}
+        self.size = size
+        self.call_timeout = call_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._workers: List[_MCPWorker] = []
+        self._idle: "queue.Queue[_MCPWorker]" = queue.Queue()
+        self._closed = threading.Event()
+
+        for index in range(size):
+            worker = _MCPWorker(index, server_command, self.env, startup_timeout)
+            try:
+                worker.start()
+            except Exception as e:
+                # 启动失败的工作者交给后台重启,不阻止其余工作者
+                print(f"⚠️  MCP工作者#{index}启动失败: {str(e)}")
+                self._workers.append(worker)
+                self._restart_in_background(worker)
+                continue
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+        if not any(worker.healthy for worker in self._workers):
+            self.close()
+            raise MCPPoolError("MCP连接池启动失败: 没有可用的工作者")
+
+        if health_check_interval > 0:
+            threading.Thread(target=self._health_check_loop, name="mcp-health", daemon=True).start()
+
+        print(f"✅ MCP连接池已启动: {sum(w.healthy for w in self._workers)}/{size} 个工作者可用")
+
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """
+        在空闲的工作者上调用MCP工具
+
+        工作者出错(进程崩溃、会话断开)时会在后台重启,并在另一个工作者上重试一次;
+        调用超时不会重试。
+
+        Args:
+            tool_name: MCP工具名
+            arguments: 工具参数
+            timeout: 调用超时(秒),默认使用连接池配置
+
+        Returns:
+            工具返回结果
+        """
+        timeout = timeout or self.call_timeout
+        last_error: Optional[Exception] = None
+
+        for _ in range(2):
+            worker = self._acquire()
+            try:
+                result = worker.call_tool(tool_name, arguments, timeout)
+            except FutureTimeoutError as e:
+                # 超时后会话状态不确定,重启工作者
+                worker.failures += 1
+                self._restart_in_background(worker)
+                raise MCPPoolError(f"MCP工具 {tool_name} 调用超时({timeout}s)") from e
+            except Exception as e:
+                worker.failures += 1
+                self._restart_in_background(worker)
+                last_error = e
+                continue
+            self._idle.put(worker)
+            return result
+
+        raise MCPPoolError(f"MCP工具 {tool_name} 调用失败: {str(last_error)}") from last_error
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """列出MCP服务器提供的工具"""
+        worker = self._acquire()
+        try:
+            tools = worker.list_tools(self.call_timeout)
+        except Exception:
+            worker.failures += 1
+            self._restart_in_background(worker)
+            raise
+        self._idle.put(worker)
+        return tools
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "healthy": sum(worker.healthy for worker in self._workers),
+            "workers": [
+                {
+                    "index": worker.index,
+                    "healthy": worker.healthy,
+                    "calls": worker.calls,
+                    "failures": worker.failures,
+                    "restarts": worker.restarts
+                }
+                for worker in self._workers
+            ]
+        }
+
+    def close(self):
+        """关闭所有工作者"""
+        self._closed.set()
+        for worker in self._workers:
+            worker.close()
+
+    def _acquire(self) -> _MCPWorker:
+        """获取一个空闲的工作者"""
+        if self._closed.is_set():
+            raise MCPPoolError("MCP连接池已关闭")
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise MCPPoolError(f"等待空闲MCP工作者超时({self.acquire_timeout}s)")
+
+    def _restart_in_background(self, worker: _MCPWorker):
+        """在后台线程中重启工作者,完成后放回空闲队列"""
+        worker.healthy = False
+
+        def restart():
+            delay = 1.0
+            while not self._closed.is_set():
+                try:
+                    worker.restart()
+                    print(f"🔄 MCP工作者#{worker.index}已重启")
+                    self._idle.put(worker)
+                    return
+                except Exception as e:
+                    print(f"⚠️  MCP工作者#{worker.index}重启失败: {str(e)}, {delay:.0f}s后重试")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 60.0)
+
+        threading.Thread(target=restart, name=f"mcp-restart-{worker.index}", daemon=True).start()
+
+    def _health_check_loop(self):
+        """定期ping空闲的工作者,重启无响应的工作者"""
+        while not self._closed.wait(self.health_check_interval):
+            # 只检查当前空闲的工作者,忙碌的工作者由调用结果判断健康状态
+            checked = []
+            while True:
+                try:
+                    checked.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+
+            for worker in checked:
+                if worker.ping(timeout=min(self.call_timeout, 10.0)):
+                    self._idle.put(worker)
+                else:
+                    print(f"⚠️  MCP工作者#{worker.index}健康检查失败,正在重启")
+                    worker.failures += 1
+                    self._restart_in_background(worker)
+
+
+class PooledMCPTool(MCPTool):
+    """
+    通过MCP连接池执行调用的MCPTool
+
+    可以像普通MCPTool一样添加到Agent(auto_expand展开后的工具同样走连接池),
+    多个Agent和服务共享同一个连接池。
+    """
+
+    def __init__(self, pool: MCPClientPool, name: str = "mcp", description: Optional[str] = None, auto_expand: bool = True):
+        self.pool = pool
+        super().__init__(
+            name=name,
+            description=description,
+            server_command=pool.server_command,
+            env=pool.env,
+            auto_expand=auto_expand
+        )
+
+    def _discover_tools(self):
+        """从连接池发现工具(不再单独启动服务器进程)"""
+        try:
+            self._available_tools = self.pool.list_tools()
+        except Exception as e:
+            print(f"⚠️  MCP工具发现失败: {str(e)}")
+            self._available_tools = []
+
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        调用MCP工具,失败时抛出异常(供需要区分成功/失败的调用方使用,例如缓存)
+
+        Returns:
+            与 MCPTool.run 相同格式的结果文本
+        """
+        result = self.pool.call_tool(tool_name, arguments)
+        return f"工具 '{tool_name}' 执行结果:\n{result}"
+
+    def run(self, parameters: Dict[str, Any]) -> str:
+        """执行MCP操作, call_tool/list_tools 走连接池,其余操作沿用MCPTool的实现"""
+        action = parameters.get("action", "").lower()
+        if not action and "tool_name" in parameters:
+            action = "call_tool"
+
+        if action == "call_tool":
+            tool_name = parameters.get("tool_name")
+            if not tool_name:
+                return "错误：必须指定 tool_name 参数"
+            try:
+                return self.call_tool(tool_name, parameters.get("arguments", {}))
+            except Exception as e:
+                return f"MCP 操作失败: {str(e)}"
+
+        if action == "list_tools":
+            tools = self._available_tools
+            if not tools:
+                return "没有找到可用的工具"
+            result = f"找到 {len(tools)} 个工具:\n"
+            for tool in tools:
+                result += f"- {tool['name']}: {tool['description']}\n"
+            return result
+
+        return super().run(parameters)
@@ -0,0 +1,114 @@
+"""景点图片持久化缓存
+
+基于SQLite,缓存 景点名称 -> 图片元数据。
+未找到图片的结果同样会被缓存(负缓存),但使用更短的TTL,
+这样冷门景点不会在每次页面访问时都重复请求Unsplash。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+class PhotoCache:
+    """SQLite景点图片缓存"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS photos (
+                name TEXT PRIMARY KEY,
+                photo TEXT,
+                expires_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        # 统计信息
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        读取缓存
+
+        Args:
+            name: 景点名称
+
+        Returns:
+            (是否命中, 图片元数据); 命中负缓存时返回 (True, None)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT photo, expires_at FROM photos WHERE name = ?",
+                (name,)
+            ).fetchone()
+
+            if row is None or row[1] <= time.time():
+                self.misses += 1
+                return False, None
+
+            if row[0] is None:
+                self.negative_hits += 1
+                return True, None
+
+            self.hits += 1
+            return True, json.loads(row[0])
+
+    def set(self, name: str, photo: Optional[Dict[str, Any]], ttl: float):
+        """
+        写入缓存
+
+        Args:
+            name: 景点名称
+            photo: 图片元数据, None 表示未找到图片
+            ttl: 过期时间(秒)
+        """
+        now = time.time()
+        payload = json.dumps(photo, ensure_ascii=False) if photo is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO photos (name, photo, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (name, payload, now + ttl, now)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """删除过期条目,返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM photos WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            size, negatives = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(photo IS NULL), 0) FROM photos"
+            ).fetchone()
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": size,
+            "negative_entries": negatives,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,80 @@
+"""旅行计划缓存
+
+很多请求只有出行日期不同(城市、天数、交通、住宿、偏好都相同),
+这类请求可以复用已生成的行程,只把日期平移到新的开始日期,
+天气信息则总是实时查询。
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import List
+from ..config import get_settings
+from ..models.schemas import TripRequest, TripPlan, WeatherInfo
+from .cache import TTLCache
+
+# 全局计划缓存实例
+_plan_cache = None
+
+
+def get_plan_cache() -> TTLCache:
+    """获取旅行计划缓存实例(单例模式)"""
+    global _plan_cache
+
+    if _plan_cache is None:
+        settings = get_settings()
+        _plan_cache = TTLCache(max_entries=settings.plan_cache_max_entries)
+
+    return _plan_cache
+
+
+def is_cacheable(request: TripRequest) -> bool:
+    """带额外要求的请求是个性化的,不参与缓存"""
+    return not (request.free_text_input or "").strip()
+
+
+def make_plan_cache_key(request: TripRequest) -> str:
+    """
+    构建规范化的缓存键: 城市 + 天数 + 交通方式 + 住宿 + 排序后的偏好
+
+    Args:
+        request: 旅行请求
+
+    Returns:
+        缓存键
+    """
+    canonical = {
+        "city": request.city.strip(),
+        "travel_days": request.travel_days,
+        "transportation": request.transportation.strip(),
+        "accommodation": request.accommodation.strip(),
+        "preferences": sorted({p.strip() for p in request.preferences if p.strip()}),
+    }
+    return json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+
+
+def redate_plan(plan: TripPlan, request: TripRequest, weather_info: List[WeatherInfo]) -> TripPlan:
+    """
+    把缓存的计划平移到新请求的日期,并替换为实时天气
+
+    Args:
+        plan: 缓存的旅行计划
+        request: 新的旅行请求
+        weather_info: 实时天气信息
+
+    Returns:
+        新的旅行计划(不修改缓存中的对象)
+    """
+    start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+    trip_dates = set()
+
+    new_plan = plan.model_copy(deep=True)
+    new_plan.start_date = request.start_date
+    new_plan.end_date = request.end_date
+    for i, day in enumerate(new_plan.days):
+        day.day_index = i
+        day.date = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
+        trip_dates.add(day.date)
+
+    # 只保留行程日期内的天气; 超出预报范围的日期不会有天气数据
+    new_plan.weather_info = [w for w in weather_info if w.date in trip_dates]
+    return new_plan
@@ -1,60 +1,75 @@
 """Unsplash图片服务"""
 
+import asyncio
 import requests
-from typing import List, Optional
+from typing import Dict, List, Optional
 from ..config import get_settings
+from .executor import run_blocking
+from .photo_cache import PhotoCache
 
 class UnsplashService:
     """Unsplash图片服务类"""
-    
+
     def __init__(self):
         """初始化服务"""
         settings = get_settings()
         self.access_key = settings.unsplash_access_key
         self.base_url = "https://api.unsplash.com"
-    
+
+        # 复用HTTP连接(keep-alive),避免每次请求重新握手
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Version": "v1"})
+
+        # 景点图片持久化缓存
+        self.cache = PhotoCache(settings.unsplash_cache_path)
+        self.cache_ttl = settings.unsplash_cache_ttl
+        self.negative_cache_ttl = settings.unsplash_negative_cache_ttl
+
+    def _search(self, query: str, per_page: int) -> List[dict]:
+        """请求Unsplash搜索接口,失败时抛出异常"""
+        url = f"{self.base_url}/search/photos"
+        params = {
+            "query": query,
+            "per_page": per_page,
+            "client_id": self.access_key
+        }
+
+        response = self.session.get(url, params=params, timeout=10)
+        response.raise_for_status()
+
+        data = response.json()
+        results = data.get("results", [])
+
+        # 提取图片URL
+        photos = []
+        for photo in results:
+            photos.append({
+                "id": photo.get("id"),
+                "url": photo.get("urls", {}).get("regular"),
+                "thumb": photo.get("urls", {}).get("thumb"),
+                "description": photo.get("description") or photo.get("alt_description"),
+                "photographer": photo.get("user", {}).get("name")
+            })
+
+        return photos
+
     def search_photos(self, query: str, per_page: int = 5) -> List[dict]:
         """
         搜索图片
-        
+
         Args:
             query: 搜索关键词
             per_page: 每页数量
-            
+
         Returns:
             图片列表
         """
         try:
-            url = f"{self.base_url}/search/photos"
-            params = {
-                "query": query,
-                "per_page": per_page,
-                "client_id": self.access_key
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            results = data.get("results", [])
-            
-            # 提取图片URL
-            photos = []
-            for photo in results:
-                photos.append({
-                    "id": photo.get("id"),
-                    "url": photo.get("urls", {}).get("regular"),
-                    "thumb": photo.get("urls", {}).get("thumb"),
-                    "description": photo.get("description") or photo.get("alt_description"),
-                    "photographer": photo.get("user", {}).get("name")
-                })
-            
-            return photos
-            
+            return self._search(query, per_page)
         except Exception as e:
             print(f"❌ Unsplash搜索失败: {str(e)}")
             return []
-    
+
     def get_photo_url(self, query: str) -> Optional[str]:
         """
         获取单张图片URL
@@ -70,6 +85,72 @@ class UnsplashService:
             return photos[0].get("url")
         return None
 
+    def resolve_attraction_photo(self, name: str) -> Optional[dict]:
+        """
+        获取景点图片(带持久化缓存)
+
+        依次尝试 "<景点名> China landmark" 和 "<景点名>" 两个查询;
+        找到的结果按 UNSPLASH_CACHE_TTL 缓存,确认没有图片的结果按
+        UNSPLASH_NEGATIVE_CACHE_TTL 缓存。请求出错时不写缓存。
+
+        Args:
+            name: 景点名称
+
+        Returns:
+            图片元数据,未找到时返回None
+        """
+        name = name.strip()
+        found, photo = self.cache.get(name)
+        if found:
+            return photo
+
+        try:
+            for query in (f"{name} China landmark", name):
+                photos = self._search(query, per_page=1)
+                if photos and photos[0].get("url"):
+                    photo = photos[0]
+                    self.cache.set(name, photo, self.cache_ttl)
+                    return photo
+        except Exception as e:
+            print(f"❌ 获取景点图片失败({name}): {str(e)}")
+            return None
+
+        self.cache.set(name, None, self.negative_cache_ttl)
+        return None
+
+    async def search_photos_async(self, query: str, per_page: int = 5) -> List[dict]:
+        """异步搜索图片(不阻塞事件循环)"""
+        return await run_blocking(self.search_photos, query, per_page)
+
+    async def get_photo_url_async(self, query: str) -> Optional[str]:
+        """异步获取单张图片URL(不阻塞事件循环)"""
+        return await run_blocking(self.get_photo_url, query)
+
+    async def resolve_attraction_photo_async(self, name: str) -> Optional[dict]:
+        """异步获取景点图片(带持久化缓存)"""
+        return await run_blocking(self.resolve_attraction_photo, name)
+
+    async def resolve_attraction_photos_async(self, names: List[str], concurrency: int = 4) -> Dict[str, Optional[dict]]:
+        """
+        批量获取景点图片,并发数量受限
+
+        Args:
+            names: 景点名称列表(会去重)
+            concurrency: 最大并发请求数
+
+        Returns:
+            景点名称 -> 图片元数据
+        """
+        unique_names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def resolve(name: str) -> Optional[dict]:
+            async with semaphore:
+                return await self.resolve_attraction_photo_async(name)
+
+        photos = await asyncio.gather(*(resolve(name) for name in unique_names))
+        return dict(zip(unique_names, photos))
+
 
 # 全局服务实例
 _unsplash_service = None
@@ -78,9 +159,8 @@ _unsplash_service = None
 def get_unsplash_service() -> UnsplashService:
     """获取Unsplash服务实例(单例模式)"""
     global _unsplash_service
-    
+
     if _unsplash_service is None:
         _unsplash_service = UnsplashService()
-    
-    return _unsplash_service
 
+    return _unsplash_service
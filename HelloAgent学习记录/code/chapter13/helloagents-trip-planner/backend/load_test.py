@@ -0,0 +1,118 @@
+"""并发压测脚本
+
+在若干 /api/trip/plan 请求执行期间,持续轮询 /api/map/weather,
+统计天气接口的响应延迟,用于验证旅行规划不会阻塞事件循环。
+
+用法:
+    python run.py                     # 先启动后端
+    python load_test.py --plans 4 --city 北京
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+from typing import List
+
+import httpx
+
+
+def build_trip_request(city: str, days: int) -> dict:
+    """构建旅行规划请求体"""
+    start = date.today() + timedelta(days=7)
+    end = start + timedelta(days=days - 1)
+    return {
+        "city": city,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "travel_days": days,
+        "transportation": "公共交通",
+        "accommodation": "经济型酒店",
+        "preferences": ["历史文化"],
+        "free_text_input": ""
+    }
+
+
+async def run_plan(client: httpx.AsyncClient, index: int, payload: dict) -> float:
+    """发送一次旅行规划请求,返回耗时(秒)"""
+    started = time.perf_counter()
+    response = await client.post("/api/trip/plan", json=payload)
+    elapsed = time.perf_counter() - started
+    print(f"  [plan #{index}] HTTP {response.status_code}, 耗时 {elapsed:.2f}s")
+    return elapsed
+
+
+async def poll_weather(client: httpx.AsyncClient, city: str, interval: float, stop: asyncio.Event) -> List[float]:
+    """在规划请求进行期间持续轮询天气接口,返回每次的延迟(秒)"""
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/api/map/weather", params={"city": city})
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError as e:
+            print(f"  [weather] 请求失败: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+    return latencies
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算百分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main(args: argparse.Namespace):
+    payload = build_trip_request(args.city, args.days)
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+        print(f"🚀 同时发起 {args.plans} 个旅行规划请求,并每 {args.interval}s 查询一次天气...")
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_weather(client, args.city, args.interval, stop))
+
+        started = time.perf_counter()
+        plan_times = await asyncio.gather(
+            *(run_plan(client, i, payload) for i in range(args.plans)),
+            return_exceptions=True
+        )
+        total = time.perf_counter() - started
+
+        stop.set()
+        latencies = await poller
+
+    failures = [t for t in plan_times if isinstance(t, BaseException)]
+    print(f"\n{'='*60}")
+    print(f"旅行规划: {args.plans - len(failures)}/{args.plans} 成功, 总耗时 {total:.2f}s")
+    for failure in failures:
+        print(f"  ❌ {failure!r}")
+
+    if latencies:
+        print(f"天气接口: {len(latencies)} 次请求")
+        print(f"  p50 = {statistics.median(latencies) * 1000:.0f}ms")
+        print(f"  p95 = {percentile(latencies, 95) * 1000:.0f}ms")
+        print(f"  max = {max(latencies) * 1000:.0f}ms")
+        if max(latencies) > args.max_latency:
+            print(f"⚠️  天气接口最大延迟超过 {args.max_latency}s,事件循环可能被阻塞")
+        else:
+            print(f"✅ 规划期间天气接口保持响应")
+    else:
+        print("⚠️  未收集到天气接口延迟数据")
+    print(f"{'='*60}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="旅行规划后端并发压测")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="后端地址")
+    parser.add_argument("--plans", type=int, default=4, help="并发旅行规划请求数量")
+    parser.add_argument("--city", default="北京", help="目的地城市")
+    parser.add_argument("--days", type=int, default=3, help="旅行天数")
+    parser.add_argument("--interval", type=float, default=0.5, help="天气接口轮询间隔(秒)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="单个请求超时(秒)")
+    parser.add_argument("--max-latency", type=float, default=5.0, help="天气接口可接受的最大延迟(秒)")
+    asyncio.run(main(parser.parse_args()))
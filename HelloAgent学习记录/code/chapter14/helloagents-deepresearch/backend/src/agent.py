@@ -6,7 +6,7 @@ import logging
 import re
 from pathlib import Path
 from queue import Empty, Queue
-from threading import Lock, Thread
+from threading import Event, Lock, Thread
 from typing import Any, Callable, Iterator
 
 from hello_agents import HelloAgentsLLM, ToolAwareSimpleAgent
@@ -15,16 +15,25 @@ from hello_agents.tools.builtin.note_tool import NoteTool
 
 from config import Configuration
 from prompts import (
+    report_merge_instructions,
+    report_section_instructions,
     report_writer_instructions,
     task_summarizer_instructions,
     todo_planner_system_prompt,
 )
 from models import SummaryState, SummaryStateOutput, TodoItem
+from services.checkpoints import (
+    FINISHED_TASK_STATUSES,
+    RunCheckpoint,
+    get_checkpoint_store,
+)
 from services.planner import PlanningService
-from services.reporter import ReportingService
+from services.reporter import ReportingService, SectionDrafter
+from services.scheduler import TaskOutcome, TaskScheduler
 from services.search import dispatch_search, prepare_research_context
 from services.summarizer import SummarizationService
 from services.tool_events import ToolCallTracker
+from utils import get_config_value
 
 logger = logging.getLogger(__name__)
 
@@ -32,16 +41,24 @@ logger = logging.getLogger(__name__)
 class DeepResearchAgent:
     """Coordinator orchestrating TODO-based research workflow using HelloAgents."""
 
-    def __init__(self, config: Configuration | None = None) -> None:
-        """Initialise the coordinator with configuration and shared tools."""
+    def __init__(
+        self,
+        config: Configuration | None = None,
+        *,
+        llm: HelloAgentsLLM | None = None,
+        note_tool: NoteTool | None = None,
+    ) -> None:
+        """Initialise the coordinator with configuration and shared tools.
+
+        ``llm`` and ``note_tool`` may be passed in to share one client and note
+        workspace between several coordinators built from the same config.
+        """
         self.config = config or Configuration.from_env()
-        self.llm = self._init_llm()
+        self.llm = llm or self._init_llm()
 
-        self.note_tool = (
-            NoteTool(workspace=self.config.notes_workspace)
-            if self.config.enable_notes
-            else None
-        )
+        if note_tool is None and self.config.enable_notes:
+            note_tool = NoteTool(workspace=self.config.notes_workspace)
+        self.note_tool = note_tool if self.config.enable_notes else None
         self.tools_registry: ToolRegistry | None = None
         if self.note_tool:
             registry = ToolRegistry()
@@ -49,7 +66,8 @@ class DeepResearchAgent:
             self.tools_registry = registry
 
         self._tool_tracker = ToolCallTracker(
-            self.config.notes_workspace if self.config.enable_notes else None
+            self.config.notes_workspace if self.config.enable_notes else None,
+            max_events=self.config.tool_event_buffer_size,
         )
         self._tool_event_sink_enabled = False
         self._state_lock = Lock()
@@ -70,7 +88,25 @@ class DeepResearchAgent:
 
         self.planner = PlanningService(self.todo_agent, self.config)
         self.summarizer = SummarizationService(self._summarizer_factory, self.config)
-        self.reporting = ReportingService(self.report_agent, self.config)
+        self.reporting = ReportingService(
+            self.report_agent,
+            self.config,
+            section_agent_factory=lambda: self._create_tool_aware_agent(
+                name="报告章节撰写专家",
+                system_prompt=report_section_instructions.strip(),
+            ),
+            merge_agent_factory=lambda: self._create_tool_aware_agent(
+                name="报告整合专家",
+                system_prompt=report_merge_instructions.strip(),
+            ),
+        )
+        self.scheduler = TaskScheduler(
+            self.config.max_parallel_tasks,
+            self.config.task_timeout_seconds,
+        )
+        self.checkpoints = (
+            get_checkpoint_store(self.config.checkpoint_dir) if self.config.checkpoint_enabled else None
+        )
         self._last_search_notices: list[str] = []
 
     # ------------------------------------------------------------------
@@ -117,29 +153,92 @@ class DeepResearchAgent:
             tool_call_listener=self._tool_tracker.record,
         )
 
+    def reset(self) -> None:
+        """Clear per-run state so the instance can serve another request."""
+        self._set_tool_event_sink(None)
+        self._tool_tracker.reset()
+        self.todo_agent.clear_history()
+        self.report_agent.clear_history()
+        self._last_search_notices = []
+
     def _set_tool_event_sink(self, sink: Callable[[dict[str, Any]], None] | None) -> None:
         """Enable or disable immediate tool event callbacks."""
         self._tool_event_sink_enabled = sink is not None
         self._tool_tracker.set_event_sink(sink)
 
-    def run(self, topic: str) -> SummaryStateOutput:
-        """Execute the research workflow and return the final report."""
-        state = SummaryState(research_topic=topic)
-        state.todo_items = self.planner.plan_todo_list(state)
-        self._drain_tool_events(state)
+    def run(
+        self,
+        topic: str,
+        cancel_event: Event | None = None,
+        *,
+        run_id: str | None = None,
+    ) -> SummaryStateOutput:
+        """Execute the research workflow and return the final report.
+
+        With ``run_id`` progress is checkpointed after every task; calling again
+        with the same ``run_id`` resumes the run and skips finished tasks.
+        """
+        checkpoint = self.load_checkpoint(run_id)
+        if checkpoint is not None:
+            state = checkpoint.restore_state()
+            logger.info("Resuming research run %s: topic=%s", run_id, state.research_topic)
+        else:
+            state = SummaryState(research_topic=topic)
+            state.todo_items = self.planner.plan_todo_list(state)
+            self._drain_tool_events(state)
 
-        if not state.todo_items:
-            logger.info("No TODO items generated; falling back to single task")
-            state.todo_items = [self.planner.create_fallback_task(state)]
+            if not state.todo_items:
+                logger.info("No TODO items generated; falling back to single task")
+                state.todo_items = [self.planner.create_fallback_task(state)]
+            self._save_checkpoint(run_id, state)
 
-        for task in state.todo_items:
-            self._execute_task(state, task, emit_stream=False)
+        if checkpoint is not None and checkpoint.status == "completed" and state.structured_report:
+            return SummaryStateOutput(
+                running_summary=state.structured_report,
+                report_markdown=state.structured_report,
+                todo_items=state.todo_items,
+            )
+
+        def worker(task: TodoItem, token: Event) -> None:
+            # _execute_task 是生成器，必须迭代才会真正执行
+            for _ in self._execute_task(state, task, emit_stream=False, cancel_token=token):
+                pass
+
+        drafter = self._start_section_drafter(state, run_id)
+
+        def on_finish(outcome: TaskOutcome) -> None:
+            self._apply_outcome(outcome)
+            self._save_checkpoint(run_id, state)
+            if outcome.status != "cancelled":
+                drafter.submit(outcome.task)
 
-        report = self.reporting.generate_report(state)
+        try:
+            self.scheduler.run(
+                self._pending_tasks(state),
+                worker,
+                cancel_event=cancel_event,
+                on_finish=on_finish,
+            )
+            drafter.ensure_all()
+            drafted = drafter.wait(cancel_event)
+        finally:
+            drafter.close()
+
+        if not drafted or (cancel_event is not None and cancel_event.is_set()):
+            logger.info("Research cancelled before report generation: topic=%s", state.research_topic)
+            self._save_checkpoint(run_id, state, status="cancelled")
+            return SummaryStateOutput(
+                running_summary="",
+                report_markdown="",
+                todo_items=state.todo_items,
+            )
+
+        report = self.reporting.merge_report(state)
         self._drain_tool_events(state)
         state.structured_report = report
         state.running_summary = report
         self._persist_final_report(state, report)
+        self._save_checkpoint(run_id, state, status="completed")
 
         return SummaryStateOutput(
             running_summary=report,
@@ -147,17 +246,43 @@ class DeepResearchAgent:
             todo_items=state.todo_items,
         )
 
-    def run_stream(self, topic: str) -> Iterator[dict[str, Any]]:
-        """Execute the workflow yielding incremental progress events."""
-        state = SummaryState(research_topic=topic)
-        logger.debug("Starting streaming research: topic=%s", topic)
-        yield {"type": "status", "message": "初始化研究流程"}
+    def run_stream(
+        self,
+        topic: str,
+        cancel_event: Event | None = None,
+        *,
+        run_id: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Execute the workflow yielding incremental progress events.
+
+        With ``run_id`` progress is checkpointed after every task. Resuming an
+        existing run re-announces the TODO list and finished tasks, then only
+        executes the remaining ones.
+        """
+        cancel_event = cancel_event or Event()
+        checkpoint = self.load_checkpoint(run_id)
+
+        if checkpoint is not None:
+            state = checkpoint.restore_state()
+            finished = len(state.todo_items) - len(self._pending_tasks(state))
+            logger.info("Resuming streaming research run %s: topic=%s", run_id, state.research_topic)
+            yield {
+                "type": "status",
+                "message": f"恢复研究流程（已完成 {finished}/{len(state.todo_items)} 个任务）",
+            }
+        else:
+            state = SummaryState(research_topic=topic)
+            logger.debug("Starting streaming research: topic=%s", topic)
+            yield {"type": "status", "message": "初始化研究流程"}
 
-        state.todo_items = self.planner.plan_todo_list(state)
-        for event in self._drain_tool_events(state, step=0):
-            yield event
-        if not state.todo_items:
-            state.todo_items = [self.planner.create_fallback_task(state)]
+            state.todo_items = self.planner.plan_todo_list(state)
+            for event in self._drain_tool_events(state, step=0):
+                yield event
+            if not state.todo_items:
+                state.todo_items = [self.planner.create_fallback_task(state)]
+            self._save_checkpoint(run_id, state)
+        if cancel_event.is_set():
+            return
 
         channel_map: dict[int, dict[str, Any]] = {}
         for index, task in enumerate(state.todo_items, start=1):
@@ -171,6 +296,36 @@ class DeepResearchAgent:
             "step": 0,
         }
 
+        pending_tasks = self._pending_tasks(state)
+        if checkpoint is not None:
+            pending_ids = {task.id for task in pending_tasks}
+            for task in state.todo_items:
+                if task.id in pending_ids:
+                    continue
+                yield {
+                    "type": "task_status",
+                    "task_id": task.id,
+                    "status": task.status,
+                    "title": task.title,
+                    "intent": task.intent,
+                    "summary": task.summary,
+                    "sources_summary": task.sources_summary,
+                    "note_id": task.note_id,
+                    "note_path": task.note_path,
+                    "step": channel_map[task.id]["step"],
+                    "stream_token": channel_map[task.id]["token"],
+                }
+
+            if checkpoint.status == "completed" and state.structured_report:
+                yield {
+                    "type": "final_report",
+                    "report": state.structured_report,
+                    "note_id": state.report_note_id,
+                    "note_path": state.report_note_path,
+                }
+                yield {"type": "done"}
+                return
+
         event_queue: Queue[dict[str, Any]] = Queue()
 
         def enqueue(
@@ -198,50 +353,48 @@ class DeepResearchAgent:
 
         self._set_tool_event_sink(tool_event_sink)
 
-        threads: list[Thread] = []
-
-        def worker(task: TodoItem, step: int) -> None:
-            try:
-                enqueue(
-                    {
-                        "type": "task_status",
-                        "task_id": task.id,
-                        "status": "in_progress",
-                        "title": task.title,
-                        "intent": task.intent,
-                        "note_id": task.note_id,
-                        "note_path": task.note_path,
-                    },
-                    task=task,
-                )
-
-                for event in self._execute_task(state, task, emit_stream=True, step=step):
-                    enqueue(event, task=task)
-            except Exception as exc:  # pragma: no cover - defensive guardrail
-                logger.exception("Task execution failed", exc_info=exc)
-                enqueue(
-                    {
-                        "type": "task_status",
-                        "task_id": task.id,
-                        "status": "failed",
-                        "detail": str(exc),
-                        "title": task.title,
-                        "intent": task.intent,
-                        "note_id": task.note_id,
-                        "note_path": task.note_path,
-                    },
-                    task=task,
-                )
-            finally:
-                enqueue({"type": "__task_done__", "task_id": task.id})
-
-        for task in state.todo_items:
+        def worker(task: TodoItem, token: Event) -> None:
             step = channel_map.get(task.id, {}).get("step", 0)
-            thread = Thread(target=worker, args=(task, step), daemon=True)
-            threads.append(thread)
-            thread.start()
+            enqueue(
+                {
+                    "type": "task_status",
+                    "task_id": task.id,
+                    "status": "in_progress",
+                    "title": task.title,
+                    "intent": task.intent,
+                    "note_id": task.note_id,
+                    "note_path": task.note_path,
+                },
+                task=task,
+            )
 
-        active_workers = len(state.todo_items)
+            for event in self._execute_task(state, task, emit_stream=True, step=step, cancel_token=token):
+                if token.is_set():
+                    # 超时或被取消后不再推送该任务的事件
+                    break
+                enqueue(event, task=task)
+
+        drafter = self._start_section_drafter(state, run_id)
+
+        def on_finish(outcome: TaskOutcome) -> None:
+            status_event = self._apply_outcome(outcome)
+            self._save_checkpoint(run_id, state)
+            if outcome.status != "cancelled":
+                # 任务一结束就开始起草其报告章节，与其余任务并行
+                drafter.submit(outcome.task)
+            if status_event and outcome.status != "cancelled":
+                enqueue(status_event, task=outcome.task)
+            enqueue({"type": "__task_done__", "task_id": outcome.task.id})
+
+        dispatcher = Thread(
+            target=self.scheduler.run,
+            args=(pending_tasks, worker),
+            kwargs={"cancel_event": cancel_event, "on_finish": on_finish},
+            daemon=True,
+        )
+        dispatcher.start()
+
+        active_workers = len(pending_tasks)
         finished_workers = 0
 
         try:
@@ -260,18 +413,51 @@ class DeepResearchAgent:
                 if event.get("type") != "__task_done__":
                     yield event
         finally:
+            if finished_workers < active_workers:
+                # 消费方提前退出（例如客户端断开连接），停止调度剩余任务
+                cancel_event.set()
             self._set_tool_event_sink(None)
-            for thread in threads:
-                thread.join()
+            dispatcher.join()
+            if cancel_event.is_set():
+                drafter.close()
+                self._save_checkpoint(run_id, state, status="cancelled")
+
+        if cancel_event.is_set():
+            return
 
-        report = self.reporting.generate_report(state)
         final_step = len(state.todo_items) + 1
+        yield {"type": "status", "message": "正在整合报告章节", "step": final_step}
+        try:
+            drafter.ensure_all()
+            drafted = drafter.wait(cancel_event)
+        finally:
+            drafter.close()
+        if not drafted:
+            self._save_checkpoint(run_id, state, status="cancelled")
+            return
+
+        report_stream, get_report = self.reporting.stream_merged_report(state)
+        try:
+            for chunk in report_stream:
+                if cancel_event.is_set():
+                    break
+                yield {"type": "final_report_chunk", "content": chunk, "step": final_step}
+                for event in self._drain_tool_events(state, step=final_step):
+                    yield event
+        finally:
+            report_stream.close()
+        if cancel_event.is_set():
+            self._save_checkpoint(run_id, state, status="cancelled")
+            return
+
+        report = get_report()
         for event in self._drain_tool_events(state, step=final_step):
             yield event
         state.structured_report = report
         state.running_summary = report
 
         note_event = self._persist_final_report(state, report)
+        self._save_checkpoint(run_id, state, status="completed")
         if note_event:
             yield note_event
 
@@ -283,6 +469,47 @@ class DeepResearchAgent:
         }
         yield {"type": "done"}
 
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+    def load_checkpoint(self, run_id: str | None) -> RunCheckpoint | None:
+        """Return the stored checkpoint of ``run_id`` if checkpointing is enabled."""
+        if not run_id or self.checkpoints is None:
+            return None
+        return self.checkpoints.load(run_id)
+
+    def _save_checkpoint(self, run_id: str | None, state: SummaryState, *, status: str = "running") -> None:
+        if not run_id or self.checkpoints is None:
+            return
+        try:
+            with self._state_lock:
+                checkpoint = RunCheckpoint.from_state(
+                    run_id,
+                    state,
+                    status=status,
+                    search_api=get_config_value(self.config.search_api),
+                )
+            self.checkpoints.save(checkpoint)
+        except Exception:  # pragma: no cover - checkpointing must not break the run
+            logger.exception("Failed to write checkpoint for run %s", run_id)
+
+    def _start_section_drafter(self, state: SummaryState, run_id: str | None) -> SectionDrafter:
+        """Create the report section drafter; tasks restored as finished start drafting at once."""
+        drafter = SectionDrafter(
+            self.reporting,
+            state,
+            max_workers=self.config.max_parallel_tasks,
+            on_drafted=lambda _task: self._save_checkpoint(run_id, state),
+        )
+        for task in state.todo_items:
+            if task.status in FINISHED_TASK_STATUSES and task.report_section is None:
+                drafter.submit(task)
+        return drafter
+
+    @staticmethod
+    def _pending_tasks(state: SummaryState) -> list[TodoItem]:
+        return [task for task in state.todo_items if task.status not in FINISHED_TASK_STATUSES]
+
     # ------------------------------------------------------------------
     # Execution helpers
     # ------------------------------------------------------------------
@@ -293,8 +520,15 @@ class DeepResearchAgent:
         *,
         emit_stream: bool,
         step: int | None = None,
+        cancel_token: Event | None = None,
     ) -> Iterator[dict[str, Any]]:
-        """Run search + summarization for a single task."""
+        """Run search + summarization for a single task.
+
+        ``cancel_token`` is checked between stages; once set the task stops
+        without touching the shared state any further.
+        """
+        if self._is_cancelled(cancel_token):
+            return
         task.status = "in_progress"
 
         search_result, notices, answer_text, backend = dispatch_search(
@@ -302,6 +536,8 @@ class DeepResearchAgent:
             self.config,
             state.research_loop_count,
         )
+        if self._is_cancelled(cancel_token):
+            return
         self._last_search_notices = notices
         task.notices = notices
 
@@ -347,6 +583,7 @@ class DeepResearchAgent:
             search_result,
             answer_text,
             self.config,
+            task.query,
         )
 
         task.sources_summary = sources_summary
@@ -354,6 +591,7 @@ class DeepResearchAgent:
         with self._state_lock:
             state.web_research_results.append(context)
             state.sources_gathered.append(sources_summary)
+            state.research_task_ids.append(task.id)
             state.research_loop_count += 1
 
         summary_text: str | None = None
@@ -377,6 +615,8 @@ class DeepResearchAgent:
                 for event in self._drain_tool_events(state, step=step):
                     yield event
                 for chunk in summary_stream:
+                    if self._is_cancelled(cancel_token):
+                        break
                     if chunk:
                         yield {
                             "type": "task_summary_chunk",
@@ -388,11 +628,16 @@ class DeepResearchAgent:
                     for event in self._drain_tool_events(state, step=step):
                         yield event
             finally:
+                # 提前退出时关闭 LLM 流，释放连接
+                summary_stream.close()
                 summary_text = summary_getter()
         else:
             summary_text = self.summarizer.summarize_task(state, task, context)
             self._drain_tool_events(state)
 
+        if self._is_cancelled(cancel_token):
+            return
+
         task.summary = summary_text.strip() if summary_text else "暂无可用信息"
         task.status = "completed"
 
@@ -412,6 +657,38 @@ class DeepResearchAgent:
         else:
             self._drain_tool_events(state)
 
+    @staticmethod
+    def _is_cancelled(cancel_token: Event | None) -> bool:
+        return cancel_token is not None and cancel_token.is_set()
+
+    def _apply_outcome(self, outcome: TaskOutcome) -> dict[str, Any] | None:
+        """Record scheduler failures on the task and build the status event."""
+        task = outcome.task
+        if outcome.status == "completed":
+            return None
+
+        if outcome.status == "timeout":
+            detail = f"任务执行超时（超过 {self.config.task_timeout_seconds:.0f} 秒）"
+        elif outcome.status == "cancelled":
+            detail = "任务已取消"
+        else:
+            detail = str(outcome.error)
+
+        task.status = "cancelled" if outcome.status == "cancelled" else "failed"
+        if outcome.status != "cancelled":
+            task.notices.append(detail)
+
+        return {
+            "type": "task_status",
+            "task_id": task.id,
+            "status": task.status,
+            "detail": detail,
+            "title": task.title,
+            "intent": task.intent,
+            "note_id": task.note_id,
+            "note_path": task.note_path,
+        }
+
     def _drain_tool_events(
         self,
         state: SummaryState,
@@ -436,6 +713,7 @@ class DeepResearchAgent:
             "title": task.title,
             "intent": task.intent,
             "query": task.query,
+            "blocking": task.blocking,
             "status": task.status,
             "summary": task.summary,
             "sources_summary": task.sources_summary,
@@ -506,32 +784,7 @@ class DeepResearchAgent:
         if state.report_note_id:
             return state.report_note_id
 
-        for event in reversed(self._tool_tracker.as_dicts()):
-            if event.get("tool") != "note":
-                continue
-
-            parameters = event.get("parsed_parameters") or {}
-            if not isinstance(parameters, dict):
-                continue
-
-            action = parameters.get("action")
-            if action not in {"create", "update"}:
-                continue
-
-            note_type = parameters.get("note_type")
-            if note_type != "conclusion":
-                title = parameters.get("title")
-                if not (isinstance(title, str) and title.startswith("研究报告")):
-                    continue
-
-            note_id = parameters.get("note_id")
-            if not note_id:
-                note_id = self._tool_tracker._extract_note_id(event.get("result", ""))  # type: ignore[attr-defined]
-
-            if note_id:
-                return note_id
-
-        return None
+        return self._tool_tracker.latest_note_id(note_type="conclusion", title_prefix="研究报告")
 
     @staticmethod
     def _extract_note_id_from_text(response: str) -> str | None:
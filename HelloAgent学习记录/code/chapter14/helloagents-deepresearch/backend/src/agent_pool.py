@@ -0,0 +1,170 @@
+"""Pool of warm DeepResearchAgent instances keyed on the effective configuration."""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Optional
+
+from hello_agents import HelloAgentsLLM
+from hello_agents.tools.builtin.note_tool import NoteTool
+
+from agent import DeepResearchAgent
+from config import Configuration
+
+logger = logging.getLogger(__name__)
+
+# 只影响池本身的字段，不参与配置键的计算
+_POOL_FIELDS = {"agent_pool_max_configs", "agent_pool_max_idle", "agent_pool_idle_ttl"}
+
+
+@dataclass
+class _PoolEntry:
+    """Shared resources and idle agents for one configuration."""
+
+    llm: HelloAgentsLLM
+    note_tool: Optional[NoteTool]
+    idle: list[DeepResearchAgent] = field(default_factory=list)
+    in_use: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class AgentPool:
+    """Hand out DeepResearchAgent instances, one request at a time.
+
+    同一配置下的 Agent 共享 LLM 客户端（及其 HTTP 连接池）和笔记工具；
+    每个 Agent 同一时间只服务一个请求，归还时清空追踪器与对话历史。
+
+    - 最多保留 ``max_configs`` 个配置，超出时淘汰最久未使用且没有在用 Agent 的配置；
+    - 每个配置最多保留 ``max_idle`` 个空闲 Agent；
+    - 超过 ``idle_ttl`` 秒未使用的配置会被淘汰。
+    """
+
+    def __init__(self, max_configs: int = 4, max_idle: int = 4, idle_ttl: float = 1800.0) -> None:
+        self.max_configs = max(1, max_configs)
+        self.max_idle = max(0, max_idle)
+        self.idle_ttl = idle_ttl
+        self._entries: OrderedDict[str, _PoolEntry] = OrderedDict()
+        self._lock = Lock()
+        self._created = 0
+        self._reused = 0
+        self._evicted = 0
+
+    @classmethod
+    def from_config(cls, config: Configuration) -> "AgentPool":
+        """Build a pool using the pool settings of ``config``."""
+
+        return cls(
+            max_configs=config.agent_pool_max_configs,
+            max_idle=config.agent_pool_max_idle,
+            idle_ttl=config.agent_pool_idle_ttl,
+        )
+
+    @staticmethod
+    def config_key(config: Configuration) -> str:
+        """Canonical key for the settings that affect agent behaviour."""
+
+        payload = config.model_dump(mode="json", exclude=_POOL_FIELDS)
+        return json.dumps(payload, sort_keys=True, ensure_ascii=False)
+
+    def acquire(self, config: Configuration) -> DeepResearchAgent:
+        """Take an idle agent for ``config`` or build one on shared resources."""
+
+        key = self.config_key(config)
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.in_use += 1
+                entry.last_used = time.monotonic()
+                if entry.idle:
+                    self._reused += 1
+                    return entry.idle.pop()
+
+        if entry is not None:
+            agent = DeepResearchAgent(config=config, llm=entry.llm, note_tool=entry.note_tool)
+        else:
+            agent = DeepResearchAgent(config=config)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _PoolEntry(llm=agent.llm, note_tool=agent.note_tool)
+                    self._entries[key] = entry
+                entry.in_use += 1
+                entry.last_used = time.monotonic()
+                self._evict_overflow()
+
+        with self._lock:
+            self._created += 1
+        logger.info("Agent pool created a new agent (configs=%d)", len(self._entries))
+        return agent
+
+    def release(self, agent: DeepResearchAgent, *, reusable: bool = True) -> None:
+        """Return an agent to the pool.
+
+        ``reusable=False`` 用于被取消或出错的运行：其后台任务可能仍在使用该实例，
+        因此直接丢弃，不再放回池中。
+        """
+
+        key = self.config_key(agent.config)
+        if reusable:
+            try:
+                agent.reset()
+            except Exception:  # pragma: no cover - defensive guardrail
+                logger.exception("Failed to reset agent; discarding it")
+                reusable = False
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # 该配置已被淘汰
+                return
+            entry.in_use = max(0, entry.in_use - 1)
+            entry.last_used = time.monotonic()
+            if reusable and len(entry.idle) < self.max_idle:
+                entry.idle.append(agent)
+
+    def stats(self) -> dict[str, Any]:
+        """Return pool counters for monitoring."""
+
+        with self._lock:
+            return {
+                "configs": len(self._entries),
+                "idle": sum(len(entry.idle) for entry in self._entries.values()),
+                "in_use": sum(entry.in_use for entry in self._entries.values()),
+                "created": self._created,
+                "reused": self._reused,
+                "evicted": self._evicted,
+            }
+
+    def clear(self) -> None:
+        """Drop all pooled agents and shared resources."""
+
+        with self._lock:
+            self._entries.clear()
+
+    # ------------------------------------------------------------------
+    # Eviction helpers (caller holds the lock)
+    # ------------------------------------------------------------------
+    def _evict_expired(self) -> None:
+        if not self.idle_ttl or self.idle_ttl <= 0:
+            return
+        now = time.monotonic()
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if entry.in_use == 0 and now - entry.last_used > self.idle_ttl:
+                del self._entries[key]
+                self._evicted += 1
+
+    def _evict_overflow(self) -> None:
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_configs:
+                break
+            if self._entries[key].in_use == 0:
+                del self._entries[key]
+                self._evicted += 1
@@ -51,6 +51,41 @@ class Configuration(BaseModel):
         title="Fetch Full Page",
         description="Include the full page content in the search results",
     )
+    context_token_budget: int = Field(
+        default=3000,
+        title="Context Token Budget",
+        description="Approximate tokens of search context per task (0 keeps every source)",
+    )
+    search_cache_enabled: bool = Field(
+        default=True,
+        title="Search Cache",
+        description="Persist search results and fetched pages between runs",
+    )
+    search_cache_path: str = Field(
+        default="./cache/search_cache.db",
+        title="Search Cache Path",
+        description="SQLite file used by the search cache",
+    )
+    search_cache_ttl: float = Field(
+        default=21600.0,
+        title="Search Cache TTL",
+        description="Seconds a cached search result stays valid",
+    )
+    page_cache_ttl: float = Field(
+        default=86400.0,
+        title="Page Cache TTL",
+        description="Seconds a downloaded page stays valid",
+    )
+    checkpoint_enabled: bool = Field(
+        default=True,
+        title="Checkpoints",
+        description="Persist run progress after every task so interrupted runs can resume",
+    )
+    checkpoint_dir: str = Field(
+        default="./checkpoints",
+        title="Checkpoint Directory",
+        description="Directory holding run checkpoints and replayable event logs",
+    )
     ollama_base_url: str = Field(
         default="http://localhost:11434",
         title="Ollama Base URL",
@@ -61,6 +96,36 @@ class Configuration(BaseModel):
         title="LMStudio Base URL",
         description="Base URL for LMStudio OpenAI-compatible API",
     )
+    max_parallel_tasks: int = Field(
+        default=3,
+        title="Max Parallel Tasks",
+        description="Maximum number of TODO tasks executed concurrently",
+    )
+    task_timeout_seconds: float = Field(
+        default=300.0,
+        title="Task Timeout",
+        description="Per-task deadline in seconds (0 disables the deadline)",
+    )
+    agent_pool_max_configs: int = Field(
+        default=4,
+        title="Agent Pool Configurations",
+        description="Number of distinct configurations kept warm in the agent pool",
+    )
+    agent_pool_max_idle: int = Field(
+        default=4,
+        title="Agent Pool Idle Agents",
+        description="Idle agents kept per configuration",
+    )
+    agent_pool_idle_ttl: float = Field(
+        default=1800.0,
+        title="Agent Pool Idle TTL",
+        description="Seconds before an unused configuration is evicted from the pool",
+    )
+    tool_event_buffer_size: int = Field(
+        default=1000,
+        title="Tool Event Buffer Size",
+        description="Tool call events kept in memory per agent; older ones are dropped",
+    )
     strip_thinking_tokens: bool = Field(
         default=True,
         title="Strip Thinking Tokens",
@@ -110,6 +175,19 @@ class Configuration(BaseModel):
             "ollama_base_url": os.getenv("OLLAMA_BASE_URL"),
             "max_web_research_loops": os.getenv("MAX_WEB_RESEARCH_LOOPS"),
             "fetch_full_page": os.getenv("FETCH_FULL_PAGE"),
+            "context_token_budget": os.getenv("CONTEXT_TOKEN_BUDGET"),
+            "search_cache_enabled": os.getenv("SEARCH_CACHE_ENABLED"),
+            "search_cache_path": os.getenv("SEARCH_CACHE_PATH"),
+            "search_cache_ttl": os.getenv("SEARCH_CACHE_TTL"),
+            "page_cache_ttl": os.getenv("PAGE_CACHE_TTL"),
+            "checkpoint_enabled": os.getenv("CHECKPOINT_ENABLED"),
+            "checkpoint_dir": os.getenv("CHECKPOINT_DIR"),
+            "max_parallel_tasks": os.getenv("MAX_PARALLEL_TASKS"),
+            "task_timeout_seconds": os.getenv("TASK_TIMEOUT_SECONDS"),
+            "agent_pool_max_configs": os.getenv("AGENT_POOL_MAX_CONFIGS"),
+            "agent_pool_max_idle": os.getenv("AGENT_POOL_MAX_IDLE"),
+            "agent_pool_idle_ttl": os.getenv("AGENT_POOL_IDLE_TTL"),
+            "tool_event_buffer_size": os.getenv("TOOL_EVENT_BUFFER_SIZE"),
             "strip_thinking_tokens": os.getenv("STRIP_THINKING_TOKENS"),
             "use_tool_calling": os.getenv("USE_TOOL_CALLING"),
             "search_api": os.getenv("SEARCH_API"),
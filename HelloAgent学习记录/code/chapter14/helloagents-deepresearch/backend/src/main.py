@@ -2,18 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import sys
-from typing import Any, Dict, Iterator, Optional
+from threading import Event, Lock
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from loguru import logger
 from pydantic import BaseModel, Field
 
 from config import Configuration, SearchAPI
-from agent import DeepResearchAgent
+from agent_pool import AgentPool
+from services.checkpoints import RunCheckpoint, get_checkpoint_store, is_valid_run_id, new_run_id
+from services.search_cache import get_search_cache
 
 # 添加控制台日志处理程序
 logger.add(
@@ -41,6 +47,10 @@ class ResearchRequest(BaseModel):
         default=None,
         description="Override the default search backend configured via env",
     )
+    run_id: str | None = Field(
+        default=None,
+        description="Resume an interrupted run instead of starting a new one",
+    )
 
 
 class ResearchResponse(BaseModel):
@@ -53,6 +63,10 @@ class ResearchResponse(BaseModel):
         default_factory=list,
         description="Structured TODO items with summaries and sources",
     )
+    run_id: str | None = Field(
+        default=None,
+        description="Identifier for resuming the run when checkpoints are enabled",
+    )
 
 
 def _mask_secret(value: Optional[str], visible: int = 4) -> str:
@@ -75,8 +89,81 @@ def _build_config(payload: ResearchRequest) -> Configuration:
     return Configuration.from_env(overrides=overrides)
 
 
+def _resolve_run_id(config: Configuration, run_id: Optional[str]) -> Optional[str]:
+    """Validate a client supplied run id, or mint one when checkpoints are enabled."""
+    if not config.checkpoint_enabled:
+        if run_id:
+            raise HTTPException(status_code=400, detail="Checkpoints are disabled")
+        return None
+    if run_id is None:
+        return new_run_id()
+    if not is_valid_run_id(run_id):
+        raise HTTPException(status_code=400, detail="Invalid run_id")
+    return run_id
+
+
+def _sse(event: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    data = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+    return f"id: {event_id}\n{data}" if event_id is not None else data
+
+
+def _parse_cursor(value: Optional[str]) -> Optional[int]:
+    """Parse a ``Last-Event-ID`` header value."""
+    if value is None:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID") from None
+
+
+def _load_checkpoint(run_id: str) -> RunCheckpoint:
+    config = Configuration.from_env()
+    if not config.checkpoint_enabled:
+        raise HTTPException(status_code=404, detail="Checkpoints are disabled")
+    checkpoint = get_checkpoint_store(config.checkpoint_dir).load(run_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return checkpoint
+
+
+async def _cancel_on_disconnect(request: Request, cancel_event: Event, interval: float = 1.0) -> None:
+    """Set ``cancel_event`` once the HTTP client goes away."""
+    while not cancel_event.is_set():
+        if await request.is_disconnected():
+            logger.info("Client disconnected, cancelling research run")
+            cancel_event.set()
+            return
+        await asyncio.sleep(interval)
+
+
 def create_app() -> FastAPI:
     app = FastAPI(title="HelloAgents Deep Researcher")
+    agent_pool = AgentPool.from_config(Configuration.from_env())
+    active_runs: set[str] = set()
+    active_runs_lock = Lock()
+
+    def claim_run(run_id: Optional[str]) -> None:
+        """Allow one connection per run; a second one would execute tasks twice."""
+        if run_id is None:
+            return
+        with active_runs_lock:
+            if run_id in active_runs:
+                raise HTTPException(status_code=409, detail="Run is already streaming")
+            active_runs.add(run_id)
+
+    def release_run(run_id: Optional[str]) -> None:
+        if run_id is not None:
+            with active_runs_lock:
+                active_runs.discard(run_id)
+
+    def ensure_run_idle(run_id: Optional[str]) -> None:
+        """Reject early with 409 when another connection already streams ``run_id``."""
+        if run_id is None:
+            return
+        with active_runs_lock:
+            if run_id in active_runs:
+                raise HTTPException(status_code=409, detail="Run is already streaming")
 
     app.add_middleware(
         CORSMiddleware,
@@ -115,16 +202,52 @@ def create_app() -> FastAPI:
     def health_check() -> Dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/pool/stats")
+    def pool_stats() -> Dict[str, Any]:
+        return agent_pool.stats()
+
+    @app.get("/search/cache/stats")
+    def search_cache_stats() -> Dict[str, Any]:
+        config = Configuration.from_env()
+        if not config.search_cache_enabled:
+            return {"enabled": False}
+        cache = get_search_cache(
+            config.search_cache_path,
+            search_ttl=config.search_cache_ttl,
+            page_ttl=config.page_cache_ttl,
+        )
+        return {"enabled": True, **cache.stats()}
+
     @app.post("/research", response_model=ResearchResponse)
-    def run_research(payload: ResearchRequest) -> ResearchResponse:
+    async def run_research(payload: ResearchRequest, request: Request) -> ResearchResponse:
+        cancel_event = Event()
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, cancel_event))
+        agent = None
+        reusable = False
+        run_id = None
+        claimed = False
         try:
             config = _build_config(payload)
-            agent = DeepResearchAgent(config=config)
-            result = agent.run(payload.topic)
+            run_id = _resolve_run_id(config, payload.run_id)
+            claim_run(run_id)
+            claimed = True
+            agent = await run_in_threadpool(agent_pool.acquire, config)
+            result = await run_in_threadpool(
+                functools.partial(agent.run, payload.topic, cancel_event, run_id=run_id)
+            )
+            reusable = not cancel_event.is_set()
+        except HTTPException:
+            raise
         except ValueError as exc:  # Likely due to unsupported configuration
             raise HTTPException(status_code=400, detail=str(exc)) from exc
         except Exception as exc:  # pragma: no cover - defensive guardrail
             raise HTTPException(status_code=500, detail="Research failed") from exc
+        finally:
+            watcher.cancel()
+            if claimed:
+                release_run(run_id)
+            if agent is not None:
+                agent_pool.release(agent, reusable=reusable)
 
         todo_payload = [
             {
@@ -132,6 +255,7 @@ def create_app() -> FastAPI:
                 "title": item.title,
                 "intent": item.intent,
                 "query": item.query,
+                "blocking": item.blocking,
                 "status": item.status,
                 "summary": item.summary,
                 "sources_summary": item.sources_summary,
@@ -144,32 +268,118 @@ def create_app() -> FastAPI:
         return ResearchResponse(
             report_markdown=(result.report_markdown or result.running_summary or ""),
             todo_items=todo_payload,
+            run_id=run_id,
         )
 
     @app.post("/research/stream")
-    def stream_research(payload: ResearchRequest) -> StreamingResponse:
+    def stream_research(
+        payload: ResearchRequest,
+        last_event_id: Optional[str] = Header(default=None),
+    ) -> StreamingResponse:
         try:
             config = _build_config(payload)
-            agent = DeepResearchAgent(config=config)
         except ValueError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
+        run_id = _resolve_run_id(config, payload.run_id)
+        return _stream_run(config, payload.topic, run_id, _parse_cursor(last_event_id))
+
+    @app.get("/research/{run_id}")
+    def get_run(run_id: str) -> Dict[str, Any]:
+        return _load_checkpoint(run_id).summary()
+
+    @app.get("/research/{run_id}/stream")
+    def resume_research(
+        run_id: str,
+        last_event_id: Optional[str] = Header(default=None),
+        cursor: Optional[int] = Query(default=None, alias="last_event_id"),
+    ) -> StreamingResponse:
+        """Resume an interrupted run; events after ``Last-Event-ID`` are replayed first."""
+        checkpoint = _load_checkpoint(run_id)
+        overrides = {"search_api": checkpoint.search_api} if checkpoint.search_api else None
+        try:
+            config = Configuration.from_env(overrides=overrides)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        after = cursor if cursor is not None else _parse_cursor(last_event_id)
+        return _stream_run(config, checkpoint.topic, run_id, after if after is not None else 0)
+
+    def _stream_run(
+        config: Configuration,
+        topic: str,
+        run_id: Optional[str],
+        after: Optional[int],
+    ) -> StreamingResponse:
+        # 仅做检查；占用运行和借出 agent 放在响应体生成器里，
+        # 响应未开始（客户端提前断开等）时生成器不会执行，也就不会泄漏
+        ensure_run_idle(run_id)
+
+        cancel_event = Event()
+        store = get_checkpoint_store(config.checkpoint_dir) if run_id else None
 
         def event_iterator() -> Iterator[str]:
+            reusable = False
+            claimed = False
+            agent = None
+            log = None
             try:
-                for event in agent.run_stream(payload.topic):
-                    yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                claim_run(run_id)
+                claimed = True
+                agent = agent_pool.acquire(config)
+                log = store.event_log(run_id) if store else None
+                if log is not None:
+                    if after is not None:
+                        # 断线重连：先补发客户端尚未收到的事件
+                        finished = False
+                        for event_id, event in log.replay():
+                            finished = event.get("type") == "done"
+                            if event_id > after:
+                                yield _sse(event, event_id)
+                        if finished:
+                            reusable = True
+                            return
+                    else:
+                        run_event = {"type": "run", "run_id": run_id}
+                        yield _sse(run_event, log.append(run_event))
+
+                for event in agent.run_stream(topic, cancel_event, run_id=run_id):
+                    if log is not None:
+                        yield _sse(event, log.append(event))
+                    else:
+                        yield _sse(event)
+                reusable = not cancel_event.is_set()
+            except HTTPException as exc:
+                yield _sse({"type": "error", "detail": exc.detail})
             except Exception as exc:  # pragma: no cover - defensive guardrail
                 logger.exception("Streaming research failed")
                 error_payload = {"type": "error", "detail": str(exc)}
-                yield f"data: {json.dumps(error_payload, ensure_ascii=False)}\n\n"
+                yield _sse(error_payload)
+            finally:
+                if agent is not None:
+                    agent_pool.release(agent, reusable=reusable)
+                if claimed:
+                    if log is not None:
+                        store.release_event_log(run_id)
+                    release_run(run_id)
+
+        async def cancellable_stream() -> AsyncIterator[str]:
+            # 客户端断开时 Starlette 会取消响应任务，这里把取消信号传给调度器
+            try:
+                async for chunk in iterate_in_threadpool(event_iterator()):
+                    yield chunk
+            finally:
+                cancel_event.set()
+
+        headers = {
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+        if run_id:
+            headers["X-Run-Id"] = run_id
 
         return StreamingResponse(
-            event_iterator(),
+            cancellable_stream(),
             media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-            },
+            headers=headers,
         )
 
     return app
@@ -15,6 +15,7 @@ class TodoItem:
     title: str
     intent: str
     query: str
+    blocking: bool = field(default=False)  # 其他任务依赖其结果，调度时优先执行
     status: str = field(default="pending")
     summary: Optional[str] = field(default=None)
     sources_summary: Optional[str] = field(default=None)
@@ -22,6 +23,7 @@ class TodoItem:
     note_id: Optional[str] = field(default=None)
     note_path: Optional[str] = field(default=None)
     stream_token: Optional[str] = field(default=None)
+    report_section: Optional[str] = field(default=None)  # 该任务在最终报告中的章节草稿
 
 
 @dataclass(kw_only=True)
@@ -30,6 +32,7 @@ class SummaryState:
     search_query: str = field(default=None)  # Deprecated placeholder
     web_research_results: Annotated[list, operator.add] = field(default_factory=list)
     sources_gathered: Annotated[list, operator.add] = field(default_factory=list)
+    research_task_ids: Annotated[list, operator.add] = field(default_factory=list)  # 上面两个列表每一项所属的任务
     research_loop_count: int = field(default=0)  # Research loop count
     running_summary: str = field(default=None)  # Legacy summary field
     todo_items: Annotated[list, operator.add] = field(default_factory=list)
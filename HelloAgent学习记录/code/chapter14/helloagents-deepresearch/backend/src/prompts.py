@@ -50,12 +50,14 @@ todo_planner_instructions = """
     {{
       "title": "任务名称（10字内，突出重点）",
       "intent": "任务要解决的核心问题，用1-2句描述",
-      "query": "建议使用的检索关键词"
+      "query": "建议使用的检索关键词",
+      "blocking": false
     }}
   ]
 }}
 </FORMAT>
 
+若某个任务的结论是其他任务的前提（例如基础概念、背景梳理），请将其 `blocking` 设为 true，这类任务会被优先执行。
 如果主题信息不足以规划任务，请输出空数组：{{"tasks": []}}。必要时使用笔记工具记录你的思考过程。
 """
 
@@ -108,3 +110,36 @@ report_writer_instructions = """
 - 如需在报告层面沉淀结果，可创建新的 `conclusion` 类型笔记，例如：`[TOOL_CALL:note:{"action":"create","title":"研究报告：{研究主题}","note_type":"conclusion","tags":["deep_research","report"],"content":"...报告要点..."}]`。
 </NOTES>
 """
+
+
+report_section_instructions = """
+你是一名专业的分析报告撰写者，负责把单个研究任务的总结改写为最终报告中的一个章节草稿。
+
+<REQUIREMENTS>
+- 使用 Markdown，以三级标题 `### 任务 {task_id}: {任务名称}` 开头；
+- 保留任务总结中的关键发现、事实数据与来源标题，删除与任务目标无关的内容；
+- 列出 1-3 条该任务暴露出的风险或尚待验证的假设，没有则写"暂无相关信息"；
+- 只输出章节正文，不要调用工具，不要添加报告级别的开场或结语。
+</REQUIREMENTS>
+"""
+
+
+report_merge_instructions = """
+你是一名专业的分析报告撰写者。各任务的章节草稿已经完成，请将它们整合为一份结构化的研究报告。
+
+<REPORT_TEMPLATE>
+1. **背景概览**：简述研究主题的重要性与上下文。
+2. **核心洞见**：提炼 3-5 条最重要的结论，标注文献/任务编号。
+3. **证据与数据**：罗列支持性的事实或指标，可引用任务摘要中的要点。
+4. **风险与挑战**：分析潜在的问题、限制或仍待验证的假设。
+5. **参考来源**：按任务列出关键来源条目（标题 + 链接）。
+</REPORT_TEMPLATE>
+
+<REQUIREMENTS>
+- 报告使用 Markdown；
+- 只对章节草稿做归并、去重与润色，不要引入草稿中没有的事实；
+- 各部分明确分节，禁止添加额外的封面或结语；
+- 若某部分信息缺失，说明"暂无相关信息"；
+- 不要调用工具，输出中禁止出现 `[TOOL_CALL:...]` 指令。
+</REQUIREMENTS>
+"""
@@ -0,0 +1,251 @@
+"""On-disk checkpoints and replayable event logs for research runs."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterator, Optional
+
+from models import SummaryState, TodoItem
+
+logger = logging.getLogger(__name__)
+
+# 已完成的任务在恢复时直接跳过，其余状态的任务重新执行
+FINISHED_TASK_STATUSES = {"completed", "skipped"}
+
+_RUN_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_run_id(run_id: str) -> bool:
+    return bool(_RUN_ID_RE.match(run_id or ""))
+
+
+@dataclass
+class RunCheckpoint:
+    """Serializable snapshot of a research run."""
+
+    run_id: str
+    topic: str
+    status: str = "running"  # running / completed / cancelled / failed
+    search_api: Optional[str] = None
+    todo_items: list[dict[str, Any]] = field(default_factory=list)
+    web_research_results: list[str] = field(default_factory=list)
+    sources_gathered: list[str] = field(default_factory=list)
+    research_task_ids: list[int] = field(default_factory=list)
+    research_loop_count: int = 0
+    structured_report: Optional[str] = None
+    report_note_id: Optional[str] = None
+    report_note_path: Optional[str] = None
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_state(
+        cls,
+        run_id: str,
+        state: SummaryState,
+        *,
+        status: str,
+        search_api: Optional[str],
+    ) -> "RunCheckpoint":
+        return cls(
+            run_id=run_id,
+            topic=state.research_topic,
+            status=status,
+            search_api=search_api,
+            todo_items=[asdict(task) for task in state.todo_items],
+            web_research_results=list(state.web_research_results),
+            sources_gathered=list(state.sources_gathered),
+            research_task_ids=list(state.research_task_ids),
+            research_loop_count=state.research_loop_count,
+            structured_report=state.structured_report,
+            report_note_id=state.report_note_id,
+            report_note_path=state.report_note_path,
+        )
+
+    def restore_state(self) -> SummaryState:
+        """Rebuild the workflow state; unfinished tasks are reset to pending.
+
+        未完成任务已收集的检索结果会被丢弃，任务重新执行时再次写入，避免重复。
+        """
+
+        tasks = []
+        for item in self.todo_items:
+            task = TodoItem(**item)
+            if task.status not in FINISHED_TASK_STATUSES:
+                task.status = "pending"
+                task.summary = None
+                task.sources_summary = None
+                task.report_section = None
+            tasks.append(task)
+
+        results = list(zip(self.web_research_results, self.sources_gathered, self.research_task_ids))
+        if len(results) == len(self.web_research_results) == len(self.sources_gathered):
+            finished_ids = {task.id for task in tasks if task.status in FINISHED_TASK_STATUSES}
+            results = [entry for entry in results if entry[2] in finished_ids]
+            web_research_results = [context for context, _, _ in results]
+            sources_gathered = [sources for _, sources, _ in results]
+            research_task_ids = [task_id for _, _, task_id in results]
+            research_loop_count = self.research_loop_count - (len(self.web_research_results) - len(results))
+        else:
+            # 旧版检查点没有记录结果所属的任务，原样保留
+            web_research_results = list(self.web_research_results)
+            sources_gathered = list(self.sources_gathered)
+            research_task_ids = list(self.research_task_ids)
+            research_loop_count = self.research_loop_count
+
+        return SummaryState(
+            research_topic=self.topic,
+            todo_items=tasks,
+            web_research_results=web_research_results,
+            sources_gathered=sources_gathered,
+            research_task_ids=research_task_ids,
+            research_loop_count=research_loop_count,
+            structured_report=self.structured_report,
+            running_summary=self.structured_report,
+            report_note_id=self.report_note_id,
+            report_note_path=self.report_note_path,
+        )
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "topic": self.topic,
+            "status": self.status,
+            "updated_at": self.updated_at,
+            "tasks": [
+                {"id": item.get("id"), "title": item.get("title"), "status": item.get("status")}
+                for item in self.todo_items
+            ],
+        }
+
+
+class EventLog:
+    """Append-only JSON-lines log of the SSE events of one run.
+
+    事件编号在同一个运行内单调递增（跨越多次连接与进程重启），
+    客户端据此以 ``Last-Event-ID`` 的方式从断点继续接收。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = Lock()
+        self._last_id = 0
+        if path.exists():
+            for event_id, _ in self.replay():
+                self._last_id = event_id
+            with path.open("rb+") as handle:
+                handle.seek(0, os.SEEK_END)
+                if handle.tell():
+                    handle.seek(-1, os.SEEK_END)
+                    if handle.read(1) != b"\n":
+                        # 补齐被中断写入的最后一行，避免新事件与其拼接
+                        handle.write(b"\n")
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def append(self, event: dict[str, Any]) -> int:
+        with self._lock:
+            self._last_id += 1
+            line = json.dumps({"id": self._last_id, "event": event}, ensure_ascii=False)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+            return self._last_id
+
+    def replay(self, after: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+        """Yield ``(event_id, event)`` for every logged event newer than ``after``."""
+
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程中断时最后一行可能不完整
+                    logger.warning("Skipping truncated event in %s", self.path)
+                    continue
+                if record["id"] > after:
+                    yield record["id"], record["event"]
+
+
+class CheckpointStore:
+    """Directory of ``<run_id>/state.json`` + ``<run_id>/events.jsonl``."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._logs: dict[str, EventLog] = {}
+
+    def save(self, checkpoint: RunCheckpoint) -> None:
+        """Atomically replace the checkpoint of ``checkpoint.run_id``."""
+
+        checkpoint.updated_at = time.time()
+        run_dir = self._run_dir(checkpoint.run_id)
+        run_dir.mkdir(parents=True, exist_ok=True)
+        target = run_dir / "state.json"
+        tmp = run_dir / f"state.json.{os.getpid()}.tmp"
+        with self._lock:
+            tmp.write_text(json.dumps(asdict(checkpoint), ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, target)
+
+    def load(self, run_id: str) -> Optional[RunCheckpoint]:
+        if not is_valid_run_id(run_id):
+            return None
+        path = self._run_dir(run_id) / "state.json"
+        if not path.exists():
+            return None
+        try:
+            return RunCheckpoint(**json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, TypeError, ValueError) as exc:
+            logger.warning("Failed to load checkpoint %s: %s", run_id, exc)
+            return None
+
+    def event_log(self, run_id: str) -> EventLog:
+        with self._lock:
+            log = self._logs.get(run_id)
+            if log is None:
+                run_dir = self._run_dir(run_id)
+                run_dir.mkdir(parents=True, exist_ok=True)
+                log = EventLog(run_dir / "events.jsonl")
+                self._logs[run_id] = log
+            return log
+
+    def release_event_log(self, run_id: str) -> None:
+        """Forget the cached log handle once no connection streams this run."""
+
+        with self._lock:
+            self._logs.pop(run_id, None)
+
+    def _run_dir(self, run_id: str) -> Path:
+        if not is_valid_run_id(run_id):
+            raise ValueError(f"Invalid run id: {run_id}")
+        return self.directory / run_id
+
+
+_STORES: dict[str, CheckpointStore] = {}
+_STORES_LOCK = Lock()
+
+
+def get_checkpoint_store(directory: str) -> CheckpointStore:
+    """Return the process-wide store for ``directory``."""
+
+    with _STORES_LOCK:
+        store = _STORES.get(directory)
+        if store is None:
+            store = CheckpointStore(directory)
+            _STORES[directory] = store
+        return store
@@ -0,0 +1,323 @@
+"""Token-budgeted packing of search results into summarizer context."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Collection, Iterable
+
+from utils import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# 段落切分：超过该长度的段落按句子再切开，避免一个大段落挤占全部预算
+MAX_PASSAGE_CHARS = 800
+MIN_PASSAGE_CHARS = 40
+# 在多个页面中重复出现、且不超过该长度的段落视为页脚/署名等模板内容直接丢弃；
+# 更长的重复段落（镜像、转载页面）保留，由 MinHash 去重只选入排名最高的一份
+REPEATED_BOILERPLATE_CHARS = 2 * MIN_PASSAGE_CHARS
+
+# MinHash（bottom-k 草图）参数：字符 5-gram，保留最小的 64 个哈希值
+SHINGLE_SIZE = 5
+SKETCH_SIZE = 64
+NEAR_DUPLICATE_THRESHOLD = 0.7
+
+# BM25 参数
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+# 搜索服务商返回的摘要通常最贴题，且搜索排名靠前的结果略微加权
+_SNIPPET_BOOST = 1.5
+_RANK_DECAY = 0.1
+
+_HASH_MASK = (1 << 64) - 1
+_WORD_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+_SENTENCE_RE = re.compile(r"(?<=[。！？!?；;])|(?<=\.)\s+")
+_MARKDOWN_LINK_RE = re.compile(r"\[[^\]]*\]\([^)]*\)|https?://\S+")
+_BOILERPLATE_RE = re.compile(
+    r"cookie|copyright|all rights reserved|privacy policy|terms of (use|service)|"
+    r"subscribe|sign in|log in|newsletter|advertisement|skip to (main )?content|"
+    r"版权所有|隐私政策|用户协议|登录|注册|订阅|广告|备案|联系我们|关注我们|扫码|免责声明",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Passage:
+    """A paragraph of one search result."""
+
+    source_index: int
+    order: int
+    text: str
+    is_snippet: bool = False
+    score: float = 0.0
+    terms: Counter = field(default_factory=Counter)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count using the same ratio as the rest of the backend."""
+
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split())
+
+
+def tokenize(text: str) -> list[str]:
+    """Latin words plus CJK character bigrams, enough for lexical relevance."""
+
+    terms: list[str] = []
+    for word in _WORD_RE.findall(_normalize(text)):
+        if word[0].isascii():
+            terms.append(word)
+        elif len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def minhash_sketch(text: str) -> frozenset[int]:
+    """Bottom-k MinHash sketch of the character shingles of ``text``."""
+
+    normalized = _normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i : i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return frozenset(heapq.nsmallest(SKETCH_SIZE, {hash(item) & _HASH_MASK for item in shingles}))
+
+
+def estimate_similarity(left: frozenset[int], right: frozenset[int]) -> float:
+    """Estimate Jaccard similarity of two bottom-k sketches."""
+
+    if not left or not right:
+        return 0.0
+    union_sketch = sorted(left | right)[:SKETCH_SIZE]
+    return len(left.intersection(right, union_sketch)) / len(union_sketch)
+
+
+class _SketchIndex:
+    """Inverted index over sketch values so each lookup only compares plausible matches."""
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self._sketches: list[frozenset[int]] = []
+        self._postings: dict[int, list[int]] = {}
+
+    def has_near_duplicate(self, sketch: frozenset[int]) -> bool:
+        shared: Counter = Counter()
+        for value in sketch:
+            shared.update(self._postings.get(value, ()))
+        for index, count in shared.items():
+            other = self._sketches[index]
+            # 估计值不超过 |A∩B| / max(|A|, |B|)，先用它排除大部分候选
+            if count < self.threshold * max(len(sketch), len(other)):
+                continue
+            if estimate_similarity(sketch, other) >= self.threshold:
+                return True
+        return False
+
+    def add(self, sketch: frozenset[int]) -> None:
+        index = len(self._sketches)
+        self._sketches.append(sketch)
+        for value in sketch:
+            self._postings.setdefault(value, []).append(index)
+
+
+def split_passages(text: str) -> list[str]:
+    """Split page text into paragraphs, breaking long ones at sentence ends."""
+
+    passages: list[str] = []
+    for block in re.split(r"\n\s*\n|\n(?=#)", text):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= MAX_PASSAGE_CHARS:
+            passages.append(block)
+            continue
+        current = ""
+        for sentence in _SENTENCE_RE.split(block):
+            if not sentence:
+                continue
+            if current and len(current) + len(sentence) > MAX_PASSAGE_CHARS:
+                passages.append(current.strip())
+                current = ""
+            current += sentence
+            while len(current) > MAX_PASSAGE_CHARS:
+                passages.append(current[:MAX_PASSAGE_CHARS].strip())
+                current = current[MAX_PASSAGE_CHARS:]
+        if current.strip():
+            passages.append(current.strip())
+    return passages
+
+
+def is_boilerplate(text: str, query_terms: Collection[str] = ()) -> bool:
+    """Navigation, link lists, cookie banners and similar page chrome.
+
+    关键词（登录、订阅、cookie 等）只用于识别链接较多或没有完整句子的短段落，
+    且段落与 ``query_terms`` 没有共同词项时才丢弃，正文中顺带提到这些词的段落保留。
+    """
+
+    stripped = _MARKDOWN_LINK_RE.sub("", text).strip()
+    if len(text) >= 20 and len(stripped) < len(text) * 0.3:
+        return True
+    has_sentence = bool(re.search(r"[。.!?！？]", stripped))
+    if len(stripped) < MIN_PASSAGE_CHARS and not has_sentence:
+        return True
+    if len(text) >= 300 or not _BOILERPLATE_RE.search(text):
+        return False
+    chrome_shaped = len(stripped) < len(text) * 0.7 or not has_sentence
+    return chrome_shaped and not any(term in query_terms for term in tokenize(text))
+
+
+def _is_repeated_chrome(text: str, occurrences: Counter, query_terms: Collection[str]) -> bool:
+    if is_boilerplate(text, query_terms):
+        return True
+    return occurrences[_normalize(text)] >= 2 and len(text) <= REPEATED_BOILERPLATE_CHARS
+
+
+class _BM25:
+    def __init__(self, passages: list[Passage]) -> None:
+        self.size = len(passages)
+        self.avg_length = sum(sum(p.terms.values()) for p in passages) / max(1, self.size) or 1.0
+        self.document_frequency: Counter = Counter()
+        for passage in passages:
+            self.document_frequency.update(passage.terms.keys())
+
+    def score(self, query_terms: Iterable[str], passage: Passage) -> float:
+        length = sum(passage.terms.values())
+        total = 0.0
+        for term in query_terms:
+            frequency = passage.terms.get(term)
+            if not frequency:
+                continue
+            df = self.document_frequency[term]
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            norm = frequency + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / self.avg_length)
+            total += idf * frequency * (_BM25_K1 + 1) / norm
+        return total
+
+
+def _source_body(source: dict[str, Any], fetch_full_page: bool) -> str:
+    raw_content = source.get("raw_content") if fetch_full_page else None
+    if not raw_content:
+        return ""
+    return raw_content.removesuffix("... [truncated]")
+
+
+def pack_sources(
+    sources: list[dict[str, Any]],
+    query: str,
+    token_budget: int,
+    *,
+    fetch_full_page: bool = False,
+) -> str:
+    """Select the most relevant, non-redundant passages that fit ``token_budget``.
+
+    1. 按 URL 去重，将摘要与正文切分为段落；
+    2. 去除导航、版权声明等模板段落，以及在多个页面中重复出现的短段落（页脚等）；
+    3. 按与 ``query`` 的 BM25 相关度排序，依次选入，跳过与已选段落近似重复
+       （MinHash 估计的相似度超过阈值）的段落，直到用完预算。镜像页面中重复的
+       正文段落因此只保留排名最高（来源靠前）的一份；
+    4. 按来源和原文顺序输出，保持与原格式一致的来源标注。
+    """
+
+    unique_sources: list[dict[str, Any]] = []
+    seen_urls: set[str] = set()
+    for source in sources:
+        url = source.get("url")
+        if not url or url in seen_urls:
+            continue
+        seen_urls.add(url)
+        unique_sources.append(source)
+
+    passages: list[Passage] = []
+    occurrences: Counter = Counter()
+    for index, source in enumerate(unique_sources):
+        snippet = (source.get("content") or "").strip()
+        if snippet:
+            passages.append(Passage(index, 0, snippet, is_snippet=True))
+        keys_in_source: set[str] = set()
+        for order, text in enumerate(split_passages(_source_body(source, fetch_full_page)), start=1):
+            passages.append(Passage(index, order, text))
+            keys_in_source.add(_normalize(text))
+        occurrences.update(keys_in_source)
+
+    query_terms = set(tokenize(query))
+    candidates = [
+        passage
+        for passage in passages
+        if passage.is_snippet or not _is_repeated_chrome(passage.text, occurrences, query_terms)
+    ]
+    for passage in candidates:
+        passage.terms = Counter(tokenize(passage.text))
+
+    bm25 = _BM25(candidates)
+    for passage in candidates:
+        score = bm25.score(query_terms, passage)
+        if passage.is_snippet:
+            score = (score + 1.0) * _SNIPPET_BOOST
+        passage.score = score / (1 + _RANK_DECAY * passage.source_index)
+
+    headers = {
+        index: f"信息来源: {source.get('title') or source.get('url', '')}\n\nURL: {source.get('url', '')}\n\n"
+        for index, source in enumerate(unique_sources)
+    }
+    # 每个来源的“信息内容/相关段落”标签与段落间的空行
+    label_tokens = estimate_tokens("信息内容: 相关段落:\n")
+
+    remaining = token_budget
+    selected: list[Passage] = []
+    sketches = _SketchIndex(NEAR_DUPLICATE_THRESHOLD)
+    used_sources: set[int] = set()
+    ranked = sorted(candidates, key=lambda p: (-p.score, p.source_index, p.order))
+    for passage in ranked:
+        cost = passage.tokens + 1
+        if passage.source_index not in used_sources:
+            cost += estimate_tokens(headers[passage.source_index]) + label_tokens
+        if cost > remaining:
+            continue
+        sketch = minhash_sketch(passage.text)
+        if sketches.has_near_duplicate(sketch):
+            continue
+        selected.append(passage)
+        sketches.add(sketch)
+        used_sources.add(passage.source_index)
+        remaining -= cost
+
+    by_source: dict[int, list[Passage]] = {}
+    for passage in sorted(selected, key=lambda p: (p.source_index, p.order)):
+        by_source.setdefault(passage.source_index, []).append(passage)
+
+    parts: list[str] = []
+    for index, chosen in by_source.items():
+        parts.append(headers[index])
+        snippets = [p.text for p in chosen if p.is_snippet]
+        details = [p.text for p in chosen if not p.is_snippet]
+        if snippets:
+            parts.append(f"信息内容: {snippets[0]}\n\n")
+        if details:
+            parts.append("相关段落:\n" + "\n\n".join(details) + "\n\n")
+
+    packed = "".join(parts).strip()
+    logger.debug(
+        "Packed %d/%d passages from %d sources into ~%d tokens (budget %d)",
+        len(selected),
+        len(passages),
+        len(by_source),
+        token_budget - remaining,
+        token_budget,
+    )
+    return packed
@@ -57,6 +57,7 @@ class PlanningService:
                 title=title,
                 intent=intent,
                 query=query,
+                blocking=self._parse_flag(item.get("blocking")),
             )
             todo_items.append(task)
 
@@ -80,6 +81,14 @@ class PlanningService:
     # ------------------------------------------------------------------
     # Parsing helpers
     # ------------------------------------------------------------------
+    @staticmethod
+    def _parse_flag(value: Any) -> bool:
+        """Interpret JSON booleans as well as "true"/"yes"/"1" strings."""
+
+        if isinstance(value, str):
+            return value.strip().lower() in {"true", "yes", "1", "是"}
+        return bool(value)
+
     def _extract_tasks(self, raw_response: str) -> List[dict[str, Any]]:
         """Parse planner output into a list of task dictionaries."""
 
@@ -3,21 +3,44 @@
 from __future__ import annotations
 
 import json
+import logging
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from threading import Event, Lock
+from typing import Optional, Tuple
 
 from hello_agents import ToolAwareSimpleAgent
 
-from models import SummaryState
+from models import SummaryState, TodoItem
 from config import Configuration
 from utils import strip_thinking_tokens
-from services.text_processing import strip_tool_calls
+from services.text_processing import ThinkTagFilter, strip_tool_calls
+
+logger = logging.getLogger(__name__)
+
+# 单个章节草稿失败时的重试次数，仍失败则退回到任务总结本身
+SECTION_RETRIES = 1
 
 
 class ReportingService:
-    """Generates the final structured report."""
+    """Generates the final structured report.
+
+    除一次性生成外，还支持 map-reduce 方式：每个任务完成后立即起草对应章节
+    （map），所有任务结束后只做一次整合润色（reduce），整合结果流式输出。
+    """
 
-    def __init__(self, report_agent: ToolAwareSimpleAgent, config: Configuration) -> None:
+    def __init__(
+        self,
+        report_agent: ToolAwareSimpleAgent,
+        config: Configuration,
+        *,
+        section_agent_factory: Optional[Callable[[], ToolAwareSimpleAgent]] = None,
+        merge_agent_factory: Optional[Callable[[], ToolAwareSimpleAgent]] = None,
+    ) -> None:
         self._agent = report_agent
         self._config = config
+        self._section_agent_factory = section_agent_factory
+        self._merge_agent_factory = merge_agent_factory
 
     def generate_report(self, state: SummaryState) -> str:
         """Generate a structured report based on completed tasks."""
@@ -75,3 +98,182 @@ class ReportingService:
 
         return report_text or "报告生成失败，请检查输入。"
 
+
+    # ------------------------------------------------------------------
+    # Map: per-task section drafts
+    # ------------------------------------------------------------------
+    def draft_section(self, state: SummaryState, task: TodoItem) -> str:
+        """Draft the report section of a single finished task."""
+
+        if task.status != "completed" or not task.summary or self._section_agent_factory is None:
+            return self._fallback_section(task)
+
+        prompt = (
+            f"研究主题：{state.research_topic}\n"
+            f"任务编号：{task.id}\n"
+            f"任务名称：{task.title}\n"
+            f"任务目标：{task.intent}\n"
+            f"任务总结：\n{task.summary}\n"
+            f"来源概览：\n{task.sources_summary or '暂无来源'}\n"
+            "请输出该任务对应的报告章节草稿。"
+        )
+
+        for attempt in range(SECTION_RETRIES + 1):
+            agent = self._section_agent_factory()
+            try:
+                section = self._clean(agent.run(prompt))
+            except Exception as exc:  # pragma: no cover - network failures
+                logger.warning(
+                    "Drafting section for task %s failed (attempt %d): %s",
+                    task.id,
+                    attempt + 1,
+                    exc,
+                )
+                continue
+            finally:
+                agent.clear_history()
+            if section:
+                return section
+
+        return self._fallback_section(task)
+
+    # ------------------------------------------------------------------
+    # Reduce: merge drafted sections
+    # ------------------------------------------------------------------
+    def merge_report(self, state: SummaryState) -> str:
+        """Blocking variant of :meth:`stream_merged_report`."""
+
+        stream, get_report = self.stream_merged_report(state)
+        for _ in stream:
+            pass
+        return get_report()
+
+    def stream_merged_report(self, state: SummaryState) -> Tuple[Iterator[str], Callable[[], str]]:
+        """Stream the merge pass over the drafted sections."""
+
+        sections = [task.report_section or self._fallback_section(task) for task in state.todo_items]
+        sources = [
+            f"- 任务 {task.id}《{task.title}》：\n{task.sources_summary}"
+            for task in state.todo_items
+            if task.sources_summary
+        ]
+        sections_block = "\n\n".join(sections)
+        sources_block = "\n".join(sources) or "暂无来源"
+        prompt = (
+            f"研究主题：{state.research_topic}\n"
+            f"章节草稿：\n\n{sections_block}\n\n"
+            f"来源列表：\n{sources_block}\n"
+            "请整合以上章节草稿，输出最终研究报告。"
+        )
+
+        think_filter = ThinkTagFilter() if self._config.strip_thinking_tokens else None
+        visible_parts: list[str] = []
+        agent = self._merge_agent_factory() if self._merge_agent_factory else self._agent
+
+        def generator() -> Iterator[str]:
+            try:
+                for chunk in agent.stream_run(prompt):
+                    segment = think_filter.feed(chunk) if think_filter else chunk
+                    if segment:
+                        visible_parts.append(segment)
+                        yield segment
+                if think_filter:
+                    tail = think_filter.finish()
+                    if tail:
+                        visible_parts.append(tail)
+                        yield tail
+            finally:
+                agent.clear_history()
+
+        def get_report() -> str:
+            report = strip_tool_calls("".join(visible_parts)).strip()
+            # 整合失败时至少返回各章节草稿
+            return report or "\n\n".join(sections)
+
+        return generator(), get_report
+
+    def _clean(self, text: str) -> str:
+        text = text.strip()
+        if self._config.strip_thinking_tokens:
+            text = strip_thinking_tokens(text)
+        return strip_tool_calls(text).strip()
+
+    @staticmethod
+    def _fallback_section(task: TodoItem) -> str:
+        body = task.summary if task.status == "completed" and task.summary else "暂无相关信息"
+        return f"### 任务 {task.id}: {task.title}\n- 执行状态：{task.status}\n{body}\n"
+
+
+class SectionDrafter:
+    """Draft report sections in the background as soon as tasks finish.
+
+    每个任务只保留最新一次提交的草稿；任务失败时只重新起草它自己的章节，
+    其他章节不受影响。已有草稿（例如从检查点恢复）的任务不会重复起草。
+    """
+
+    def __init__(
+        self,
+        reporting: ReportingService,
+        state: SummaryState,
+        *,
+        max_workers: int,
+        on_drafted: Optional[Callable[[TodoItem], None]] = None,
+    ) -> None:
+        self._reporting = reporting
+        self._state = state
+        self._on_drafted = on_drafted
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="report-section",
+        )
+        self._futures: dict[int, Future] = {}
+        self._generations: dict[int, int] = {}
+        self._lock = Lock()
+
+    def submit(self, task: TodoItem) -> None:
+        with self._lock:
+            previous = self._futures.pop(task.id, None)
+            if previous is not None:
+                previous.cancel()
+            generation = self._generations.get(task.id, 0) + 1
+            self._generations[task.id] = generation
+            task.report_section = None
+            self._futures[task.id] = self._executor.submit(self._draft, task, generation)
+
+    def ensure_all(self) -> None:
+        """Queue drafts for tasks that finished earlier but have no section yet."""
+
+        for task in self._state.todo_items:
+            with self._lock:
+                queued = task.id in self._futures
+            if not queued and task.report_section is None:
+                self.submit(task)
+
+    def wait(self, cancel_event: Optional[Event] = None, poll_interval: float = 0.5) -> bool:
+        """Block until every queued draft is done; returns False when cancelled."""
+
+        while True:
+            with self._lock:
+                pending = [future for future in self._futures.values() if not future.done()]
+            if not pending:
+                return True
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            wait(pending, timeout=poll_interval)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _draft(self, task: TodoItem, generation: int) -> None:
+        try:
+            section = self._reporting.draft_section(self._state, task)
+        except Exception:  # pragma: no cover - defensive guardrail
+            logger.exception("Unexpected error while drafting section for task %s", task.id)
+            section = self._reporting._fallback_section(task)
+        with self._lock:
+            if self._generations.get(task.id) != generation:
+                # 任务已被重新提交，丢弃过期的草稿
+                return
+            task.report_section = section
+        if self._on_drafted:
+            self._on_drafted(task)
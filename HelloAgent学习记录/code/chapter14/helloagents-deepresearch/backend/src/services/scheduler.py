@@ -0,0 +1,162 @@
+"""Bounded priority scheduler shared by the blocking and streaming workflows."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from threading import Event
+from typing import Callable, Iterable, Optional
+
+from models import TodoItem
+
+logger = logging.getLogger(__name__)
+
+# 等待任务完成时的最长轮询间隔，保证取消信号能被及时发现
+_POLL_INTERVAL = 0.5
+
+
+@dataclass
+class TaskOutcome:
+    """Result of a scheduled task."""
+
+    task: TodoItem
+    status: str  # completed / failed / timeout / cancelled
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+
+@dataclass
+class _RunningTask:
+    task: TodoItem
+    token: Event
+    started_at: float
+    deadline: Optional[float]
+    timed_out: bool = field(default=False)
+
+
+TaskWorker = Callable[[TodoItem, Event], None]
+
+
+class TaskScheduler:
+    """Run TODO items on a bounded worker pool, highest priority first.
+
+    - 同时运行的任务数不超过 ``max_parallel_tasks``，避免一次打开过多 LLM / 搜索连接；
+    - 规划器标记为 ``blocking`` 的任务优先出队，其余按任务编号排序；
+    - 每个任务有独立的取消令牌：超过 ``task_timeout`` 或整个运行被取消时置位，
+      由任务自身在阶段之间检查并尽早退出。
+    """
+
+    def __init__(self, max_parallel_tasks: int, task_timeout: Optional[float] = None) -> None:
+        self.max_parallel_tasks = max(1, int(max_parallel_tasks))
+        self.task_timeout = task_timeout if task_timeout and task_timeout > 0 else None
+
+    @staticmethod
+    def priority_key(task: TodoItem) -> tuple[int, int]:
+        """Blocking tasks first, then planner order."""
+
+        return (0 if task.blocking else 1, task.id)
+
+    def run(
+        self,
+        tasks: Iterable[TodoItem],
+        worker: TaskWorker,
+        *,
+        cancel_event: Optional[Event] = None,
+        on_finish: Optional[Callable[[TaskOutcome], None]] = None,
+    ) -> list[TaskOutcome]:
+        """Execute all tasks and return their outcomes in completion order.
+
+        ``worker(task, token)`` 在线程池中运行，``token`` 置位表示任务应当停止。
+        ``on_finish`` 对每个任务恰好调用一次（包括超时与被取消的任务）。
+
+        被取消时立即返回，不等待仍在运行的任务；超时的任务不再等待其结果，
+        但其线程在退出前仍占用一个并发名额。
+        """
+
+        cancel_event = cancel_event or Event()
+        queue = [(self.priority_key(task), index, task) for index, task in enumerate(tasks)]
+        heapq.heapify(queue)
+
+        outcomes: list[TaskOutcome] = []
+        running: dict[Future, _RunningTask] = {}
+
+        def finish(outcome: TaskOutcome) -> None:
+            outcomes.append(outcome)
+            if on_finish:
+                try:
+                    on_finish(outcome)
+                except Exception:  # pragma: no cover - defensive guardrail
+                    logger.exception("Task finish callback failed")
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_parallel_tasks,
+            thread_name_prefix="research-task",
+        )
+        try:
+            while queue or running:
+                if cancel_event.is_set():
+                    break
+
+                # 回收已经退出的超时任务，释放它们占用的并发名额
+                for future in [f for f, item in running.items() if item.timed_out and f.done()]:
+                    running.pop(future)
+
+                while queue and len(running) < self.max_parallel_tasks:
+                    _, _, task = heapq.heappop(queue)
+                    now = time.monotonic()
+                    item = _RunningTask(
+                        task=task,
+                        token=Event(),
+                        started_at=now,
+                        deadline=now + self.task_timeout if self.task_timeout else None,
+                    )
+                    running[executor.submit(worker, task, item.token)] = item
+
+                waiting = [future for future, item in running.items() if not item.timed_out]
+                if not waiting and not queue:
+                    # 只剩超时的任务仍在运行，不再等待它们
+                    break
+
+                timeout = _POLL_INTERVAL
+                deadlines = [item.deadline for item in running.values() if item.deadline and not item.timed_out]
+                if deadlines:
+                    timeout = max(0.0, min(timeout, min(deadlines) - time.monotonic()))
+
+                # 队列中仍有任务时，超时任务退出也会让出名额，一并等待
+                done, _ = wait(waiting or list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = running.pop(future)
+                    if item.timed_out:
+                        continue
+                    elapsed = time.monotonic() - item.started_at
+                    error = future.exception()
+                    if error is not None:
+                        logger.error("Task %s failed: %s", item.task.id, error)
+                        finish(TaskOutcome(item.task, "failed", error, elapsed))
+                    else:
+                        finish(TaskOutcome(item.task, "completed", None, elapsed))
+
+                now = time.monotonic()
+                for item in running.values():
+                    if item.timed_out or item.deadline is None or now < item.deadline:
+                        continue
+                    item.timed_out = True
+                    item.token.set()
+                    logger.warning("Task %s exceeded %.0fs deadline", item.task.id, self.task_timeout)
+                    finish(TaskOutcome(item.task, "timeout", None, now - item.started_at))
+
+            if cancel_event.is_set():
+                for item in running.values():
+                    item.token.set()
+                    if not item.timed_out:
+                        finish(TaskOutcome(item.task, "cancelled", None, time.monotonic() - item.started_at))
+                while queue:
+                    _, _, task = heapq.heappop(queue)
+                    finish(TaskOutcome(task, "cancelled"))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return outcomes
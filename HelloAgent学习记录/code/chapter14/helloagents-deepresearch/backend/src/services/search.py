@@ -2,13 +2,28 @@
 
 from __future__ import annotations
 
+import copy
 import logging
 from typing import Any, Optional, Tuple
 
+import requests
 from hello_agents.tools import SearchTool
 
+try:
+    from markdownify import markdownify
+except ImportError:  # pragma: no cover - optional dependency
+    markdownify = None
+
 from config import Configuration
+from services.context_packer import estimate_tokens, pack_sources
+from services.search_cache import (
+    SearchCache,
+    SingleFlight,
+    get_search_cache,
+    make_search_key,
+)
 from utils import (
+    CHARS_PER_TOKEN,
     deduplicate_and_format_sources,
     format_sources,
     get_config_value,
@@ -17,8 +32,18 @@ from utils import (
 logger = logging.getLogger(__name__)
 
 MAX_TOKENS_PER_SOURCE = 2000
+MAX_RESULTS = 5
 _GLOBAL_SEARCH_TOOL = SearchTool(backend="hybrid")
 
+# 这些后端的全文模式是在本地逐个下载结果页面；改为由页面缓存下载，
+# 多个查询命中同一 URL 时只下载、只存储一次。其他后端的正文由服务商返回。
+_CLIENT_FETCH_BACKENDS = {"duckduckgo", "searxng"}
+
+# 合并并发的相同查询 / 相同页面下载
+_SEARCH_CALLS = SingleFlight()
+_PAGE_FETCHES = SingleFlight()
+_HTTP_SESSION = requests.Session()
+
 
 def dispatch_search(
     query: str,
@@ -28,23 +53,36 @@ def dispatch_search(
     """Execute configured search backend and normalise response payload."""
 
     search_api = get_config_value(config.search_api)
+    cache = _get_cache(config)
+    key = make_search_key(
+        search_api,
+        query,
+        fetch_full_page=config.fetch_full_page,
+        max_results=MAX_RESULTS,
+    )
+
+    def load() -> dict[str, Any] | str:
+        if cache is not None:
+            cached = cache.get_search(key)
+            if cached is not None:
+                logger.info("Search cache hit: backend=%s query=%s", search_api, query)
+                return cached
+
+        response = _run_search(query, search_api, config, loop_count, cache)
+        # 只缓存有结果的结构化响应，文本提示通常意味着暂时性的错误
+        if cache is not None and isinstance(response, dict) and response.get("results"):
+            cache.set_search(key, response)
+        return response
 
     try:
-        raw_response = _GLOBAL_SEARCH_TOOL.run(
-            {
-                "input": query,
-                "backend": search_api,
-                "mode": "structured",
-                "fetch_full_page": config.fetch_full_page,
-                "max_results": 5,
-                "max_tokens_per_source": MAX_TOKENS_PER_SOURCE,
-                "loop_count": loop_count,
-            }
-        )
+        raw_response = _SEARCH_CALLS.do(key, load)
     except Exception as exc:  # pragma: no cover - defensive logging
         logger.exception("Search backend %s failed: %s", search_api, exc)
         raise
 
+    # 合并的调用共享同一个结果对象，复制一份避免相互影响
+    raw_response = copy.deepcopy(raw_response)
+
     if isinstance(raw_response, str):
         notices = [raw_response]
         logger.warning("Search backend %s returned text notice: %s", search_api, raw_response)
@@ -77,19 +115,120 @@ def dispatch_search(
     return payload, notices, answer_text, backend_label
 
 
+def _get_cache(config: Configuration) -> SearchCache | None:
+    """Return the persistent search cache, or None when disabled/unavailable."""
+
+    if not config.search_cache_enabled:
+        return None
+    try:
+        return get_search_cache(
+            config.search_cache_path,
+            search_ttl=config.search_cache_ttl,
+            page_ttl=config.page_cache_ttl,
+        )
+    except Exception as exc:  # pragma: no cover - defensive logging
+        logger.warning("Search cache unavailable (%s): %s", config.search_cache_path, exc)
+        return None
+
+
+def _run_search(
+    query: str,
+    search_api: str,
+    config: Configuration,
+    loop_count: int,
+    cache: SearchCache | None,
+) -> dict[str, Any] | str:
+    """Call the search tool; fetch full pages through the page cache when possible."""
+
+    fetch_pages_locally = config.fetch_full_page and search_api in _CLIENT_FETCH_BACKENDS
+    response = _GLOBAL_SEARCH_TOOL.run(
+        {
+            "input": query,
+            "backend": search_api,
+            "mode": "structured",
+            "fetch_full_page": config.fetch_full_page and not fetch_pages_locally,
+            "max_results": MAX_RESULTS,
+            "max_tokens_per_source": MAX_TOKENS_PER_SOURCE,
+            "loop_count": loop_count,
+        }
+    )
+
+    if fetch_pages_locally and isinstance(response, dict):
+        for result in response.get("results", []):
+            url = result.get("url")
+            if not url:
+                continue
+            page = _fetch_page(url, cache)
+            if page:
+                result["raw_content"] = _limit_text(page, MAX_TOKENS_PER_SOURCE)
+
+    return response
+
+
+def _fetch_page(url: str, cache: SearchCache | None) -> Optional[str]:
+    """Download a page once; later and concurrent requests reuse the stored copy."""
+
+    if cache is not None:
+        cached = cache.get_page(url)
+        if cached is not None:
+            return cached
+
+    def download() -> Optional[str]:
+        try:
+            response = _HTTP_SESSION.get(url, timeout=10)
+            response.raise_for_status()
+        except Exception as exc:  # pragma: no cover - network failures
+            logger.debug("Failed to fetch raw content for %s: %s", url, exc)
+            return None
+
+        text = response.text
+        if markdownify is not None:
+            try:
+                text = markdownify(text)
+            except Exception as exc:  # pragma: no cover - optional dependency failure
+                logger.debug("markdownify failed for %s: %s", url, exc)
+
+        if cache is not None:
+            cache.set_page(url, text)
+        return text
+
+    return _PAGE_FETCHES.do(url, download)
+
+
+def _limit_text(text: str, token_limit: int) -> str:
+    char_limit = token_limit * CHARS_PER_TOKEN
+    if len(text) <= char_limit:
+        return text
+    return text[:char_limit] + "... [truncated]"
+
+
 def prepare_research_context(
     search_result: dict[str, Any] | None,
     answer_text: Optional[str],
     config: Configuration,
+    query: Optional[str] = None,
 ) -> tuple[str, str]:
     """Build structured context and source summary for downstream agents."""
 
     sources_summary = format_sources(search_result)
-    context = deduplicate_and_format_sources(
-        search_result or {"results": []},
-        max_tokens_per_source=MAX_TOKENS_PER_SOURCE,
-        fetch_full_page=config.fetch_full_page,
-    )
+    results = (search_result or {}).get("results", [])
+    budget = config.context_token_budget
+
+    if budget > 0:
+        if answer_text:
+            budget = max(0, budget - estimate_tokens(answer_text))
+        context = pack_sources(
+            results,
+            query or "",
+            budget,
+            fetch_full_page=config.fetch_full_page,
+        )
+    else:
+        context = deduplicate_and_format_sources(
+            results,
+            max_tokens_per_source=MAX_TOKENS_PER_SOURCE,
+            fetch_full_page=config.fetch_full_page,
+        )
 
     if answer_text:
         context = f"AI直接答案：\n{answer_text}\n\n{context}"
@@ -0,0 +1,275 @@
+"""Persistent search cache with content-addressed page storage."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import unicodedata
+from concurrent.futures import Future
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, width and whitespace so trivially different queries share a key."""
+
+    text = unicodedata.normalize("NFKC", query or "").casefold()
+    return " ".join(text.split())
+
+
+def make_search_key(backend: str, query: str, *, fetch_full_page: bool, max_results: int) -> str:
+    """Cache key: backend + normalized query + fetch mode."""
+
+    return json.dumps(
+        [backend, normalize_query(query), bool(fetch_full_page), int(max_results)],
+        ensure_ascii=False,
+    )
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Merge concurrent calls for the same key into one execution."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._calls: dict[str, Future] = {}
+        self.merged = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.merged += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class SearchCache:
+    """SQLite store for search payloads and fetched pages.
+
+    - ``searches``: 缓存键 -> 结构化搜索结果（不含 raw_content，只保存内容哈希）；
+    - ``pages``:    URL -> 内容哈希，记录某个页面最近一次下载的结果；
+    - ``contents``: 内容哈希 -> 页面正文，同一正文只保存一份；
+    - ``search_contents``: 搜索结果引用了哪些正文，用于清理无人引用的正文。
+    """
+
+    def __init__(self, db_path: str, *, search_ttl: float, page_ttl: float) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.search_ttl = search_ttl
+        self.page_ttl = page_ttl
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS contents (
+                hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS search_contents (
+                key TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (key, hash)
+            );
+            """
+        )
+        self._conn.commit()
+
+        self.search_hits = 0
+        self.search_misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+
+    # ------------------------------------------------------------------
+    # Search payloads
+    # ------------------------------------------------------------------
+    def get_search(self, key: str) -> Optional[dict[str, Any]]:
+        """Return the cached payload with raw_content restored, or None."""
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM searches WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or row[1] <= time.time():
+                self.search_misses += 1
+                return None
+
+            payload = json.loads(row[0])
+            for result in payload.get("results", []):
+                digest = result.pop("raw_content_hash", None)
+                if digest is None:
+                    continue
+                content_row = self._conn.execute(
+                    "SELECT content FROM contents WHERE hash = ?",
+                    (digest,),
+                ).fetchone()
+                if content_row is not None:
+                    result["raw_content"] = content_row[0]
+            self.search_hits += 1
+            return payload
+
+    def set_search(self, key: str, payload: dict[str, Any]) -> None:
+        """Store a payload; raw_content of every result is stored once by hash."""
+
+        now = time.time()
+        stored = dict(payload)
+        stored_results = []
+        with self._lock:
+            self._conn.execute("DELETE FROM search_contents WHERE key = ?", (key,))
+            for result in payload.get("results", []):
+                item = dict(result)
+                raw_content = item.pop("raw_content", None)
+                if raw_content is not None:
+                    digest = self._put_content(raw_content)
+                    item["raw_content_hash"] = digest
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO search_contents (key, hash) VALUES (?, ?)",
+                        (key, digest),
+                    )
+                stored_results.append(item)
+            stored["results"] = stored_results
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches (key, payload, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(stored, ensure_ascii=False), now + self.search_ttl, now),
+            )
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Pages
+    # ------------------------------------------------------------------
+    def get_page(self, url: str) -> Optional[str]:
+        """Return the stored content of ``url`` if it has not expired."""
+
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT contents.content FROM pages
+                JOIN contents ON contents.hash = pages.content_hash
+                WHERE pages.url = ? AND pages.expires_at > ?
+                """,
+                (url, time.time()),
+            ).fetchone()
+            if row is None:
+                self.page_misses += 1
+                return None
+            self.page_hits += 1
+            return row[0]
+
+    def set_page(self, url: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            digest = self._put_content(content)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, content_hash, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (url, digest, now + self.page_ttl, now),
+            )
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    def purge_expired(self) -> int:
+        """Delete expired entries and orphaned contents; return removed rows."""
+
+        now = time.time()
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM searches WHERE expires_at <= ?", (now,)).rowcount
+            removed += self._conn.execute("DELETE FROM pages WHERE expires_at <= ?", (now,)).rowcount
+            self._conn.execute("DELETE FROM search_contents WHERE key NOT IN (SELECT key FROM searches)")
+            removed += self._conn.execute(
+                """
+                DELETE FROM contents
+                WHERE hash NOT IN (SELECT content_hash FROM pages)
+                  AND hash NOT IN (SELECT hash FROM search_contents)
+                """
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            searches = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+            pages = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            contents, content_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM contents"
+            ).fetchone()
+        lookups = self.search_hits + self.search_misses
+        return {
+            "searches": searches,
+            "pages": pages,
+            "contents": contents,
+            "content_bytes": content_bytes,
+            "search_hits": self.search_hits,
+            "search_misses": self.search_misses,
+            "search_hit_ratio": round(self.search_hits / lookups, 4) if lookups else 0.0,
+            "page_hits": self.page_hits,
+            "page_misses": self.page_misses,
+        }
+
+    def _put_content(self, content: str) -> str:
+        """Insert content if unseen and return its hash (caller holds the lock)."""
+
+        digest = content_hash(content)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO contents (hash, content, size) VALUES (?, ?, ?)",
+            (digest, content, len(content.encode("utf-8"))),
+        )
+        return digest
+
+
+_CACHES: dict[str, SearchCache] = {}
+_CACHES_LOCK = Lock()
+
+
+def get_search_cache(db_path: str, *, search_ttl: float, page_ttl: float) -> SearchCache:
+    """Return the process-wide cache for ``db_path``."""
+
+    with _CACHES_LOCK:
+        cache = _CACHES.get(db_path)
+        if cache is None:
+            cache = SearchCache(db_path, search_ttl=search_ttl, page_ttl=page_ttl)
+            _CACHES[db_path] = cache
+        return cache
@@ -11,7 +11,7 @@ from models import SummaryState, TodoItem
 from config import Configuration
 from utils import strip_thinking_tokens
 from services.notes import build_note_guidance
-from services.text_processing import strip_tool_calls
+from services.text_processing import ThinkTagFilter, strip_tool_calls
 
 
 class SummarizationService:
@@ -50,64 +50,29 @@ class SummarizationService:
         """Stream the summary text for a task while collecting full output."""
 
         prompt = self._build_prompt(state, task, context)
-        remove_thinking = self._config.strip_thinking_tokens
-        raw_buffer = ""
-        visible_output = ""
-        emit_index = 0
+        think_filter = ThinkTagFilter() if self._config.strip_thinking_tokens else None
+        visible_parts: list[str] = []
         agent = self._agent_factory()
 
-        def flush_visible() -> Iterator[str]:
-            nonlocal emit_index, raw_buffer
-            while True:
-                start = raw_buffer.find("<think>", emit_index)
-                if start == -1:
-                    if emit_index < len(raw_buffer):
-                        segment = raw_buffer[emit_index:]
-                        emit_index = len(raw_buffer)
-                        if segment:
-                            yield segment
-                    break
-
-                if start > emit_index:
-                    segment = raw_buffer[emit_index:start]
-                    emit_index = start
-                    if segment:
-                        yield segment
-
-                end = raw_buffer.find("</think>", start)
-                if end == -1:
-                    break
-                emit_index = end + len("</think>")
-
         def generator() -> Iterator[str]:
-            nonlocal raw_buffer, visible_output, emit_index
             try:
                 for chunk in agent.stream_run(prompt):
-                    raw_buffer += chunk
-                    if remove_thinking:
-                        for segment in flush_visible():
-                            visible_output += segment
-                            if segment:
-                                yield segment
-                    else:
-                        visible_output += chunk
-                        if chunk:
-                            yield chunk
+                    segment = think_filter.feed(chunk) if think_filter else chunk
+                    if segment:
+                        visible_parts.append(segment)
+                        yield segment
+                if think_filter:
+                    tail = think_filter.finish()
+                    if tail:
+                        visible_parts.append(tail)
+                        yield tail
             finally:
-                if remove_thinking:
-                    for segment in flush_visible():
-                        visible_output += segment
-                        if segment:
-                            yield segment
+                # 不在 finally 中 yield，任务被取消时生成器可以被正常关闭
                 agent.clear_history()
 
         def get_summary() -> str:
-            if remove_thinking:
-                cleaned = strip_thinking_tokens(visible_output)
-            else:
-                cleaned = visible_output
-
-            return strip_tool_calls(cleaned).strip()
+            # 思考段已在流式过滤时移除
+            return strip_tool_calls("".join(visible_parts)).strip()
 
         return generator(), get_summary
 
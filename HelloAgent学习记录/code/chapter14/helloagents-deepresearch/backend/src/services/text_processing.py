@@ -4,6 +4,83 @@ from __future__ import annotations
 
 import re
 
+THINK_OPEN_TAG = "<think>"
+THINK_CLOSE_TAG = "</think>"
+
+
+def _partial_tag_length(text: str, tag: str, start: int) -> int:
+    """Length of the longest suffix of ``text[start:]`` that is a proper prefix of ``tag``."""
+
+    for size in range(min(len(tag) - 1, len(text) - start), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkTagFilter:
+    """Incrementally remove ``<think>...</think>`` sections from streamed text.
+
+    每个分片只被扫描一次；跨分片的标签只需保留不超过标签长度的尾部窗口，
+    因此总耗时与输出长度成线性关系。
+
+    ``keep_unclosed=True`` 时，结束时仍未闭合的思考段会原样返回（与一次性清理
+    的语义一致）；否则直接丢弃（流式输出时不展示未完成的思考内容）。
+    """
+
+    def __init__(self, *, keep_unclosed: bool = False) -> None:
+        self._keep_unclosed = keep_unclosed
+        self._inside = False
+        self._carry = ""
+        self._hidden: list[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that is safe to show."""
+
+        text = self._carry + chunk if self._carry else chunk
+        self._carry = ""
+        visible: list[str] = []
+        pos = 0
+
+        while pos < len(text):
+            if not self._inside:
+                start = text.find(THINK_OPEN_TAG, pos)
+                if start == -1:
+                    keep = _partial_tag_length(text, THINK_OPEN_TAG, pos)
+                    visible.append(text[pos : len(text) - keep])
+                    self._carry = text[len(text) - keep :]
+                    break
+                visible.append(text[pos:start])
+                self._inside = True
+                if self._keep_unclosed:
+                    self._hidden = [THINK_OPEN_TAG]
+                pos = start + len(THINK_OPEN_TAG)
+            else:
+                end = text.find(THINK_CLOSE_TAG, pos)
+                if end == -1:
+                    keep = _partial_tag_length(text, THINK_CLOSE_TAG, pos)
+                    if self._keep_unclosed:
+                        self._hidden.append(text[pos : len(text) - keep])
+                    self._carry = text[len(text) - keep :]
+                    break
+                self._inside = False
+                self._hidden = []
+                pos = end + len(THINK_CLOSE_TAG)
+
+        return "".join(visible)
+
+    def finish(self) -> str:
+        """Flush the remaining window and reset the filter."""
+
+        tail = self._carry
+        if self._inside:
+            tail = "".join(self._hidden) + tail if self._keep_unclosed else ""
+
+        self._inside = False
+        self._carry = ""
+        self._hidden = []
+        return tail
+
+
 
 def strip_tool_calls(text: str) -> str:
     """移除文本中的工具调用标记。"""
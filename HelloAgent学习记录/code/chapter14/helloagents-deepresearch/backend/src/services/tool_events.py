@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import logging
 import re
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from pathlib import Path
 from threading import Lock
@@ -28,13 +29,44 @@ class ToolCallEvent:
     note_id: Optional[str]
 
 
+@dataclass
+class NoteRecord:
+    """Latest known state of a note written through the note tool."""
+
+    note_id: str
+    event_id: int
+    action: Optional[str]
+    note_type: Optional[str]
+    title: Optional[str]
+    task_id: Optional[int]
+
+
+DEFAULT_SUBSCRIBER = "default"
+
+
 class ToolCallTracker:
-    """Collects tool call events and converts them to SSE payloads."""
+    """Collects tool call events and converts them to SSE payloads.
+
+    - 事件保存在容量为 ``max_events`` 的环形缓冲区中，超出后丢弃最旧的事件；
+    - 按 task_id / 工具名建立事件索引，按 note_id 保存笔记的最新状态，查询均为 O(1)；
+    - 每个订阅者拥有独立的游标，多个消费方读取同一事件流时互不影响。
+    """
 
-    def __init__(self, notes_workspace: Optional[str]) -> None:
+    def __init__(self, notes_workspace: Optional[str], max_events: int = 1000, max_notes: int = 256) -> None:
         self._notes_workspace = notes_workspace
-        self._events: list[ToolCallEvent] = []
-        self._cursor = 0
+        self._max_events = max(1, max_events)
+        self._max_notes = max(1, max_notes)
+        self._events: dict[int, ToolCallEvent] = {}
+        self._first_id = 1
+        self._next_id = 1
+        self._by_task: dict[int, deque[int]] = {}
+        self._by_tool: dict[str, deque[int]] = {}
+        self._notes: OrderedDict[str, NoteRecord] = OrderedDict()
+        self._task_notes: dict[int, str] = {}
+        self._cursors: dict[str, int] = {DEFAULT_SUBSCRIBER: 0}
+        self._bound_tasks: Optional[list[TodoItem]] = None
+        self._bound_count = 0
+        self._task_lookup: dict[int, TodoItem] = {}
         self._lock = Lock()
         self._event_sink: Optional[Callable[[dict[str, Any]], None]] = None
 
@@ -58,19 +90,19 @@ class ToolCallTracker:
             if note_id is None:
                 note_id = self._extract_note_id(result_text)
 
-        event = ToolCallEvent(
-            id=len(self._events) + 1,
-            agent=agent_name,
-            tool=tool_name,
-            raw_parameters=raw_parameters,
-            parsed_parameters=parsed_parameters,
-            result=result_text,
-            task_id=task_id,
-            note_id=note_id,
-        )
-
         with self._lock:
-            self._events.append(event)
+            event = ToolCallEvent(
+                id=self._next_id,
+                agent=agent_name,
+                tool=tool_name,
+                raw_parameters=raw_parameters,
+                parsed_parameters=parsed_parameters,
+                result=result_text,
+                task_id=task_id,
+                note_id=note_id,
+            )
+            self._next_id += 1
+            self._append(event)
 
         logger.info(
             "Tool call recorded: agent=%s tool=%s task_id=%s note_id=%s parsed_parameters=%s",
@@ -85,25 +117,64 @@ class ToolCallTracker:
         if sink:
             sink(self._build_payload(event, step=None))
 
+    # ------------------------------------------------------------------
+    # Subscribers
+    # ------------------------------------------------------------------
+    def subscribe(self, name: str, *, from_start: bool = False) -> None:
+        """Register a consumer; it sees events recorded after this call (or all buffered ones)."""
+
+        with self._lock:
+            self._cursors[name] = self._first_id - 1 if from_start else self._next_id - 1
+
+    def unsubscribe(self, name: str) -> None:
+        with self._lock:
+            if name != DEFAULT_SUBSCRIBER:
+                self._cursors.pop(name, None)
+
+    def read(self, subscriber: str = DEFAULT_SUBSCRIBER) -> list[ToolCallEvent]:
+        """Return events the subscriber has not seen yet and advance its cursor."""
+
+        with self._lock:
+            cursor = self._cursors.get(subscriber)
+            if cursor is None:
+                raise KeyError(f"Unknown tool event subscriber: {subscriber}")
+            if cursor + 1 < self._first_id:
+                logger.warning(
+                    "Tool event subscriber %s fell behind; %d events were dropped",
+                    subscriber,
+                    self._first_id - cursor - 1,
+                )
+                cursor = self._first_id - 1
+            events = [self._events[event_id] for event_id in range(cursor + 1, self._next_id)]
+            self._cursors[subscriber] = self._next_id - 1
+        return events
+
     # ------------------------------------------------------------------
     # Draining helpers
     # ------------------------------------------------------------------
-    def drain(self, state: SummaryState, *, step: Optional[int] = None) -> list[dict[str, Any]]:
+    def drain(
+        self,
+        state: SummaryState,
+        *,
+        step: Optional[int] = None,
+        subscriber: str = DEFAULT_SUBSCRIBER,
+    ) -> list[dict[str, Any]]:
         """提取尚未消费的工具调用事件，并同步任务的 note_id。"""
 
-        with self._lock:
-            if self._cursor >= len(self._events):
-                return []
-            new_events = self._events[self._cursor :]
-            self._cursor = len(self._events)
+        new_events = self.read(subscriber)
+        if not new_events:
+            return []
 
         if state.todo_items:
+            tasks = self._tasks_by_id(state.todo_items)
             for event in new_events:
                 task_id = event.task_id
                 note_id = event.note_id
                 if task_id is None or not note_id:
                     continue
-                self._attach_note_to_task(state.todo_items, task_id, note_id)
+                task = tasks.get(task_id)
+                if task is not None:
+                    self._attach_note_to_task(task, note_id)
 
         payloads: list[dict[str, Any]] = []
         for event in new_events:
@@ -113,14 +184,59 @@ class ToolCallTracker:
         return payloads
 
     def reset(self) -> None:
-        """Clear recorded events."""
+        """Clear recorded events, indexes and subscriber cursors."""
 
         with self._lock:
             self._events.clear()
-            self._cursor = 0
+            self._first_id = 1
+            self._next_id = 1
+            self._by_task.clear()
+            self._by_tool.clear()
+            self._notes.clear()
+            self._task_notes.clear()
+            self._cursors = {DEFAULT_SUBSCRIBER: 0}
+            self._bound_tasks = None
+            self._bound_count = 0
+            self._task_lookup = {}
+
+    # ------------------------------------------------------------------
+    # Indexed lookups
+    # ------------------------------------------------------------------
+    def events_for_task(self, task_id: int) -> list[ToolCallEvent]:
+        with self._lock:
+            return [self._events[event_id] for event_id in self._by_task.get(task_id, ())]
+
+    def events_for_tool(self, tool: str) -> list[ToolCallEvent]:
+        with self._lock:
+            return [self._events[event_id] for event_id in self._by_tool.get(tool, ())]
+
+    def note(self, note_id: str) -> Optional[NoteRecord]:
+        """Latest recorded state of ``note_id``."""
+
+        with self._lock:
+            return self._notes.get(note_id)
+
+    def note_for_task(self, task_id: int) -> Optional[str]:
+        """Most recent note written for ``task_id``."""
+
+        with self._lock:
+            return self._task_notes.get(task_id)
+
+    def latest_note_id(self, *, note_type: Optional[str] = None, title_prefix: Optional[str] = None) -> Optional[str]:
+        """Most recently created/updated note matching ``note_type`` or ``title_prefix``."""
+
+        with self._lock:
+            for record in reversed(self._notes.values()):
+                if record.action not in {"create", "update"}:
+                    continue
+                if note_type is not None and record.note_type == note_type:
+                    return record.note_id
+                if title_prefix is not None and (record.title or "").startswith(title_prefix):
+                    return record.note_id
+        return None
 
     def as_dicts(self) -> list[dict[str, Any]]:
-        """Expose a snapshot of raw events for backwards compatibility."""
+        """Expose a snapshot of buffered events for backwards compatibility."""
 
         with self._lock:
             return [
@@ -134,7 +250,7 @@ class ToolCallTracker:
                     "task_id": event.task_id,
                     "note_id": event.note_id,
                 }
-                for event in self._events
+                for event in self._events.values()
             ]
 
     def set_event_sink(self, sink: Optional[Callable[[dict[str, Any]], None]]) -> None:
@@ -163,20 +279,85 @@ class ToolCallTracker:
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
-    def _attach_note_to_task(self, tasks: list[TodoItem], task_id: int, note_id: str) -> None:
-        """Update matching TODO item with note metadata."""
-
-        for task in tasks:
-            if task.id != task_id:
-                continue
-
-            if task.note_id != note_id:
-                task.note_id = note_id
-                if self._notes_workspace:
-                    task.note_path = str(Path(self._notes_workspace) / f"{note_id}.md")
-            elif task.note_path is None and self._notes_workspace:
+    def _append(self, event: ToolCallEvent) -> None:
+        """Store and index ``event``, evicting the oldest one when full (caller holds the lock)."""
+
+        self._events[event.id] = event
+        if event.task_id is not None:
+            self._by_task.setdefault(event.task_id, deque()).append(event.id)
+        self._by_tool.setdefault(event.tool, deque()).append(event.id)
+
+        if event.note_id:
+            self._index_note(event)
+
+        while len(self._events) > self._max_events:
+            oldest = self._events.pop(self._first_id)
+            self._first_id += 1
+            # 索引中的编号按记录顺序排列，被淘汰的事件一定位于队首
+            if oldest.task_id is not None:
+                self._pop_index(self._by_task, oldest.task_id, oldest.id)
+            self._pop_index(self._by_tool, oldest.tool, oldest.id)
+
+    def _index_note(self, event: ToolCallEvent) -> None:
+        """Keep the latest metadata of the note touched by ``event`` (caller holds the lock)."""
+
+        parameters = event.parsed_parameters
+        action = parameters.get("action")
+        title = parameters.get("title")
+        record = self._notes.get(event.note_id)
+        if record is None:
+            record = NoteRecord(
+                note_id=event.note_id,
+                event_id=event.id,
+                action=None,
+                note_type=None,
+                title=None,
+                task_id=None,
+            )
+            self._notes[event.note_id] = record
+
+        if event.task_id is not None:
+            record.task_id = event.task_id
+            self._task_notes[event.task_id] = event.note_id
+
+        # 读取等操作不改变笔记内容，只有创建 / 更新会刷新元数据与“最近写入”顺序
+        if record.action is None or action in {"create", "update"}:
+            record.event_id = event.id
+            record.action = action
+            record.note_type = parameters.get("note_type") or record.note_type
+            record.title = title if isinstance(title, str) else record.title
+            self._notes.move_to_end(event.note_id)
+
+        while len(self._notes) > self._max_notes:
+            self._notes.popitem(last=False)
+
+    @staticmethod
+    def _pop_index(index: dict[Any, deque[int]], key: Any, event_id: int) -> None:
+        ids = index.get(key)
+        if ids and ids[0] == event_id:
+            ids.popleft()
+            if not ids:
+                del index[key]
+
+    def _tasks_by_id(self, tasks: list[TodoItem]) -> dict[int, TodoItem]:
+        """id -> TodoItem lookup, rebuilt only when the task list changes."""
+
+        with self._lock:
+            if self._bound_tasks is not tasks or self._bound_count != len(tasks):
+                self._bound_tasks = tasks
+                self._bound_count = len(tasks)
+                self._task_lookup = {task.id: task for task in tasks}
+            return self._task_lookup
+
+    def _attach_note_to_task(self, task: TodoItem, note_id: str) -> None:
+        """Update the TODO item with note metadata."""
+
+        if task.note_id != note_id:
+            task.note_id = note_id
+            if self._notes_workspace:
                 task.note_path = str(Path(self._notes_workspace) / f"{note_id}.md")
-            break
+        elif task.note_path is None and self._notes_workspace:
+            task.note_path = str(Path(self._notes_workspace) / f"{note_id}.md")
 
     def _infer_task_id(self, parameters: dict[str, Any]) -> Optional[int]:
         """尝试从工具参数推断 task_id。"""
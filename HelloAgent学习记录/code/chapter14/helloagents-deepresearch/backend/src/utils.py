@@ -5,6 +5,8 @@ from __future__ import annotations
 import logging
 from typing import Any, Dict, List, Union
 
+from services.text_processing import ThinkTagFilter
+
 CHARS_PER_TOKEN = 4
 
 logger = logging.getLogger(__name__)
@@ -19,11 +21,8 @@ def get_config_value(value: Any) -> str:
 def strip_thinking_tokens(text: str) -> str:
     """Remove ``<think>`` sections from model responses."""
 
-    while "<think>" in text and "</think>" in text:
-        start = text.find("<think>")
-        end = text.find("</think>") + len("</think>")
-        text = text[:start] + text[end:]
-    return text
+    think_filter = ThinkTagFilter(keep_unclosed=True)
+    return think_filter.feed(text) + think_filter.finish()
 
 
 def deduplicate_and_format_sources(
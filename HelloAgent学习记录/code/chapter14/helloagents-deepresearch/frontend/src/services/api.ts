@@ -15,6 +15,15 @@ export interface StreamOptions {
   signal?: AbortSignal;
 }
 
+// 后端开启断点续跑时，每个 SSE 帧以 `id:` 行开头，数据位于 `data:` 行
+function extractData(rawEvent: string): string {
+  return rawEvent
+    .split("\n")
+    .filter((line) => line.startsWith("data:"))
+    .map((line) => line.slice(5).trim())
+    .join("\n");
+}
+
 export async function runResearchStream(
   payload: ResearchRequest,
   onEvent: (event: ResearchStreamEvent) => void,
@@ -55,19 +64,17 @@ export async function runResearchStream(
       const rawEvent = buffer.slice(0, boundary).trim();
       buffer = buffer.slice(boundary + 2);
 
-      if (rawEvent.startsWith("data:")) {
-        const dataPayload = rawEvent.slice(5).trim();
-        if (dataPayload) {
-          try {
-            const event = JSON.parse(dataPayload) as ResearchStreamEvent;
-            onEvent(event);
+      const dataPayload = extractData(rawEvent);
+      if (dataPayload) {
+        try {
+          const event = JSON.parse(dataPayload) as ResearchStreamEvent;
+          onEvent(event);
 
-            if (event.type === "error" || event.type === "done") {
-              return;
-            }
-          } catch (error) {
-            console.error("解析流式事件失败：", error, dataPayload);
+          if (event.type === "error" || event.type === "done") {
+            return;
           }
+        } catch (error) {
+          console.error("解析流式事件失败：", error, dataPayload);
         }
       }
 
@@ -76,18 +83,13 @@ export async function runResearchStream(
 
     if (done) {
       // 处理可能的尾巴事件
-      if (buffer.trim()) {
-        const rawEvent = buffer.trim();
-        if (rawEvent.startsWith("data:")) {
-          const dataPayload = rawEvent.slice(5).trim();
-          if (dataPayload) {
-            try {
-              const event = JSON.parse(dataPayload) as ResearchStreamEvent;
-              onEvent(event);
-            } catch (error) {
-              console.error("解析流式事件失败：", error, dataPayload);
-            }
-          }
+      const dataPayload = extractData(buffer.trim());
+      if (dataPayload) {
+        try {
+          const event = JSON.parse(dataPayload) as ResearchStreamEvent;
+          onEvent(event);
+        } catch (error) {
+          console.error("解析流式事件失败：", error, dataPayload);
         }
       }
       break;
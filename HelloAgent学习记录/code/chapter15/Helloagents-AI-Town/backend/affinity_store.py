@@ -0,0 +1,251 @@
+"""好感度持久化存储 - SQLite(WAL) + 内存写回缓存"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS affinity (
+    npc_name TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    affinity REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (player_id, npc_name)
+);
+CREATE TABLE IF NOT EXISTS affinity_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    npc_name TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    old_affinity REAL NOT NULL,
+    new_affinity REAL NOT NULL,
+    change_amount REAL NOT NULL,
+    reason TEXT,
+    sentiment TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_affinity_history_pair
+    ON affinity_history (npc_name, player_id, created_at);
+"""
+
+
+class AffinityStore:
+    """好感度存储
+
+    功能:
+    - 读取走内存缓存,每个玩家首次访问时按主键索引加载其全部NPC好感度
+    - 缓存的玩家数超过上限时,按最近最少使用淘汰没有待写入修改的玩家
+    - 写入先更新缓存,再由后台线程按时间间隔或累计条数批量写入SQLite
+    - 同一(NPC, 玩家)在一次刷盘前的多次修改只写入最后的值
+    - 每次变化写入历史表,记录原因和情感倾向,便于分析
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        flush_interval: float = 2.0,
+        flush_batch_size: int = 100,
+        max_cached_players: int = 10000
+    ):
+        """初始化好感度存储
+
+        Args:
+            db_path: SQLite数据库路径
+            flush_interval: 刷盘间隔(秒)
+            flush_batch_size: 累计多少条待写入记录后立即刷盘
+            max_cached_players: 内存中最多缓存的玩家数
+        """
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.max_cached_players = max(1, max_cached_players)
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # WAL模式下读写使用各自的连接,刷盘不会阻塞读取
+        self._write_conn = self._connect()
+        self._write_conn.executescript(_SCHEMA)
+        self._read_conn = self._connect()
+
+        # 缓存: {player_id: {npc_name: affinity}},按最近访问排序
+        self._players: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._dirty: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        # 正在刷盘的修改,写入完成前对应玩家同样不能淘汰
+        self._flushing: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._pending_history: List[tuple] = []
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+
+        self._flush_event = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="AffinityStoreWriter", daemon=True)
+        self._writer.start()
+
+    def get(self, npc_name: str, player_id: str) -> Optional[float]:
+        """获取好感度,没有记录时返回None"""
+        with self._lock:
+            return self._load_player(player_id).get(npc_name)
+
+    def get_player_scores(self, player_id: str) -> Dict[str, float]:
+        """获取玩家与所有NPC的好感度 {npc_name: affinity}"""
+        with self._lock:
+            return dict(self._load_player(player_id))
+
+    def set(
+        self,
+        npc_name: str,
+        player_id: str,
+        affinity: float,
+        reason: Optional[str] = None,
+        sentiment: Optional[str] = None,
+        old_affinity: Optional[float] = None
+    ):
+        """更新好感度 (写入缓存,稍后批量刷盘)
+
+        Args:
+            npc_name: NPC名称
+            player_id: 玩家ID
+            affinity: 新的好感度
+            reason: 变化原因 (写入历史表)
+            sentiment: 情感倾向 (写入历史表)
+            old_affinity: 变化前的好感度,默认取缓存中的值
+        """
+        now = time.time()
+        with self._lock:
+            scores = self._load_player(player_id)
+            if old_affinity is None:
+                old_affinity = scores.get(npc_name, affinity)
+            scores[npc_name] = affinity
+            self._dirty[(npc_name, player_id)] = (affinity, now)
+            self._pending_history.append(
+                (npc_name, player_id, old_affinity, affinity, affinity - old_affinity, reason, sentiment, now)
+            )
+            pending = len(self._dirty) + len(self._pending_history)
+
+        if pending >= self.flush_batch_size:
+            self._flush_event.set()
+
+    def history(self, npc_name: str, player_id: str, limit: int = 20) -> List[Dict]:
+        """查询好感度变化历史 (最新的在前,包含尚未刷盘的记录)"""
+        self.flush()
+        with self._lock:
+            rows = self._read_conn.execute(
+                """SELECT old_affinity, new_affinity, change_amount, reason, sentiment, created_at
+                   FROM affinity_history
+                   WHERE npc_name = ? AND player_id = ?
+                   ORDER BY created_at DESC, id DESC
+                   LIMIT ?""",
+                (npc_name, player_id, limit)
+            ).fetchall()
+        return [
+            {
+                "old_affinity": row[0],
+                "new_affinity": row[1],
+                "change_amount": row[2],
+                "reason": row[3],
+                "sentiment": row[4],
+                "timestamp": row[5]
+            }
+            for row in rows
+        ]
+
+    def flush(self):
+        """立即将待写入的记录写入SQLite"""
+        with self._flush_lock:
+            # 只在交换缓冲区时持有缓存锁,写盘期间读写缓存不受影响
+            with self._lock:
+                dirty = self._dirty
+                history = self._pending_history
+                self._dirty = {}
+                self._pending_history = []
+                self._flushing = dirty
+
+            if not dirty and not history:
+                return
+
+            try:
+                with self._write_conn:
+                    self._write_conn.executemany(
+                        """INSERT INTO affinity (npc_name, player_id, affinity, updated_at)
+                           VALUES (?, ?, ?, ?)
+                           ON CONFLICT (player_id, npc_name)
+                           DO UPDATE SET affinity = excluded.affinity, updated_at = excluded.updated_at""",
+                        [(npc, player, value, ts) for (npc, player), (value, ts) in dirty.items()]
+                    )
+                    self._write_conn.executemany(
+                        """INSERT INTO affinity_history
+                           (npc_name, player_id, old_affinity, new_affinity, change_amount, reason, sentiment, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                        history
+                    )
+            except sqlite3.Error as e:
+                print(f"❌ 好感度写入数据库失败: {e}")
+                # 放回队列,下次重试;期间产生的新修改优先
+                with self._lock:
+                    for key, value in dirty.items():
+                        self._dirty.setdefault(key, value)
+                    self._pending_history = history + self._pending_history
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def close(self):
+        """停止后台线程并写入剩余记录"""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_event.set()
+        self._writer.join(timeout=10)
+        self.flush()
+        with self._flush_lock:
+            self._write_conn.close()
+        with self._lock:
+            self._read_conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _load_player(self, player_id: str) -> Dict[str, float]:
+        """加载玩家的全部好感度 (调用方需持有锁)"""
+        scores = self._players.get(player_id)
+        if scores is not None:
+            self._players.move_to_end(player_id)
+            return scores
+
+        rows = self._read_conn.execute(
+            "SELECT npc_name, affinity FROM affinity WHERE player_id = ?",
+            (player_id,)
+        ).fetchall()
+        scores = {npc_name: affinity for npc_name, affinity in rows}
+        self._players[player_id] = scores
+        self._evict()
+        return scores
+
+    def _evict(self):
+        """淘汰最久未访问的玩家,有待写入修改的玩家保留 (调用方需持有锁)"""
+        excess = len(self._players) - self.max_cached_players
+        if excess <= 0:
+            return
+        pinned = {player for _, player in self._dirty}
+        pinned.update(player for _, player in self._flushing)
+        for player_id in list(self._players):
+            if excess <= 0:
+                break
+            if player_id in pinned:
+                continue
+            del self._players[player_id]
+            excess -= 1
+
+    def _write_loop(self):
+        """后台刷盘线程"""
+        while not self._closed:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ 好感度刷盘失败: {e}")
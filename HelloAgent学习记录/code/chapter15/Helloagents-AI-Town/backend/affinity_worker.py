@@ -0,0 +1,162 @@
+"""好感度后台分析队列 - 将情感分析移出对话请求路径"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from relationship_manager import RelationshipManager
+
+
+@dataclass
+class AffinityJob:
+    """一段待分析的对话"""
+    npc_name: str
+    player_id: str
+    player_message: str
+    npc_response: str
+    on_result: Optional[Callable[[Dict], None]] = None
+
+
+class AffinityWorker:
+    """好感度后台分析器
+
+    功能:
+    - /chat 只负责提交对话,不再等待情感分析
+    - 后台线程攒批,一次LLM调用分析多段对话
+    - 单个线程按提交顺序依次应用结果,保证同一玩家的好感度变化有序
+    """
+
+    def __init__(
+        self,
+        relationship_manager: RelationshipManager,
+        batch_size: int = 8,
+        batch_wait: float = 0.5
+    ):
+        """初始化后台分析器
+
+        Args:
+            relationship_manager: 好感度管理器
+            batch_size: 单次LLM调用最多分析的对话数
+            batch_wait: 收到第一段对话后最多等待多久凑批(秒)
+        """
+        self.relationship_manager = relationship_manager
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+
+        self._queue: "queue.Queue[Optional[AffinityJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+    def submit(
+        self,
+        npc_name: str,
+        player_id: str,
+        player_message: str,
+        npc_response: str,
+        on_result: Optional[Callable[[Dict], None]] = None
+    ) -> bool:
+        """提交一段对话等待分析 (立即返回)
+
+        Args:
+            npc_name: NPC名称
+            player_id: 玩家ID
+            player_message: 玩家消息
+            npc_response: NPC回复
+            on_result: 好感度更新后的回调,参数为好感度变化结果
+
+        Returns:
+            是否成功提交 (服务关闭中时返回False)
+        """
+        if self._stopping:
+            return False
+
+        self._ensure_started()
+        self._queue.put(AffinityJob(npc_name, player_id, player_message, npc_response, on_result))
+        return True
+
+    def pending(self) -> int:
+        """等待分析的对话数"""
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 30.0):
+        """停止后台线程,已提交的对话会先分析完成
+
+        Args:
+            timeout: 最长等待时间(秒)
+        """
+        with self._start_lock:
+            self._stopping = True
+            thread = self._thread
+        if thread is None:
+            return
+
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"⚠️  好感度分析队列未能在{timeout:.0f}秒内处理完 (剩余: {self.pending()})")
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="AffinityWorker", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        """后台线程主循环"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            batch = [job]
+            stop_after_batch = False
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # 关闭时不再等待,直接取走已排队的对话
+                    next_job = self._queue.get(timeout=remaining) if remaining > 0 and not self._stopping \
+                        else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_job is None:
+                    stop_after_batch = True
+                    break
+                batch.append(next_job)
+
+            self._process_batch(batch)
+            if stop_after_batch:
+                return
+
+    def _process_batch(self, batch: List[AffinityJob]):
+        exchanges = [
+            {
+                "npc_name": job.npc_name,
+                "player_message": job.player_message,
+                "npc_response": job.npc_response
+            }
+            for job in batch
+        ]
+
+        try:
+            analyses = self.relationship_manager.analyze_batch(exchanges)
+        except Exception as e:
+            print(f"❌ 批量好感度分析失败: {e}")
+            analyses = [
+                {"should_change": False, "change_amount": 0, "reason": "分析失败", "sentiment": "neutral"}
+                for _ in batch
+            ]
+
+        # 按提交顺序应用,同一玩家的多次变化不会乱序
+        for job, analysis in zip(batch, analyses):
+            try:
+                result = self.relationship_manager.apply_analysis(job.npc_name, analysis, job.player_id)
+                if job.on_result:
+                    job.on_result(result)
+            except Exception as e:
+                print(f"❌ 应用好感度变化失败: {e}")
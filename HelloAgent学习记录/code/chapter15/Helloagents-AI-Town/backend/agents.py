@@ -2,15 +2,20 @@
 
 import sys
 import os
+import time
 
 # 添加HelloAgents到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'HelloAgents'))
 
-from hello_agents import SimpleAgent, HelloAgentsLLM
-from hello_agents.memory import MemoryManager, MemoryConfig, MemoryItem
+from hello_agents import HelloAgentsLLM
+from hello_agents.memory import MemoryManager, MemoryConfig
 from typing import Dict, List, Optional
 from datetime import datetime
 from relationship_manager import RelationshipManager
+from affinity_worker import AffinityWorker
+from session_store import SessionStore, estimate_tokens
+from memory_index import MemoryIndexManager, MemoryRecord
+from config import settings
 from logger import (
     log_dialogue_start, log_affinity, log_memory_retrieval,
     log_generating_response, log_npc_response, log_analyzing_affinity,
@@ -98,43 +103,56 @@ class NPCAgentManager:
             print("⚠️  将使用模拟模式运行")
             self.llm = None
 
-        self.agents: Dict[str, SimpleAgent] = {}
+        self.system_prompts: Dict[str, Optional[str]] = {}  # ⭐ 每个NPC的系统提示词 (所有玩家共享)
         self.memories: Dict[str, MemoryManager] = {}  # ⭐ NPC记忆管理器
         self.relationship_manager: Optional[RelationshipManager] = None  # ⭐ 好感度管理器
+        self.affinity_worker: Optional[AffinityWorker] = None  # ⭐ 好感度后台分析队列
 
         # 初始化好感度管理器
         if self.llm:
             self.relationship_manager = RelationshipManager(self.llm)
+            self.affinity_worker = AffinityWorker(
+                self.relationship_manager,
+                batch_size=settings.AFFINITY_BATCH_SIZE,
+                batch_wait=settings.AFFINITY_BATCH_WAIT
+            )
+
+        # ⭐ 对话会话存储: 每个(NPC, 玩家)独立的短期对话历史
+        self.sessions = SessionStore(
+            storage_dir=os.path.join(os.path.dirname(__file__), 'memory_data'),
+            max_history_tokens=settings.SESSION_HISTORY_TOKENS,
+            max_history_messages=settings.SESSION_MAX_MESSAGES,
+            idle_timeout=settings.SESSION_IDLE_TIMEOUT
+        )
+
+        # ⭐ 记忆向量索引: 对话时的记忆检索与写入不经过MemoryManager
+        self.memory_index = MemoryIndexManager(
+            dim=settings.MEMORY_EMBED_DIM,
+            hnsw_threshold=settings.MEMORY_HNSW_THRESHOLD,
+            batch_size=settings.MEMORY_WRITE_BATCH_SIZE,
+            batch_wait=settings.MEMORY_WRITE_BATCH_WAIT
+        )
 
         self._create_agents()
     
     def _create_agents(self):
-        """创建所有NPC Agent和记忆系统"""
+        """创建所有NPC的系统提示词和记忆系统"""
         for name, role in NPC_ROLES.items():
             try:
-                system_prompt = create_system_prompt(name, role)
-
-                if self.llm:
-                    agent = SimpleAgent(
-                        name=f"{name}-{role['title']}",
-                        llm=self.llm,
-                        system_prompt=system_prompt
-                    )
-                else:
-                    # 模拟模式
-                    agent = None
-
-                self.agents[name] = agent
+                # 系统提示词每个NPC只构建一次,由所有玩家的会话共享
+                # 模拟模式下为None
+                self.system_prompts[name] = create_system_prompt(name, role) if self.llm else None
 
                 # ⭐ 创建记忆管理器
                 memory_manager = self._create_memory_manager(name)
                 self.memories[name] = memory_manager
+                self._load_memory_index(name, memory_manager)
 
                 print(f"✅ {name}({role['title']}) Agent创建成功 (记忆系统已启用)")
 
             except Exception as e:
                 print(f"❌ {name} Agent创建失败: {e}")
-                self.agents[name] = None
+                self.system_prompts[name] = None
                 self.memories[name] = None
 
     def _create_memory_manager(self, npc_name: str) -> MemoryManager:
@@ -167,25 +185,54 @@ class NPCAgentManager:
 
         return memory_manager
     
+    def _load_memory_index(self, npc_name: str, memory_manager: MemoryManager):
+        """启动时将已保存的记忆载入向量索引"""
+        try:
+            memories = memory_manager.retrieve_memories(
+                query="",
+                memory_types=["working", "episodic"],
+                limit=settings.MEMORY_INDEX_PRELOAD
+            )
+        except Exception as e:
+            print(f"⚠️  {npc_name}的历史记忆载入索引失败: {e}")
+            return
+
+        records = [
+            MemoryRecord(
+                content=memory.content,
+                player_id=(memory.metadata or {}).get("player_id", "player"),
+                importance=memory.importance,
+                timestamp=memory.timestamp,
+                metadata=memory.metadata or {},
+                memory_type=memory.memory_type
+            )
+            for memory in memories
+        ]
+        if records:
+            self.memory_index.add(npc_name, records)
+            print(f"  🔎 {npc_name}的{len(records)}条历史记忆已载入检索索引")
+
     def chat(self, npc_name: str, message: str, player_id: str = "player") -> str:
         """与指定NPC对话 (支持记忆功能和好感度系统)"""
-        if npc_name not in self.agents:
+        if npc_name not in self.system_prompts:
             return f"错误: NPC '{npc_name}' 不存在"
 
-        agent = self.agents[npc_name]
+        system_prompt = self.system_prompts[npc_name]
         memory_manager = self.memories.get(npc_name)
 
-        if agent is None:
+        if system_prompt is None:
             # 模拟模式回复
             role = NPC_ROLES[npc_name]
             return f"你好!我是{npc_name},一名{role['title']}。(当前为模拟模式,请配置API_KEY以启用AI对话)"
 
         try:
             # 记录对话开始 ⭐ 使用日志系统
-            log_dialogue_start(npc_name, message)
+            start_time = time.perf_counter()
+            log_dialogue_start(npc_name, message, player_id)
 
             # ⭐ 1. 获取当前好感度
             affinity_context = ""
+            affinity = 50.0
             if self.relationship_manager:
                 affinity = self.relationship_manager.get_affinity(npc_name, player_id)
                 affinity_level = self.relationship_manager.get_affinity_level(affinity)
@@ -196,18 +243,17 @@ class NPCAgentManager:
 【对话风格】{affinity_modifier}
 
 """
-                log_affinity(npc_name, affinity, affinity_level)
-
-            # ⭐ 2. 检索相关记忆
-            relevant_memories = []
-            if memory_manager:
-                relevant_memories = memory_manager.retrieve_memories(
-                    query=message,
-                    memory_types=["working", "episodic"],
-                    limit=5,
-                    min_importance=0.3  # 只检索重要性>=0.3的记忆
-                )
-                log_memory_retrieval(npc_name, len(relevant_memories), relevant_memories)
+                log_affinity(npc_name, affinity, affinity_level, player_id)
+
+            # ⭐ 2. 检索相关记忆 (只在该玩家与NPC的记忆中检索)
+            relevant_memories = self.memory_index.retrieve(
+                npc_name,
+                query=message,
+                player_id=player_id,
+                limit=5,
+                min_importance=0.3  # 只检索重要性>=0.3的记忆
+            )
+            log_memory_retrieval(npc_name, len(relevant_memories), relevant_memories, player_id)
 
             # ⭐ 3. 构建增强的提示词 (包含好感度和记忆上下文)
             memory_context = self._build_memory_context(relevant_memories)
@@ -217,40 +263,54 @@ class NPCAgentManager:
                 enhanced_message += f"{memory_context}\n\n"
             enhanced_message += f"【当前对话】\n玩家: {message}"
 
-            # ⭐ 4. 调用Agent生成回复
+            # ⭐ 4. 基于该玩家的会话历史生成回复
             log_generating_response()
-            response = agent.run(enhanced_message)
-            log_npc_response(npc_name, response)
+            with self.sessions.session(npc_name, player_id) as session:
+                messages = [{"role": "system", "content": system_prompt}]
+                messages.extend(session.history_messages())
+                messages.append({"role": "user", "content": enhanced_message})
 
-            # ⭐ 5. 分析并更新好感度
-            log_analyzing_affinity()
-            if self.relationship_manager:
-                affinity_result = self.relationship_manager.analyze_and_update_affinity(
-                    npc_name=npc_name,
-                    player_message=message,
-                    npc_response=response,
-                    player_id=player_id
-                )
+                llm_response = self.llm.invoke(messages)
+                response = getattr(llm_response, "content", llm_response)
+                prompt_tokens, completion_tokens = self._token_usage(llm_response, messages, response)
 
-                # 记录好感度变化详情 ⭐ 使用日志系统
-                log_affinity_change(affinity_result)
-            else:
-                affinity_result = {"changed": False, "affinity": 50.0}
+                # 历史中只保留玩家原话,记忆和好感度上下文每轮重新生成
+                self.sessions.add_turn(session, message, response)
+            log_npc_response(npc_name, response, player_id)
 
-            # ⭐ 6. 保存对话到记忆 (包含好感度信息)
-            if memory_manager:
-                self._save_conversation_to_memory(
-                    memory_manager=memory_manager,
+            # ⭐ 5. 提交到后台队列分析好感度 (不阻塞回复)
+            log_analyzing_affinity()
+            if self.affinity_worker:
+                self.affinity_worker.submit(
                     npc_name=npc_name,
+                    player_id=player_id,
                     player_message=message,
                     npc_response=response,
-                    player_id=player_id,
-                    affinity_info=affinity_result
+                    on_result=lambda result: log_affinity_change(result, npc_name, player_id)
                 )
-                log_memory_saved(npc_name)
+
+            # 好感度变化尚未得出,记忆中记录回复时的好感度
+            affinity_result = {"changed": False, "affinity": affinity}
+
+            # ⭐ 6. 保存对话到记忆 (包含好感度信息,后台异步写入)
+            self._save_conversation_to_memory(
+                memory_manager=memory_manager,
+                npc_name=npc_name,
+                player_message=message,
+                npc_response=response,
+                player_id=player_id,
+                affinity_info=affinity_result
+            )
+            log_memory_saved(npc_name)
 
             # 记录对话结束 ⭐ 使用日志系统
-            log_dialogue_end()
+            log_dialogue_end(
+                npc_name,
+                player_id,
+                latency_ms=(time.perf_counter() - start_time) * 1000,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
+            )
 
             return response
 
@@ -260,7 +320,32 @@ class NPCAgentManager:
             traceback.print_exc()
             return f"抱歉,我现在有点忙,等会儿再聊吧。(错误: {str(e)})"
     
-    def _build_memory_context(self, memories: List[MemoryItem]) -> str:
+    @staticmethod
+    def _token_usage(llm_response, messages: List[Dict[str, str]], response: str):
+        """获取本次调用的token用量 (LLM未返回usage时按字符估算)"""
+        usage = getattr(llm_response, "usage", None)
+        if usage is not None:
+            if isinstance(usage, dict):
+                prompt_tokens = usage.get("prompt_tokens")
+                completion_tokens = usage.get("completion_tokens")
+            else:
+                prompt_tokens = getattr(usage, "prompt_tokens", None)
+                completion_tokens = getattr(usage, "completion_tokens", None)
+            if prompt_tokens is not None and completion_tokens is not None:
+                return prompt_tokens, completion_tokens
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        return prompt_tokens, estimate_tokens(response)
+
+    def shutdown(self):
+        """关闭后台任务 (分析完已提交的好感度变化并保存对话会话)"""
+        if self.affinity_worker:
+            self.affinity_worker.stop()
+        if self.relationship_manager:
+            self.relationship_manager.close()
+        self.memory_index.stop()
+        self.sessions.flush()
+
+    def _build_memory_context(self, memories: List[MemoryRecord]) -> str:
         """构建记忆上下文"""
         if not memories:
             return ""
@@ -277,14 +362,17 @@ class NPCAgentManager:
 
     def _save_conversation_to_memory(
         self,
-        memory_manager: MemoryManager,
+        memory_manager: Optional[MemoryManager],
         npc_name: str,
         player_message: str,
         npc_response: str,
         player_id: str,
         affinity_info: Optional[Dict] = None
     ):
-        """保存对话到记忆系统 (包含好感度信息)"""
+        """保存对话到记忆系统 (包含好感度信息)
+
+        记忆先写入检索索引,再由后台线程写入MemoryManager,均不阻塞当前请求。
+        """
         current_time = datetime.now()
 
         # 获取好感度信息
@@ -292,11 +380,12 @@ class NPCAgentManager:
         affinity_change = affinity_info.get("change_amount", 0) if affinity_info else 0
         sentiment = affinity_info.get("sentiment", "neutral") if affinity_info else "neutral"
 
-        # 保存玩家消息
-        memory_manager.add_memory(
+        # 玩家消息
+        player_memory = MemoryRecord(
             content=f"玩家说: {player_message}",
-            memory_type="working",  # 先存入工作记忆
+            player_id=player_id,
             importance=0.5,  # 中等重要性
+            timestamp=current_time,
             metadata={
                 "speaker": "player",
                 "player_id": player_id,
@@ -312,11 +401,12 @@ class NPCAgentManager:
             }
         )
 
-        # 保存NPC回复
-        memory_manager.add_memory(
+        # NPC回复
+        npc_memory = MemoryRecord(
             content=f"我说: {npc_response}",
-            memory_type="working",  # 先存入工作记忆
+            player_id=player_id,
             importance=0.6,  # 稍高重要性
+            timestamp=current_time,
             metadata={
                 "speaker": npc_name,
                 "player_id": player_id,
@@ -331,7 +421,19 @@ class NPCAgentManager:
             }
         )
 
-        print(f"  💾 对话已保存到{npc_name}的记忆中")
+        records = [player_memory, npc_memory]
+
+        def persist():
+            for record in records:
+                memory_manager.add_memory(
+                    content=record.content,
+                    memory_type="working",  # 先存入工作记忆
+                    importance=record.importance,
+                    metadata=record.metadata
+                )
+            print(f"  💾 对话已保存到{npc_name}的记忆中")
+
+        self.memory_index.add(npc_name, records, persist=persist if memory_manager else None)
 
     def get_npc_info(self, npc_name: str) -> Dict[str, str]:
         """获取NPC信息"""
@@ -344,7 +446,7 @@ class NPCAgentManager:
             "title": role["title"],
             "location": role["location"],
             "activity": role["activity"],
-            "available": self.agents.get(npc_name) is not None
+            "available": self.system_prompts.get(npc_name) is not None
         }
     
     def get_all_npcs(self) -> list:
@@ -441,6 +543,22 @@ class NPCAgentManager:
             "modifier": modifier
         }
 
+    def get_npc_affinity_history(self, npc_name: str, player_id: str = "player", limit: int = 20) -> List[Dict]:
+        """获取NPC对玩家的好感度变化历史
+
+        Args:
+            npc_name: NPC名称
+            player_id: 玩家ID
+            limit: 返回的记录数量限制
+
+        Returns:
+            好感度变化记录列表 (最新的在前)
+        """
+        if not self.relationship_manager:
+            return []
+
+        return self.relationship_manager.get_affinity_history(npc_name, player_id, limit)
+
     def get_all_affinities(self, player_id: str = "player") -> Dict[str, Dict]:
         """获取所有NPC的好感度信息
 
@@ -453,7 +571,7 @@ class NPCAgentManager:
         if not self.relationship_manager:
             return {}
 
-        return self.relationship_manager.get_all_affinities(player_id)
+        return self.relationship_manager.get_all_affinities(player_id, npc_names=NPC_ROLES.keys())
 
     def set_npc_affinity(self, npc_name: str, affinity: float, player_id: str = "player"):
         """设置NPC对玩家的好感度 (用于测试)
@@ -0,0 +1,113 @@
+"""Benchmark: NPC batch dialogue refresh cost vs. NPC count.
+
+Compares the previous strategy (one LLM call regenerating every NPC on every
+tick) with batched, concurrent generation that only regenerates NPCs players
+have viewed recently. The LLM is simulated: latency = first-token latency +
+per-output-token decode time, scaled by ``--time-scale`` so the run is quick.
+
+Usage:
+    python batch_benchmark.py --npc-counts 3 30 100 300 1000 --view-ratio 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+from batch_generator import NPCBatchGenerator
+from session_store import estimate_tokens
+
+_NPC_LINE_RE = re.compile(r"^- (.+?)\(", re.MULTILINE)
+
+
+class SimulatedLLM:
+    """Answers batch prompts with one line per NPC after a size-dependent delay."""
+
+    def __init__(self, first_token_s: float, per_token_s: float, time_scale: float):
+        self.first_token_s = first_token_s
+        self.per_token_s = per_token_s
+        self.time_scale = time_scale
+        self.calls = 0
+        self.npcs_generated = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, messages, **kwargs):
+        names = _NPC_LINE_RE.findall(messages[-1]["content"])
+        reply = json.dumps({name: f"{name}正在专心工作,顺便想想下午的安排。" for name in names}, ensure_ascii=False)
+        with self._lock:
+            self.calls += 1
+            self.npcs_generated += len(names)
+        time.sleep((self.first_token_s + self.per_token_s * estimate_tokens(reply)) * self.time_scale)
+        return reply
+
+
+def make_npcs(count: int) -> dict[str, dict[str, str]]:
+    return {
+        f"NPC{i:04d}": {
+            "title": "工程师",
+            "location": f"工位{i % 20}",
+            "activity": "写代码",
+            "personality": "认真负责",
+        }
+        for i in range(count)
+    }
+
+
+def measure(npc_count: int, strategy: str, args) -> tuple[int, int, float]:
+    """Return (LLM calls, NPCs regenerated, latency in simulated seconds) per refresh."""
+
+    npcs = make_npcs(npc_count)
+    llm = SimulatedLLM(args.first_token, args.per_token, args.time_scale)
+    if strategy == "single":
+        generator = NPCBatchGenerator(llm=llm, npc_configs=npcs, batch_size=npc_count, max_concurrency=1)
+        active = set(npcs)
+    else:
+        generator = NPCBatchGenerator(
+            llm=llm, npc_configs=npcs, batch_size=args.batch_size, max_concurrency=args.concurrency
+        )
+        rng = random.Random(npc_count)
+        active = set(rng.sample(sorted(npcs), max(1, round(npc_count * args.view_ratio))))
+
+    context = "上午工作时间"
+    # 第一轮填充缓存,之后的轮次才是稳定状态
+    generator.refresh(active, context)
+    llm.calls = llm.npcs_generated = 0
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        dialogues = generator.refresh(active, context)
+        assert set(dialogues) == set(npcs), "every NPC must have a dialogue"
+    elapsed = (time.perf_counter() - start) / args.ticks / args.time_scale
+    return llm.calls // args.ticks, llm.npcs_generated // args.ticks, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npc-counts", type=int, nargs="+", default=[3, 30, 100, 300, 1000])
+    parser.add_argument("--view-ratio", type=float, default=0.1, help="fraction of NPCs viewed recently")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=30, help="refresh interval in seconds")
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--first-token", type=float, default=0.5, help="simulated first-token latency (s)")
+    parser.add_argument("--per-token", type=float, default=0.02, help="simulated decode time per token (s)")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="shrink simulated sleeps by this factor")
+    args = parser.parse_args()
+
+    ticks_per_minute = 60 / args.interval
+    print(f"simulated LLM: {args.first_token}s + {args.per_token * 1000:.0f}ms/token, refresh every {args.interval:.0f}s")
+    print(f"batched: {args.batch_size} NPCs/call, {args.concurrency} concurrent calls, {args.view_ratio:.0%} NPCs viewed")
+    print(f"{'':>6} | {'single call, all NPCs':^32} | {'batched, viewed NPCs only':^32}")
+    print(f"{'NPCs':>6} | {'calls/min':>9} {'NPCs/min':>9} {'refresh(s)':>11} | {'calls/min':>9} {'NPCs/min':>9} {'refresh(s)':>11}")
+    print("-" * 76)
+    for count in args.npc_counts:
+        single_calls, single_npcs, single_latency = measure(count, "single", args)
+        batched_calls, batched_npcs, batched_latency = measure(count, "batched", args)
+        print(
+            f"{count:>6} | {single_calls * ticks_per_minute:>9.0f} {single_npcs * ticks_per_minute:>9.0f} "
+            f"{single_latency:>11.2f} | {batched_calls * ticks_per_minute:>9.0f} "
+            f"{batched_npcs * ticks_per_minute:>9.0f} {batched_latency:>11.2f}"
+        )
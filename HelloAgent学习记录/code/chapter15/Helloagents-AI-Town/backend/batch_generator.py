@@ -3,36 +3,71 @@
 import sys
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 # 添加HelloAgents到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'HelloAgents'))
 
 from hello_agents import HelloAgentsLLM
 from agents import NPC_ROLES
+from config import settings
 
 class NPCBatchGenerator:
     """批量生成NPC对话的生成器
     
-    核心思路: 一次LLM调用生成所有NPC的对话,降低API成本和延迟
+    核心思路: 一次LLM调用生成一批NPC的对话,降低API成本和延迟
+
+    NPC较多时:
+    - 按batch_size分批,多个批次并发调用LLM
+    - 只重新生成最近被玩家看到、或场景发生变化的NPC
+    - 从未生成过的NPC在第一次刷新时生成一次,之后沿用上次生成的对话
     """
     
-    def __init__(self):
-        """初始化批量生成器"""
+    def __init__(
+        self,
+        llm: Optional[HelloAgentsLLM] = None,
+        npc_configs: Optional[Dict[str, Dict[str, str]]] = None,
+        batch_size: int = settings.BATCH_NPC_SIZE,
+        max_concurrency: int = settings.BATCH_MAX_CONCURRENCY
+    ):
+        """初始化批量生成器
+
+        Args:
+            llm: LLM实例,默认自动创建HelloAgentsLLM
+            npc_configs: NPC配置,默认使用NPC_ROLES
+            batch_size: 单次LLM调用生成的NPC数量
+            max_concurrency: 同时进行的LLM调用数
+        """
         print("🎨 正在初始化批量对话生成器...")
         
-        try:
-            self.llm = HelloAgentsLLM()
+        if llm is not None:
+            self.llm = llm
             self.enabled = True
-            print("✅ 批量生成器初始化成功")
-        except Exception as e:
-            print(f"❌ 批量生成器初始化失败: {e}")
-            print("⚠️  将使用预设对话模式")
-            self.llm = None
-            self.enabled = False
+        else:
+            try:
+                self.llm = HelloAgentsLLM()
+                self.enabled = True
+                print("✅ 批量生成器初始化成功")
+            except Exception as e:
+                print(f"❌ 批量生成器初始化失败: {e}")
+                print("⚠️  将使用预设对话模式")
+                self.llm = None
+                self.enabled = False
         
-        self.npc_configs = NPC_ROLES
+        self.npc_configs = npc_configs if npc_configs is not None else NPC_ROLES
+        self.batch_size = max(1, batch_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency), thread_name_prefix="npc-batch"
+        )
+
+        # 上次生成的对话及其场景: {npc_name: (dialogue, scene_key)}
+        self._cache: Dict[str, Tuple[str, str]] = {}
+        self._cache_lock = threading.Lock()
+        # 已经尝试生成过的NPC (生成失败也算,避免LLM不可用时每次刷新都重试)
+        self._attempted: Set[str] = set()
         
         # 预设对话库(当LLM不可用时使用)
         self.preset_dialogues = {
@@ -58,24 +93,88 @@ class NPCBatchGenerator:
             }
         }
     
-    def generate_batch_dialogues(self, context: Optional[str] = None) -> Dict[str, str]:
-        """批量生成所有NPC的对话
+    def refresh(self, active_npcs: Iterable[str], context: Optional[str] = None) -> Dict[str, str]:
+        """刷新所有NPC的对话
+
+        Args:
+            active_npcs: 最近被玩家看到的NPC
+            context: 场景上下文,默认根据时间推断
+
+        Returns:
+            Dict[str, str]: 所有NPC名称到对话内容的映射
+        """
+        if context is None:
+            context = self._get_current_context()
+
+        active = set(active_npcs)
+        with self._cache_lock:
+            cache = dict(self._cache)
+
+        # 被看到的NPC、从未生成过的NPC,以及场景变化后缓存已过时的NPC需要重新生成
+        stale = [
+            name for name in self.npc_configs
+            if name in active
+            or name not in self._attempted
+            or (name in cache and cache[name][1] != self._scene_key(name, context))
+        ]
+        self._attempted.update(stale)
+
+        generated = self.generate_batch_dialogues(context, npc_names=stale) if stale else {}
+
+        dialogues = {}
+        for name in self.npc_configs:
+            if name in generated:
+                dialogues[name] = generated[name]
+            elif name in cache:
+                dialogues[name] = cache[name][0]
+            else:
+                dialogues[name] = self._get_preset_dialogue(name)
+        return dialogues
+
+    def generate_batch_dialogues(
+        self,
+        context: Optional[str] = None,
+        npc_names: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """批量生成NPC的对话
         
         Args:
             context: 场景上下文(如"上午工作时间"、"午餐时间"等)
+            npc_names: 需要生成的NPC,默认全部
         
         Returns:
             Dict[str, str]: NPC名称到对话内容的映射
         """
+        if context is None:
+            context = self._get_current_context()
+        if npc_names is None:
+            npc_names = list(self.npc_configs.keys())
+
         if not self.enabled or self.llm is None:
             # 使用预设对话
-            return self._get_preset_dialogues()
-        
+            return {name: self._get_preset_dialogue(name) for name in npc_names}
+
+        batches = [
+            npc_names[i:i + self.batch_size]
+            for i in range(0, len(npc_names), self.batch_size)
+        ]
+        # 多个批次并发调用LLM
+        results = list(self._executor.map(lambda batch: self._generate_batch(batch, context), batches))
+
+        dialogues = {}
+        for batch_dialogues in results:
+            dialogues.update(batch_dialogues)
+        print(f"✅ 批量生成完成: {len(dialogues)}个NPC对话 ({len(batches)}次LLM调用)")
+        return dialogues
+
+    def _generate_batch(self, npc_names: List[str], context: str) -> Dict[str, str]:
+        """一次LLM调用生成一批NPC的对话,解析失败的NPC使用预设对话"""
+        dialogues = None
         try:
             # 构建批量生成提示词
-            prompt = self._build_batch_prompt(context)
+            prompt = self._build_batch_prompt(context, npc_names)
 
-            # 一次LLM调用生成所有对话
+            # 一次LLM调用生成这一批NPC的对话
             # 使用invoke方法而不是chat方法
             response = self.llm.invoke([
                 {"role": "system", "content": "你是一个游戏NPC对话生成器,擅长创作自然真实的办公室对话。"},
@@ -83,34 +182,43 @@ class NPCBatchGenerator:
             ])
 
             # 解析JSON响应
-            dialogues = self._parse_response(response)
-
-            if dialogues:
-                print(f"✅ 批量生成成功: {len(dialogues)}个NPC对话")
-                return dialogues
-            else:
-                print("⚠️  解析失败,使用预设对话")
-                return self._get_preset_dialogues()
+            dialogues = self._parse_response(getattr(response, "content", response), npc_names)
 
         except Exception as e:
             print(f"❌ 批量生成失败: {e}")
-            return self._get_preset_dialogues()
+
+        if not dialogues:
+            print("⚠️  解析失败,使用预设对话")
+            dialogues = {}
+
+        with self._cache_lock:
+            for name, dialogue in dialogues.items():
+                self._cache[name] = (dialogue, self._scene_key(name, context))
+
+        for name in npc_names:
+            if name not in dialogues:
+                dialogues[name] = self._get_preset_dialogue(name)
+        return dialogues
     
-    def _build_batch_prompt(self, context: Optional[str] = None) -> str:
+    def _build_batch_prompt(self, context: Optional[str] = None, npc_names: Optional[List[str]] = None) -> str:
         """构建批量生成提示词"""
         # 根据时间自动推断场景
         if context is None:
             context = self._get_current_context()
+        if npc_names is None:
+            npc_names = list(self.npc_configs.keys())
         
         # 构建NPC描述
         npc_descriptions = []
-        for name, cfg in self.npc_configs.items():
+        for name in npc_names:
+            cfg = self.npc_configs[name]
             desc = f"- {name}({cfg['title']}): 在{cfg['location']}{cfg['activity']},性格{cfg['personality']}"
             npc_descriptions.append(desc)
         
         npc_desc_text = "\n".join(npc_descriptions)
+        output_format = json.dumps({name: "..." for name in npc_names}, ensure_ascii=False)
         
-        prompt = f"""请为Datawhale办公室的3个NPC生成当前的对话或行为描述。
+        prompt = f"""请为Datawhale办公室的{len(npc_names)}个NPC生成当前的对话或行为描述。
 
 【场景】{context}
 
@@ -123,50 +231,57 @@ class NPCBatchGenerator:
 3. 可以是自言自语、工作状态描述、或简单的思考
 4. 要自然真实,像真实的办公室同事
 5. 可以体现一些个性化特点和情绪
-6. **必须严格按照JSON格式返回**
+6. **必须严格按照JSON格式返回,键为上面列出的全部NPC名称**
 
 【输出格式】(严格遵守)
-{{"张三": "...", "李四": "...", "王五": "..."}}
+{output_format}
 
 【示例输出】
-{{"张三": "这个bug真是见鬼了,已经调试两小时了...", "李四": "嗯,这个功能的优先级需要重新评估一下。", "王五": "这杯咖啡的拉花真不错,灵感来了!"}}
+{{"张三": "这个bug真是见鬼了,已经调试两小时了...", "李四": "嗯,这个功能的优先级需要重新评估一下。"}}
 
 请生成(只返回JSON,不要其他内容):
 """
         return prompt
     
-    def _parse_response(self, response: str) -> Optional[Dict[str, str]]:
-        """解析LLM响应"""
+    def _parse_response(self, response: str, npc_names: Optional[List[str]] = None) -> Optional[Dict[str, str]]:
+        """解析LLM响应,只保留本批次NPC的对话"""
+        if npc_names is None:
+            npc_names = list(self.npc_configs.keys())
+
         try:
             # 尝试直接解析JSON
             dialogues = json.loads(response)
-            
-            # 验证格式
-            if isinstance(dialogues, dict) and all(name in dialogues for name in self.npc_configs.keys()):
-                return dialogues
-            else:
-                print(f"⚠️  JSON格式不正确: {dialogues}")
-                return None
-                
         except json.JSONDecodeError:
             # 尝试提取JSON部分
-            try:
-                # 查找第一个{和最后一个}
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                
-                if start != -1 and end > start:
-                    json_str = response[start:end]
-                    dialogues = json.loads(json_str)
-                    
-                    if isinstance(dialogues, dict):
-                        return dialogues
-            except:
-                pass
-            
+            dialogues = None
+            # 查找第一个{和最后一个}
+            start = response.find('{')
+            end = response.rfind('}') + 1
+            if start != -1 and end > start:
+                try:
+                    dialogues = json.loads(response[start:end])
+                except json.JSONDecodeError:
+                    pass
+
+        if not isinstance(dialogues, dict):
             print(f"⚠️  无法解析响应: {response[:100]}...")
             return None
-    
+
+        result = {
+            name: dialogues[name].strip()
+            for name in npc_names
+            if isinstance(dialogues.get(name), str) and dialogues[name].strip()
+        }
+        if len(result) < len(npc_names):
+            missing = [name for name in npc_names if name not in result]
+            print(f"⚠️  响应缺少{len(missing)}个NPC的对话: {', '.join(missing[:5])}")
+        return result
+
+    def _scene_key(self, npc_name: str, context: str) -> str:
+        """NPC所处场景,变化后缓存的对话需要重新生成"""
+        cfg = self.npc_configs[npc_name]
+        return f"{context}|{cfg['location']}|{cfg['activity']}"
+
     def _get_current_context(self) -> str:
         """根据当前时间推断场景上下文"""
         hour = datetime.now().hour
@@ -186,6 +301,10 @@ class NPCBatchGenerator:
     
     def _get_preset_dialogues(self) -> Dict[str, str]:
         """获取预设对话(根据时间)"""
+        return {name: self._get_preset_dialogue(name) for name in self.npc_configs}
+
+    def _get_preset_dialogue(self, npc_name: str) -> str:
+        """获取单个NPC的预设对话,预设库中没有的NPC根据角色配置生成"""
         hour = datetime.now().hour
         
         if 6 <= hour < 12:
@@ -197,7 +316,12 @@ class NPCBatchGenerator:
         else:
             period = "evening"
         
-        return self.preset_dialogues.get(period, self.preset_dialogues["morning"])
+        presets = self.preset_dialogues.get(period, self.preset_dialogues["morning"])
+        if npc_name in presets:
+            return presets[npc_name]
+
+        cfg = self.npc_configs.get(npc_name, {})
+        return f"正在{cfg.get('location', '办公室')}{cfg.get('activity', '忙碌')}。"
 
 # 全局单例
 _batch_generator = None
@@ -14,6 +14,39 @@ class Settings:
     
     # NPC配置
     NPC_UPDATE_INTERVAL = 30  # NPC状态更新间隔(秒)
+    NPC_VIEW_TTL = int(os.getenv("NPC_VIEW_TTL", "120"))  # NPC被看到后多久内保持自动更新(秒)
+
+    # 批量对话生成配置
+    BATCH_NPC_SIZE = int(os.getenv("BATCH_NPC_SIZE", "10"))  # 单次LLM调用生成的NPC数量
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))  # 同时进行的批量生成调用数
+
+    # 好感度后台分析配置
+    AFFINITY_BATCH_SIZE = int(os.getenv("AFFINITY_BATCH_SIZE", "8"))  # 单次LLM调用最多分析的对话数
+    AFFINITY_BATCH_WAIT = float(os.getenv("AFFINITY_BATCH_WAIT", "0.5"))  # 凑批等待时间(秒)
+
+    # 好感度存储配置
+    AFFINITY_DB_PATH = os.getenv(
+        "AFFINITY_DB_PATH", os.path.join(os.path.dirname(__file__), "memory_data", "affinity.db")
+    )
+    AFFINITY_FLUSH_INTERVAL = float(os.getenv("AFFINITY_FLUSH_INTERVAL", "2.0"))  # 刷盘间隔(秒)
+    AFFINITY_FLUSH_BATCH_SIZE = int(os.getenv("AFFINITY_FLUSH_BATCH_SIZE", "100"))  # 累计多少条修改后立即刷盘
+    AFFINITY_CACHE_PLAYERS = int(os.getenv("AFFINITY_CACHE_PLAYERS", "10000"))  # 内存中最多缓存的玩家数
+
+    # 对话会话配置 (每个NPC与每个玩家独立的短期历史)
+    SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1200"))  # 单个会话历史的token上限
+    SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "20"))  # 单个会话历史的消息条数上限
+    SESSION_IDLE_TIMEOUT = int(os.getenv("SESSION_IDLE_TIMEOUT", "600"))  # 会话闲置多久后写入磁盘(秒)
+
+    # 记忆检索索引配置
+    MEMORY_EMBED_DIM = int(os.getenv("MEMORY_EMBED_DIM", "256"))  # 记忆向量维度
+    MEMORY_HNSW_THRESHOLD = int(os.getenv("MEMORY_HNSW_THRESHOLD", "10000"))  # 单个玩家超过多少条记忆后使用HNSW
+    MEMORY_WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "32"))  # 后台一次最多处理的写入数
+    MEMORY_WRITE_BATCH_WAIT = float(os.getenv("MEMORY_WRITE_BATCH_WAIT", "0.2"))  # 写入凑批等待时间(秒)
+    MEMORY_INDEX_PRELOAD = int(os.getenv("MEMORY_INDEX_PRELOAD", "1000"))  # 启动时每个NPC载入索引的历史记忆数
+
+    # 对话日志配置
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # 单个日志文件大小上限(字节)
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))  # 每天最多保留的轮转文件数
     
     # LLM配置 (从环境变量读取)
     # HelloAgents框架使用自定义LLM配置,不需要OPENAI_API_KEY
@@ -1,115 +1,243 @@
-"""对话日志系统"""
+"""对话日志系统
 
+日志通过QueueHandler放入队列,由QueueListener在后台线程写入文件和控制台,
+请求线程只负责入队。文件中每行是一条JSON记录,按日期分文件,超过大小上限时轮转。
+"""
+
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+from config import settings
 
 # 创建logs目录
 LOGS_DIR = Path(__file__).parent / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
 
-# 创建日志文件名 (按日期)
-today = datetime.now().strftime("%Y-%m-%d")
-LOG_FILE = LOGS_DIR / f"dialogue_{today}.log"
-
-# 配置日志格式
+# 控制台日志格式
 LOG_FORMAT = "%(asctime)s - %(message)s"
 DATE_FORMAT = "%H:%M:%S"
 
-# 创建logger
-dialogue_logger = logging.getLogger("dialogue")
-dialogue_logger.setLevel(logging.INFO)
 
-# 移除已有的handlers (避免重复)
-dialogue_logger.handlers.clear()
+def log_file_for(date: str) -> Path:
+    """指定日期(YYYY-MM-DD)的日志文件"""
+    return LOGS_DIR / f"dialogue_{date}.jsonl"
+
 
-# 创建文件handler
-file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+class DailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """按日期分文件,同一天的文件超过max_bytes时轮转为 .1 .2 ..."""
+
+    def __init__(self, max_bytes: int, backup_count: int):
+        self._date = datetime.now().strftime("%Y-%m-%d")
+        super().__init__(
+            log_file_for(self._date),
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True
+        )
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if datetime.now().strftime("%Y-%m-%d") != self._date:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self._date:
+            # 跨天: 换到新日期的文件,前一天的文件保持原名
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self._date = today
+            self.baseFilename = os.path.abspath(log_file_for(today))
+            return
+        super().doRollover()
+
+
+class JsonLineFormatter(logging.Formatter):
+    """将日志记录格式化为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": getattr(record, "event", "info"),
+            "message": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+# 文件handler: JSON行
+file_handler = DailyRotatingFileHandler(settings.LOG_MAX_BYTES, settings.LOG_BACKUP_COUNT)
 file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+file_handler.setFormatter(JsonLineFormatter())
 
-# 创建控制台handler
+# 控制台handler: 便于阅读的文本
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
 console_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
 
-# 添加handlers
-dialogue_logger.addHandler(file_handler)
-dialogue_logger.addHandler(console_handler)
+# 创建logger: 只挂QueueHandler,文件和控制台I/O在监听线程中完成
+dialogue_logger = logging.getLogger("dialogue")
+dialogue_logger.setLevel(logging.INFO)
+
+# 移除已有的handlers (避免重复)
+dialogue_logger.handlers.clear()
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+dialogue_logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+_listener = logging.handlers.QueueListener(
+    _log_queue, file_handler, console_handler, respect_handler_level=True
+)
+_listener.start()
+_listener_lock = threading.Lock()
+_listener_running = True
+
+
+def stop_logging():
+    """写完队列中剩余的日志并停止后台线程 (可重复调用)"""
+    global _listener_running
+    with _listener_lock:
+        if _listener_running:
+            _listener_running = False
+            _listener.stop()
+
+
+# 进程退出时写完队列中剩余的日志
+atexit.register(stop_logging)
 
 # 防止日志传播到root logger
 dialogue_logger.propagate = False
 
-def log_dialogue_start(npc_name: str, player_message: str):
-    """记录对话开始"""
-    dialogue_logger.info("=" * 60)
-    dialogue_logger.info(f"💬 对话开始: {npc_name} <-> 玩家")
-    dialogue_logger.info("=" * 60)
-    dialogue_logger.info(f"📝 玩家消息: {player_message}")
 
-def log_affinity(npc_name: str, affinity: float, level: str):
-    """记录当前好感度"""
-    dialogue_logger.info(f"💖 当前好感度: {affinity:.1f}/100 ({level})")
+def _log(event: str, message: str, level: int = logging.INFO, **fields):
+    """记录一条结构化日志"""
+    dialogue_logger.log(level, message, extra={"event": event, "fields": fields})
 
-def log_memory_retrieval(npc_name: str, count: int, memories: list = None):
+
+def log_dialogue_start(npc_name: str, player_message: str, player_id: str = "player"):
+    """记录对话开始"""
+    _log(
+        "dialogue_start",
+        f"💬 对话开始: {npc_name} <-> {player_id} | 📝 玩家消息: {player_message}",
+        npc=npc_name,
+        player=player_id,
+        player_message=player_message
+    )
+
+def log_affinity(npc_name: str, affinity: float, level: str, player_id: str = "player"):
+    """记录当前好感度"""
+    _log(
+        "affinity",
+        f"💖 当前好感度: {affinity:.1f}/100 ({level})",
+        npc=npc_name,
+        player=player_id,
+        affinity=affinity,
+        affinity_level=level
+    )
+
+def log_memory_retrieval(npc_name: str, count: int, memories: list = None, player_id: str = "player"):
     """记录记忆检索"""
-    dialogue_logger.info(f"🧠 检索到{count}条相关记忆")
-    if memories:
-        dialogue_logger.info("  📚 相关记忆:")
-        for i, mem in enumerate(memories[:3], 1):
-            content = mem.content[:50] + "..." if len(mem.content) > 50 else mem.content
-            dialogue_logger.info(f"    {i}. {content}")
+    previews = [
+        mem.content[:50] + "..." if len(mem.content) > 50 else mem.content
+        for mem in (memories or [])[:3]
+    ]
+    message = f"🧠 检索到{count}条相关记忆"
+    if previews:
+        message += "".join(f"\n    {i}. {content}" for i, content in enumerate(previews, 1))
+    _log("memory_retrieval", message, npc=npc_name, player=player_id, memory_count=count, memories=previews)
 
 def log_generating_response():
     """记录正在生成回复"""
-    dialogue_logger.info("🤖 正在生成回复...")
+    dialogue_logger.debug("🤖 正在生成回复...")
 
-def log_npc_response(npc_name: str, response: str):
+def log_npc_response(npc_name: str, response: str, player_id: str = "player"):
     """记录NPC回复"""
-    dialogue_logger.info(f"💬 {npc_name}回复: {response}")
+    _log("npc_response", f"💬 {npc_name}回复: {response}", npc=npc_name, player=player_id, response=response)
 
 def log_analyzing_affinity():
     """记录正在分析好感度"""
-    dialogue_logger.info("📊 正在分析好感度变化...")
+    dialogue_logger.debug("📊 好感度分析已提交后台队列")
 
-def log_affinity_change(affinity_result: dict):
+def log_affinity_change(affinity_result: dict, npc_name: Optional[str] = None, player_id: Optional[str] = None):
     """记录好感度变化"""
     if affinity_result.get("changed"):
         change_symbol = "📈" if affinity_result["change_amount"] > 0 else "📉"
-        dialogue_logger.info(
+        message = (
             f"{change_symbol} 好感度变化: {affinity_result['old_affinity']:.1f} -> "
-            f"{affinity_result['new_affinity']:.1f} ({affinity_result['change_amount']:+.1f})"
+            f"{affinity_result['new_affinity']:.1f} ({affinity_result['change_amount']:+.1f}) "
+            f"原因: {affinity_result['reason']} 情感: {affinity_result['sentiment']}"
         )
-        dialogue_logger.info(f"  原因: {affinity_result['reason']}")
-        dialogue_logger.info(f"  情感: {affinity_result['sentiment']}")
-        
         if affinity_result['old_level'] != affinity_result['new_level']:
-            dialogue_logger.info(
-                f"  🎉 关系等级变化: {affinity_result['old_level']} -> {affinity_result['new_level']}"
-            )
+            message += f" 🎉 关系等级变化: {affinity_result['old_level']} -> {affinity_result['new_level']}"
+        _log(
+            "affinity_change",
+            message,
+            npc=npc_name,
+            player=player_id,
+            affinity=affinity_result["new_affinity"],
+            affinity_delta=affinity_result["change_amount"],
+            reason=affinity_result["reason"],
+            sentiment=affinity_result["sentiment"]
+        )
     else:
-        dialogue_logger.info(f"  ➡️ 好感度未变化 (当前: {affinity_result.get('affinity', 50.0):.1f})")
-        dialogue_logger.info(f"  原因: {affinity_result.get('reason', '无')}")
+        _log(
+            "affinity_change",
+            f"➡️ 好感度未变化 (当前: {affinity_result.get('affinity', 50.0):.1f}) 原因: {affinity_result.get('reason', '无')}",
+            npc=npc_name,
+            player=player_id,
+            affinity=affinity_result.get("affinity", 50.0),
+            affinity_delta=0,
+            reason=affinity_result.get("reason"),
+            sentiment=affinity_result.get("sentiment")
+        )
 
 def log_memory_saved(npc_name: str):
     """记录记忆保存"""
-    dialogue_logger.info(f"  💾 对话已保存到{npc_name}的记忆中")
-
-def log_dialogue_end():
-    """记录对话结束"""
-    dialogue_logger.info("=" * 60)
-    dialogue_logger.info("✅ 对话完成\n")
+    dialogue_logger.debug(f"💾 对话已提交保存到{npc_name}的记忆中")
+
+def log_dialogue_end(
+    npc_name: Optional[str] = None,
+    player_id: Optional[str] = None,
+    latency_ms: Optional[float] = None,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None
+):
+    """记录对话结束 (包含耗时和token用量)"""
+    message = "✅ 对话完成"
+    if latency_ms is not None:
+        message += f" ({latency_ms:.0f} ms"
+        if prompt_tokens is not None and completion_tokens is not None:
+            message += f", tokens {prompt_tokens}+{completion_tokens}"
+        message += ")"
+    _log(
+        "dialogue_end",
+        message,
+        npc=npc_name,
+        player=player_id,
+        latency_ms=None if latency_ms is None else round(latency_ms, 1),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens
+    )
 
 def log_info(message: str):
     """记录普通信息"""
-    dialogue_logger.info(message)
+    _log("info", message)
 
 def log_error(message: str):
     """记录错误信息"""
-    dialogue_logger.error(message)
+    _log("error", message, level=logging.ERROR)
 
 # 启动时记录日志文件位置
-print(f"\n📝 对话日志文件: {LOG_FILE}")
+print(f"\n📝 对话日志文件: {file_handler.baseFilename}")
 print(f"📂 日志目录: {LOGS_DIR}\n")
-
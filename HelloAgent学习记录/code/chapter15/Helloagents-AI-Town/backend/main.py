@@ -1,8 +1,10 @@
 """赛博小镇 FastAPI 后端主程序"""
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from typing import Optional
 import uvicorn
 
 from config import settings
@@ -12,6 +14,7 @@ from models import (
 )
 from agents import get_npc_manager
 from state_manager import get_state_manager
+from logger import stop_logging
 
 # 生命周期管理
 @asynccontextmanager
@@ -42,6 +45,9 @@ async def lifespan(app: FastAPI):
     # 关闭时
     print("\n🛑 正在关闭服务...")
     await state_manager.stop()
+    npc_manager.shutdown()
+    # 后台好感度分析的日志写完后再停止日志线程
+    stop_logging()
     print("✅ 服务已关闭\n")
 
 # 创建FastAPI应用
@@ -91,6 +97,7 @@ async def root():
             "npcs_status": "/npcs/status",
             "npc_memories": "/npcs/{npc_name}/memories",
             "npc_affinity": "/npcs/{npc_name}/affinity",
+            "npc_affinity_history": "/npcs/{npc_name}/affinity/history",
             "all_affinities": "/affinities"
         }
     }
@@ -106,7 +113,7 @@ async def chat_with_npc(request: ChatRequest):
     
     玩家与指定NPC进行实时对话,使用独立的Agent处理
     """
-    npc_mgr, _ = get_managers()
+    npc_mgr, state_mgr = get_managers()
     
     # 验证NPC是否存在
     npc_info = npc_mgr.get_npc_info(request.npc_name)
@@ -115,10 +122,13 @@ async def chat_with_npc(request: ChatRequest):
             status_code=404,
             detail=f"NPC '{request.npc_name}' 不存在"
         )
+    state_mgr.mark_viewed([request.npc_name])
     
     try:
-        # 调用NPC Agent处理对话
-        response_text = npc_mgr.chat(request.npc_name, request.message)
+        # 调用NPC Agent处理对话 (在线程池中执行,不阻塞事件循环)
+        response_text = await run_in_threadpool(
+            npc_mgr.chat, request.npc_name, request.message, request.player_id
+        )
         
         return ChatResponse(
             npc_name=request.npc_name,
@@ -147,14 +157,21 @@ async def list_npcs():
     )
 
 @app.get("/npcs/status", response_model=NPCStatusResponse)
-async def get_npcs_status():
+async def get_npcs_status(npcs: Optional[str] = None):
     """获取所有NPC的当前状态
     
     返回批量生成的NPC对话内容,用于显示NPC的自主行为
+
+    Args:
+        npcs: 玩家当前能看到的NPC,逗号分隔。只有最近被看到的NPC会在下次更新时
+              调用LLM重新生成;不指定时只返回状态,不视为看到任何NPC
+              (客户端会定时轮询此接口,不能据此认为玩家在关注所有NPC)
     """
     _, state_mgr = get_managers()
     
     state = state_mgr.get_current_state()
+    if npcs:
+        state_mgr.mark_viewed(name.strip() for name in npcs.split(",") if name.strip())
     
     return NPCStatusResponse(
         dialogues=state["dialogues"],
@@ -191,6 +208,7 @@ async def get_npc_info(npc_name: str):
         )
 
     # 添加当前对话
+    state_mgr.mark_viewed([npc_name])
     current_dialogue = state_mgr.get_npc_dialogue(npc_name)
     npc_info["current_dialogue"] = current_dialogue
 
@@ -290,7 +308,8 @@ async def get_npc_affinity(npc_name: str, player_id: str = "player"):
         )
 
     try:
-        affinity_info = npc_mgr.get_npc_affinity(npc_name, player_id)
+        # 缓存未命中时会读取SQLite,在线程池中执行
+        affinity_info = await run_in_threadpool(npc_mgr.get_npc_affinity, npc_name, player_id)
 
         return {
             "npc_name": npc_name,
@@ -304,6 +323,45 @@ async def get_npc_affinity(npc_name: str, player_id: str = "player"):
             detail=f"获取好感度失败: {str(e)}"
         )
 
+@app.get("/npcs/{npc_name}/affinity/history")
+async def get_npc_affinity_history(npc_name: str, player_id: str = "player", limit: int = 20):
+    """获取NPC对玩家的好感度变化历史
+
+    Args:
+        npc_name: NPC名称
+        player_id: 玩家ID (默认为"player")
+        limit: 返回的记录数量限制 (默认20条)
+
+    Returns:
+        好感度变化记录 (包含原因和情感倾向)
+    """
+    npc_mgr, _ = get_managers()
+
+    # 验证NPC是否存在
+    npc_info = npc_mgr.get_npc_info(npc_name)
+    if not npc_info:
+        raise HTTPException(
+            status_code=404,
+            detail=f"NPC '{npc_name}' 不存在"
+        )
+
+    try:
+        # 查询前会先刷盘并读取SQLite,在线程池中执行
+        history = await run_in_threadpool(npc_mgr.get_npc_affinity_history, npc_name, player_id, limit)
+
+        return {
+            "npc_name": npc_name,
+            "player_id": player_id,
+            "history": history,
+            "total": len(history)
+        }
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取好感度历史失败: {str(e)}"
+        )
+
 @app.get("/affinities")
 async def get_all_affinities(player_id: str = "player"):
     """获取所有NPC对玩家的好感度
@@ -317,7 +375,7 @@ async def get_all_affinities(player_id: str = "player"):
     npc_mgr, _ = get_managers()
 
     try:
-        affinities = npc_mgr.get_all_affinities(player_id)
+        affinities = await run_in_threadpool(npc_mgr.get_all_affinities, player_id)
 
         return {
             "player_id": player_id,
@@ -360,8 +418,8 @@ async def set_npc_affinity(npc_name: str, affinity: float, player_id: str = "pla
         )
 
     try:
-        npc_mgr.set_npc_affinity(npc_name, affinity, player_id)
-        affinity_info = npc_mgr.get_npc_affinity(npc_name, player_id)
+        await run_in_threadpool(npc_mgr.set_npc_affinity, npc_name, affinity, player_id)
+        affinity_info = await run_in_threadpool(npc_mgr.get_npc_affinity, npc_name, player_id)
 
         return {
             "message": f"已设置{npc_name}对玩家的好感度",
@@ -0,0 +1,382 @@
+"""NPC记忆向量索引 - 对话路径上的快速记忆检索"""
+
+import queue
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # 未安装时退化为暴力检索,记忆较多时检索变慢
+    hnswlib = None
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+
+# 达到阈值但无法使用HNSW的警告只打印一次
+_hnsw_missing_warned = False
+
+
+@dataclass
+class MemoryRecord:
+    """索引中的一条记忆 (字段与MemoryItem保持一致,便于复用上下文构建逻辑)"""
+    content: str
+    player_id: str
+    importance: float = 0.5
+    timestamp: datetime = field(default_factory=datetime.now)
+    metadata: Dict = field(default_factory=dict)
+    memory_type: str = "working"
+
+
+class HashingEmbedder:
+    """基于特征哈希的轻量文本向量
+
+    英文按单词、中文按单字和双字切分后哈希到固定维度,无需加载模型。
+    需要语义检索时可以向MemoryIndexManager传入其他embed_fn。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self._tokenize(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                # 最高位决定符号,减少哈希冲突带来的偏差
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        tokens = []
+        for word in _TOKEN_RE.findall(text.lower()):
+            if word.isascii():
+                tokens.append(word)
+            else:
+                tokens.extend(word)
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        return tokens
+
+
+class VectorIndex:
+    """单个分区的向量索引
+
+    数量较少时用NumPy矩阵暴力检索(精确);超过hnsw_threshold且安装了hnswlib时
+    切换到HNSW近似检索,检索耗时不再随记忆数量线性增长。
+    """
+
+    def __init__(self, dim: int, hnsw_threshold: int = 10000, ef_search: int = 64):
+        self.dim = dim
+        self.hnsw_threshold = hnsw_threshold
+        self.ef_search = ef_search
+
+        self._matrix = np.zeros((64, dim), dtype=np.float32)
+        self._ids = np.zeros(64, dtype=np.int64)
+        self._count = 0
+        self._hnsw = None
+        self._building = False  # 正在锁外构建HNSW索引
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def uses_hnsw(self) -> bool:
+        return self._hnsw is not None
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        """追加一批向量 (需已归一化)"""
+        snapshot = None
+        with self._lock:
+            new_count = self._count + len(vectors)
+            if new_count > len(self._matrix):
+                capacity = max(new_count, len(self._matrix) * 2)
+                self._matrix = np.resize(self._matrix, (capacity, self.dim))
+                self._ids = np.resize(self._ids, capacity)
+            self._matrix[self._count:new_count] = vectors
+            self._ids[self._count:new_count] = ids
+            self._count = new_count
+
+            if self._hnsw is not None:
+                if new_count > self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(len(self._matrix))
+                self._hnsw.add_items(vectors, ids)
+            elif new_count >= self.hnsw_threshold:
+                if hnswlib is None:
+                    _warn_hnsw_missing(new_count, self.hnsw_threshold)
+                elif not self._building:
+                    # 已写入的行不会再被修改,扩容时np.resize返回新数组,旧数组的切片仍然有效
+                    self._building = True
+                    snapshot = (self._matrix[:new_count], self._ids[:new_count], len(self._matrix))
+
+        if snapshot is not None:
+            self._build_hnsw(*snapshot)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """返回与query最相似的k个(id, 相似度)"""
+        with self._lock:
+            count = self._count
+            if count == 0 or k <= 0:
+                return []
+            k = min(k, count)
+
+            if self._hnsw is not None:
+                self._hnsw.set_ef(max(self.ef_search, k))
+                labels, distances = self._hnsw.knn_query(query, k=k)
+                # 内积空间的距离为 1 - 内积
+                return [(int(label), 1.0 - float(dist)) for label, dist in zip(labels[0], distances[0])]
+
+            scores = self._matrix[:count] @ query
+            ids = self._ids[:count]
+
+        if k < count:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def _build_hnsw(self, matrix: np.ndarray, ids: np.ndarray, max_elements: int):
+        """记忆数量超过阈值,在锁外用快照构建HNSW索引,再在锁内补上构建期间新增的向量并切换
+
+        构建期间检索继续使用暴力检索。
+        """
+        try:
+            index = hnswlib.Index(space="ip", dim=self.dim)
+            index.init_index(max_elements=max_elements, ef_construction=100, M=16)
+            index.add_items(matrix, ids)
+        except Exception:
+            with self._lock:
+                self._building = False
+            raise
+
+        built = len(matrix)
+        with self._lock:
+            if self._count > built:
+                if self._count > index.get_max_elements():
+                    index.resize_index(len(self._matrix))
+                index.add_items(self._matrix[built:self._count], self._ids[built:self._count])
+            self._hnsw = index
+            self._building = False
+
+
+def _warn_hnsw_missing(count: int, threshold: int):
+    global _hnsw_missing_warned
+    if _hnsw_missing_warned:
+        return
+    _hnsw_missing_warned = True
+    print(
+        f"⚠️  记忆分区已有{count}条记忆(达到MEMORY_HNSW_THRESHOLD={threshold}),"
+        f"但未安装hnswlib,仍在使用暴力检索,检索延迟会随记忆数量线性增长。"
+        f"请运行 pip install hnswlib"
+    )
+
+
+class NPCMemoryIndex:
+    """单个NPC的记忆索引,按玩家分区,检索只在当前玩家的记忆中进行"""
+
+    def __init__(self, npc_name: str, dim: int, hnsw_threshold: int):
+        self.npc_name = npc_name
+        self.dim = dim
+        self.hnsw_threshold = hnsw_threshold
+
+        self._records: List[MemoryRecord] = []
+        self._partitions: Dict[str, VectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, records: List[MemoryRecord], vectors: np.ndarray):
+        """追加一批已计算好向量的记忆"""
+        by_player: Dict[str, List[int]] = {}
+        with self._lock:
+            start = len(self._records)
+            self._records.extend(records)
+            for offset, record in enumerate(records):
+                by_player.setdefault(record.player_id, []).append(offset)
+            partitions = {}
+            for player_id in by_player:
+                partition = self._partitions.get(player_id)
+                if partition is None:
+                    partition = VectorIndex(self.dim, self.hnsw_threshold)
+                    self._partitions[player_id] = partition
+                partitions[player_id] = partition
+
+        for player_id, offsets in by_player.items():
+            partitions[player_id].add(vectors[offsets], np.asarray(offsets, dtype=np.int64) + start)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        player_id: str,
+        limit: int = 5,
+        min_importance: float = 0.0
+    ) -> List[MemoryRecord]:
+        """检索玩家与该NPC最相关的记忆"""
+        partition = self._partitions.get(player_id)
+        if partition is None:
+            return []
+
+        # 多取一些候选,过滤掉重要性不足的记忆后仍能凑够limit条
+        candidates = partition.search(query_vector, limit * 2)
+        results = []
+        for record_id, _ in candidates:
+            record = self._records[record_id]
+            if record.importance >= min_importance:
+                results.append(record)
+                if len(results) >= limit:
+                    break
+        return results
+
+
+@dataclass
+class _WriteJob:
+    npc_name: str
+    records: List[MemoryRecord]
+    persist: Optional[Callable[[], None]] = None
+
+
+class MemoryIndexManager:
+    """所有NPC的记忆索引
+
+    功能:
+    - retrieve() 在请求线程中直接查询内存索引,只需计算一次查询向量
+    - add() 立即返回,后台线程攒批计算向量、写入索引,再调用persist写入MemoryManager
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+        dim: int = 256,
+        hnsw_threshold: int = 10000,
+        batch_size: int = 32,
+        batch_wait: float = 0.2
+    ):
+        """初始化记忆索引
+
+        Args:
+            embed_fn: 文本转向量函数,输入文本列表,返回(n, dim)的归一化矩阵;默认HashingEmbedder
+            dim: 向量维度
+            hnsw_threshold: 单个玩家分区超过多少条记忆后切换到HNSW
+            batch_size: 后台一次最多处理的写入任务数
+            batch_wait: 收到写入后最多等待多久凑批(秒)
+        """
+        self.embed_fn = embed_fn or HashingEmbedder(dim)
+        self.dim = dim
+        self.hnsw_threshold = hnsw_threshold
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+
+        self._indexes: Dict[str, NPCMemoryIndex] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[_WriteJob]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="MemoryIndexWriter", daemon=True)
+        self._thread.start()
+
+        if hnswlib is None:
+            print("⚠️  未安装hnswlib,记忆检索将始终使用暴力检索 (pip install hnswlib)")
+
+    def index(self, npc_name: str) -> NPCMemoryIndex:
+        """获取NPC的记忆索引 (不存在时创建)"""
+        with self._lock:
+            index = self._indexes.get(npc_name)
+            if index is None:
+                index = NPCMemoryIndex(npc_name, self.dim, self.hnsw_threshold)
+                self._indexes[npc_name] = index
+            return index
+
+    def retrieve(
+        self,
+        npc_name: str,
+        query: str,
+        player_id: str,
+        limit: int = 5,
+        min_importance: float = 0.0
+    ) -> List[MemoryRecord]:
+        """检索NPC关于该玩家的相关记忆"""
+        index = self.index(npc_name)
+        if len(index) == 0:
+            return []
+        query_vector = self.embed_fn([query])[0]
+        return index.search(query_vector, player_id, limit, min_importance)
+
+    def add(
+        self,
+        npc_name: str,
+        records: List[MemoryRecord],
+        persist: Optional[Callable[[], None]] = None
+    ):
+        """异步写入记忆
+
+        Args:
+            npc_name: NPC名称
+            records: 要写入索引的记忆
+            persist: 写入索引后在后台线程中执行的持久化操作
+        """
+        self._queue.put(_WriteJob(npc_name, records, persist))
+
+    def pending(self) -> int:
+        """等待写入的任务数"""
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 30.0):
+        """停止后台线程,已提交的写入会先完成"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        """后台写入线程"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            jobs = [job]
+            stop_after_batch = False
+            deadline = time.monotonic() + self.batch_wait
+            while len(jobs) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    next_job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_job is None:
+                    stop_after_batch = True
+                    break
+                jobs.append(next_job)
+
+            self._write_batch(jobs)
+            if stop_after_batch:
+                return
+
+    def _write_batch(self, jobs: List[_WriteJob]):
+        records = [record for job in jobs for record in job.records]
+        try:
+            # 整批一次计算向量
+            vectors = self.embed_fn([record.content for record in records]) if records else None
+
+            offset = 0
+            for job in jobs:
+                count = len(job.records)
+                if count:
+                    self.index(job.npc_name).add(job.records, vectors[offset:offset + count])
+                offset += count
+        except Exception as e:
+            print(f"❌ 记忆索引写入失败: {e}")
+
+        for job in jobs:
+            if job.persist is None:
+                continue
+            try:
+                job.persist()
+            except Exception as e:
+                print(f"❌ {job.npc_name}记忆保存失败: {e}")
@@ -7,9 +7,16 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'HelloAgents'))
 
 from hello_agents import SimpleAgent, HelloAgentsLLM
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 import json
 import re
+import threading
+
+from affinity_store import AffinityStore
+from config import settings
+
+# 初始好感度
+DEFAULT_AFFINITY = 50.0
 
 class RelationshipManager:
     """NPC好感度管理器
@@ -19,19 +26,28 @@ class RelationshipManager:
     - 使用LLM分析对话情感
     - 自动更新好感度
     - 提供好感度等级和修饰词
+    - 好感度持久化到SQLite,并记录每次变化的原因
     """
     
-    def __init__(self, llm: HelloAgentsLLM):
+    def __init__(self, llm: HelloAgentsLLM, store: Optional[AffinityStore] = None):
         """初始化好感度管理器
         
         Args:
             llm: HelloAgentsLLM实例
+            store: 好感度存储,默认使用配置中的SQLite数据库
         """
         self.llm = llm
         
-        # 存储每个NPC与玩家的好感度
-        # 格式: {npc_name: {player_id: affinity_score}}
-        self.affinity_scores: Dict[str, Dict[str, float]] = {}
+        # 存储每个NPC与玩家的好感度 (读取走内存缓存,写入批量落盘)
+        self.store = store or AffinityStore(
+            settings.AFFINITY_DB_PATH,
+            flush_interval=settings.AFFINITY_FLUSH_INTERVAL,
+            flush_batch_size=settings.AFFINITY_FLUSH_BATCH_SIZE,
+            max_cached_players=settings.AFFINITY_CACHE_PLAYERS
+        )
+
+        # 分析结果的"读取-修改-写入"需要整体加锁
+        self._lock = threading.RLock()
         
         # 创建好感度分析Agent
         self.analyzer_agent = SimpleAgent(
@@ -112,28 +128,46 @@ NPC: "当然可以!我很乐意分享。"
         Returns:
             好感度值 (0-100)
         """
-        if npc_name not in self.affinity_scores:
-            self.affinity_scores[npc_name] = {}
-        
-        if player_id not in self.affinity_scores[npc_name]:
-            self.affinity_scores[npc_name][player_id] = 50.0  # 初始好感度50
-        
-        return self.affinity_scores[npc_name][player_id]
+        affinity = self.store.get(npc_name, player_id)
+        return DEFAULT_AFFINITY if affinity is None else affinity  # 初始好感度50
     
-    def set_affinity(self, npc_name: str, affinity: float, player_id: str = "player"):
+    def set_affinity(
+        self,
+        npc_name: str,
+        affinity: float,
+        player_id: str = "player",
+        reason: str = "手动设置",
+        sentiment: Optional[str] = None
+    ):
         """设置好感度
         
         Args:
             npc_name: NPC名称
             affinity: 好感度值 (0-100)
             player_id: 玩家ID
+            reason: 变化原因 (记录到历史)
+            sentiment: 情感倾向 (记录到历史)
         """
-        if npc_name not in self.affinity_scores:
-            self.affinity_scores[npc_name] = {}
-        
         # 限制在0-100范围内
         affinity = max(0.0, min(100.0, affinity))
-        self.affinity_scores[npc_name][player_id] = affinity
+
+        with self._lock:
+            self.store.set(
+                npc_name,
+                player_id,
+                affinity,
+                reason=reason,
+                sentiment=sentiment,
+                old_affinity=self.get_affinity(npc_name, player_id)
+            )
+
+    def get_affinity_history(self, npc_name: str, player_id: str = "player", limit: int = 20) -> List[Dict]:
+        """获取好感度变化历史 (最新的在前)"""
+        return self.store.history(npc_name, player_id, limit)
+
+    def close(self):
+        """写入尚未落盘的好感度"""
+        self.store.close()
     
     def analyze_and_update_affinity(
         self,
@@ -154,13 +188,7 @@ NPC: "当然可以!我很乐意分享。"
             分析结果字典
         """
         # 构建分析提示
-        prompt = f"""请分析以下对话:
-
-玩家: {player_message}
-{npc_name}: {npc_response}
-
-请判断是否应该改变好感度,并给出变化量。
-"""
+        prompt = self._build_analysis_prompt(npc_name, player_message, npc_response)
         
         try:
             # 调用分析Agent
@@ -168,14 +196,79 @@ NPC: "当然可以!我很乐意分享。"
             
             # 解析JSON响应
             analysis = self._parse_analysis(response)
-            
-            if analysis["should_change"]:
+            return self.apply_analysis(npc_name, analysis, player_id)
+        
+        except Exception as e:
+            print(f"❌ 好感度分析失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                "changed": False,
+                "affinity": self.get_affinity(npc_name, player_id),
+                "reason": "分析失败",
+                "sentiment": "neutral"
+            }
+
+    def analyze_batch(self, exchanges: List[Dict[str, str]]) -> List[Dict]:
+        """一次LLM调用分析多段对话 (不更新好感度)
+
+        Args:
+            exchanges: 对话列表,每项包含npc_name、player_message、npc_response
+
+        Returns:
+            与exchanges一一对应的分析结果,格式同_parse_analysis
+        """
+        if not exchanges:
+            return []
+
+        if len(exchanges) == 1:
+            exchange = exchanges[0]
+            prompt = self._build_analysis_prompt(
+                exchange["npc_name"], exchange["player_message"], exchange["npc_response"]
+            )
+            return [self._parse_analysis(self._invoke_analyzer(prompt))]
+
+        dialogue_parts = []
+        for index, exchange in enumerate(exchanges):
+            dialogue_parts.append(
+                f"[{index}]\n玩家: {exchange['player_message']}\n{exchange['npc_name']}: {exchange['npc_response']}"
+            )
+        dialogue_text = "\n\n".join(dialogue_parts)
+
+        prompt = f"""请分别分析以下{len(exchanges)}段相互独立的对话:
+
+{dialogue_text}
+
+【输出格式】(严格遵守JSON数组格式,每段对话一个元素,不要添加任何其他文字)
+[{{"index": 0, "should_change": true/false, "change_amount": 整数, "reason": "简短原因", "sentiment": "positive/neutral/negative"}}, ...]
+"""
+        return self._parse_batch_analysis(self._invoke_analyzer(prompt), len(exchanges))
+
+    def apply_analysis(self, npc_name: str, analysis: Dict, player_id: str = "player") -> Dict:
+        """根据分析结果更新好感度
+
+        Args:
+            npc_name: NPC名称
+            analysis: 分析结果 (_parse_analysis的返回格式)
+            player_id: 玩家ID
+
+        Returns:
+            好感度变化结果字典
+        """
+        with self._lock:
+            if analysis.get("should_change"):
                 # 更新好感度
                 current_affinity = self.get_affinity(npc_name, player_id)
                 new_affinity = current_affinity + analysis["change_amount"]
                 new_affinity = max(0.0, min(100.0, new_affinity))  # 限制在0-100
 
-                self.set_affinity(npc_name, new_affinity, player_id)
+                self.set_affinity(
+                    npc_name,
+                    new_affinity,
+                    player_id,
+                    reason=analysis.get("reason", "未知"),
+                    sentiment=analysis.get("sentiment", "neutral")
+                )
 
                 # 获取好感度等级
                 old_level = self.get_affinity_level(current_affinity)
@@ -188,7 +281,7 @@ NPC: "当然可以!我很乐意分享。"
                     "old_affinity": current_affinity,
                     "new_affinity": new_affinity,
                     "change_amount": analysis["change_amount"],
-                    "reason": analysis["reason"],
+                    "reason": analysis.get("reason", "未知"),
                     "sentiment": analysis.get("sentiment", "neutral"),
                     "old_level": old_level,
                     "new_level": new_level
@@ -197,20 +290,71 @@ NPC: "当然可以!我很乐意分享。"
                 return {
                     "changed": False,
                     "affinity": self.get_affinity(npc_name, player_id),
-                    "reason": analysis["reason"],
+                    "reason": analysis.get("reason", "未知"),
                     "sentiment": analysis.get("sentiment", "neutral")
                 }
-        
-        except Exception as e:
-            print(f"❌ 好感度分析失败: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "changed": False,
-                "affinity": self.get_affinity(npc_name, player_id),
-                "reason": "分析失败",
-                "sentiment": "neutral"
+
+    def _build_analysis_prompt(self, npc_name: str, player_message: str, npc_response: str) -> str:
+        """构建单段对话的分析提示"""
+        return f"""请分析以下对话:
+
+玩家: {player_message}
+{npc_name}: {npc_response}
+
+请判断是否应该改变好感度,并给出变化量。
+"""
+
+    def _invoke_analyzer(self, prompt: str) -> str:
+        """无状态地调用分析模型
+
+        批量分析在后台线程中运行,不经过analyzer_agent,避免其对话历史不断增长。
+        """
+        response = self.llm.invoke([
+            {"role": "system", "content": self._create_analyzer_prompt()},
+            {"role": "user", "content": prompt}
+        ])
+        return getattr(response, "content", response)
+
+    def _parse_batch_analysis(self, response: str, count: int) -> List[Dict]:
+        """解析批量分析结果,缺失或无法解析的条目使用默认值"""
+        default = {
+            "should_change": False,
+            "change_amount": 0,
+            "reason": "解析失败",
+            "sentiment": "neutral"
+        }
+
+        items = None
+        start = response.find('[')
+        end = response.rfind(']') + 1
+        if start != -1 and end > start:
+            try:
+                items = json.loads(response[start:end])
+            except json.JSONDecodeError:
+                items = None
+
+        if not isinstance(items, list):
+            print(f"⚠️  批量分析JSON解析失败,使用默认值。原始响应: {response[:100]}...")
+            return [dict(default) for _ in range(count)]
+
+        results: List[Dict] = [dict(default) for _ in range(count)]
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index", position)
+            if not isinstance(index, int) or not 0 <= index < count:
+                continue
+            try:
+                change_amount = int(item.get("change_amount", 0))
+            except (TypeError, ValueError):
+                continue
+            results[index] = {
+                "should_change": bool(item.get("should_change")) and change_amount != 0,
+                "change_amount": change_amount,
+                "reason": item.get("reason", "未知"),
+                "sentiment": item.get("sentiment", "neutral")
             }
+        return results
     
     def _parse_analysis(self, response: str) -> Dict:
         """解析分析结果
@@ -303,18 +447,26 @@ NPC: "当然可以!我很乐意分享。"
         else:
             return "冷淡疏离,不太愿意多说,回答简短"
     
-    def get_all_affinities(self, player_id: str = "player") -> Dict[str, Dict]:
+    def get_all_affinities(
+        self,
+        player_id: str = "player",
+        npc_names: Optional[Iterable[str]] = None
+    ) -> Dict[str, Dict]:
         """获取所有NPC的好感度信息
         
         Args:
             player_id: 玩家ID
+            npc_names: 需要返回的NPC,没有记录的使用初始好感度;默认只返回有记录的NPC
             
         Returns:
             所有NPC的好感度信息
         """
+        scores = self.store.get_player_scores(player_id)
+        if npc_names is not None:
+            scores = {name: scores.get(name, DEFAULT_AFFINITY) for name in npc_names}
+
         result = {}
-        for npc_name in self.affinity_scores:
-            affinity = self.get_affinity(npc_name, player_id)
+        for npc_name, affinity in scores.items():
             result[npc_name] = {
                 "affinity": affinity,
                 "level": self.get_affinity_level(affinity),
@@ -0,0 +1,207 @@
+"""NPC对话会话存储 - 每个(NPC, 玩家)独立的短期对话历史"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import quote
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数: 中文约1字1个token,其他字符约4个1个token"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@dataclass
+class ConversationSession:
+    """一个玩家与一个NPC之间的对话会话"""
+    npc_name: str
+    player_id: str
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    last_active: float = field(default_factory=time.time)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    evicted: bool = False
+
+    def history_messages(self) -> List[Dict[str, str]]:
+        """返回可直接拼接到LLM请求中的历史消息"""
+        return [dict(message) for message in self.messages]
+
+    def add_turn(self, user_message: str, assistant_message: str, max_tokens: int, max_messages: int):
+        """追加一轮对话,并按token预算和条数上限裁剪最早的对话"""
+        self.messages.append({"role": "user", "content": user_message})
+        self.messages.append({"role": "assistant", "content": assistant_message})
+        self.last_active = time.time()
+
+        total = sum(estimate_tokens(message["content"]) for message in self.messages)
+        # 成对删除最早的一轮,保证历史始终以玩家消息开头
+        while self.messages and (total > max_tokens or len(self.messages) > max_messages):
+            for message in self.messages[:2]:
+                total -= estimate_tokens(message["content"])
+            del self.messages[:2]
+
+
+class SessionStore:
+    """会话存储
+
+    功能:
+    - 按(NPC, 玩家)隔离对话历史,不同玩家互不干扰
+    - 历史按token预算裁剪,提示词长度不随对话轮数增长
+    - 闲置会话写入磁盘并从内存移除,再次对话时自动加载
+    """
+
+    def __init__(
+        self,
+        storage_dir: str,
+        max_history_tokens: int = 1200,
+        max_history_messages: int = 20,
+        idle_timeout: float = 600.0
+    ):
+        """初始化会话存储
+
+        Args:
+            storage_dir: 闲置会话的存储目录
+            max_history_tokens: 单个会话历史的token上限
+            max_history_messages: 单个会话历史的消息条数上限
+            idle_timeout: 会话闲置多久后写入磁盘(秒)
+        """
+        self.storage_dir = storage_dir
+        self.max_history_tokens = max_history_tokens
+        self.max_history_messages = max_history_messages
+        self.idle_timeout = idle_timeout
+
+        self._sessions: Dict[Tuple[str, str], ConversationSession] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    @contextmanager
+    def session(self, npc_name: str, player_id: str) -> Iterator[ConversationSession]:
+        """独占地使用一个会话
+
+        同一玩家与同一NPC的并发请求会依次执行,不会交错写入历史。
+        """
+        self._maybe_evict_idle()
+
+        while True:
+            session = self._get_or_load(npc_name, player_id)
+            session.lock.acquire()
+            if not session.evicted:
+                break
+            # 获取锁的过程中会话刚好被换出,重新加载
+            session.lock.release()
+
+        try:
+            session.last_active = time.time()
+            yield session
+        finally:
+            session.lock.release()
+
+    def add_turn(self, session: ConversationSession, user_message: str, assistant_message: str):
+        """向会话追加一轮对话 (需在session()内调用)"""
+        session.add_turn(
+            user_message,
+            assistant_message,
+            max_tokens=self.max_history_tokens,
+            max_messages=self.max_history_messages
+        )
+
+    def active_count(self) -> int:
+        """内存中的会话数"""
+        with self._lock:
+            return len(self._sessions)
+
+    def evict_idle(self, idle_timeout: float = None) -> int:
+        """将闲置会话写入磁盘并从内存移除
+
+        Args:
+            idle_timeout: 闲置阈值(秒),默认使用初始化时的配置
+
+        Returns:
+            换出的会话数
+        """
+        threshold = self.idle_timeout if idle_timeout is None else idle_timeout
+        now = time.time()
+        evicted = 0
+
+        with self._lock:
+            for key, session in list(self._sessions.items()):
+                if now - session.last_active < threshold:
+                    continue
+                # 正在对话的会话跳过,下次再换出
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    self._write(session)
+                    session.evicted = True
+                    del self._sessions[key]
+                    evicted += 1
+                except OSError as e:
+                    print(f"❌ 保存会话失败 ({session.npc_name}/{session.player_id}): {e}")
+                finally:
+                    session.lock.release()
+
+        return evicted
+
+    def flush(self) -> int:
+        """将所有会话写入磁盘 (用于关闭服务)"""
+        return self.evict_idle(idle_timeout=0)
+
+    def _maybe_evict_idle(self):
+        now = time.time()
+        # 每隔一段时间顺带检查一次,无需额外的后台线程
+        if now - self._last_sweep < min(60.0, self.idle_timeout):
+            return
+        self._last_sweep = now
+        count = self.evict_idle()
+        if count:
+            print(f"💤 已将{count}个闲置会话写入磁盘")
+
+    def _get_or_load(self, npc_name: str, player_id: str) -> ConversationSession:
+        key = (npc_name, player_id)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._read(npc_name, player_id)
+                self._sessions[key] = session
+            return session
+
+    def _path(self, npc_name: str, player_id: str) -> str:
+        return os.path.join(self.storage_dir, npc_name, "sessions", f"{quote(player_id, safe='')}.json")
+
+    def _write(self, session: ConversationSession):
+        path = self._path(session.npc_name, session.player_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "npc_name": session.npc_name,
+                    "player_id": session.player_id,
+                    "messages": session.messages,
+                    "last_active": session.last_active
+                },
+                f,
+                ensure_ascii=False
+            )
+        os.replace(tmp_path, path)
+
+    def _read(self, npc_name: str, player_id: str) -> ConversationSession:
+        path = self._path(npc_name, player_id)
+        if not os.path.exists(path):
+            return ConversationSession(npc_name, player_id)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return ConversationSession(
+                npc_name,
+                player_id,
+                messages=list(data.get("messages", [])),
+                last_active=time.time()
+            )
+        except (OSError, ValueError) as e:
+            print(f"⚠️  会话文件损坏,重新开始会话 ({npc_name}/{player_id}): {e}")
+            return ConversationSession(npc_name, player_id)
@@ -1,9 +1,12 @@
 """NPC状态管理器 - 定时批量更新NPC对话"""
 
 import asyncio
+import time
 from datetime import datetime
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Set, Tuple
 from batch_generator import get_batch_generator
+from config import settings
 
 class NPCStateManager:
     """NPC状态管理器
@@ -12,24 +15,33 @@ class NPCStateManager:
     1. 定时批量生成NPC对话(降低API成本)
     2. 缓存当前NPC状态
     3. 提供状态查询接口
+
+    批量生成在线程池中执行,不阻塞事件循环;生成期间读取到的始终是上一份完整状态,
+    新状态生成完毕后整体替换。
+
+    只有最近被玩家看到的NPC会调用LLM重新生成,其余NPC沿用缓存或预设对话。
     """
     
-    def __init__(self, update_interval: int = 30):
+    def __init__(self, update_interval: int = 30, view_ttl: int = settings.NPC_VIEW_TTL):
         """初始化状态管理器
         
         Args:
             update_interval: 更新间隔(秒),默认30秒
+            view_ttl: NPC被看到后多久内保持自动更新(秒)
         """
         self.update_interval = update_interval
+        self.view_ttl = view_ttl
         self.batch_generator = get_batch_generator()
+
+        # 每个NPC最近一次被玩家看到的时间
+        self._last_viewed: Dict[str, float] = {}
         
-        # 当前状态
-        self.current_dialogues: Dict[str, str] = {}
-        self.last_update: Optional[datetime] = None
-        self.next_update_time: Optional[datetime] = None
+        # 当前状态: (对话快照, 更新时间),整体替换,读取方无需加锁
+        self._snapshot: Tuple[Mapping[str, str], Optional[datetime]] = (MappingProxyType({}), None)
         
         # 后台任务
         self._update_task: Optional[asyncio.Task] = None
+        self._generation_task: Optional[asyncio.Task] = None
         self._running = False
         
         print(f"📊 NPC状态管理器初始化完成 (更新间隔: {update_interval}秒)")
@@ -56,21 +68,52 @@ class NPCStateManager:
         
         self._running = False
         
-        if self._update_task:
-            self._update_task.cancel()
-            try:
-                await self._update_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._update_task, self._generation_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         
         print("🛑 NPC状态自动更新已停止")
     
+    @property
+    def current_dialogues(self) -> Mapping[str, str]:
+        """当前NPC对话 (只读快照)"""
+        return self._snapshot[0]
+
+    @property
+    def last_update(self) -> Optional[datetime]:
+        """上次更新时间"""
+        return self._snapshot[1]
+
+    def mark_viewed(self, npc_names: Iterable[str]):
+        """记录NPC被玩家看到 (对话、查看详情或按NPC过滤查询状态时调用)
+
+        只记录已配置的NPC,客户端传入的未知名称会被忽略。
+        """
+        now = time.monotonic()
+        known = self.batch_generator.npc_configs
+        for name in npc_names:
+            if name in known:
+                self._last_viewed[name] = now
+
+    def _active_npcs(self) -> Set[str]:
+        """最近被玩家看到的NPC"""
+        deadline = time.monotonic() - self.view_ttl
+        return {name for name, viewed_at in list(self._last_viewed.items()) if viewed_at >= deadline}
+
     async def _auto_update_loop(self):
         """自动更新循环"""
         while self._running:
             try:
                 await asyncio.sleep(self.update_interval)
-                await self._update_npc_states()
+                if self._generation_task and not self._generation_task.done():
+                    # 上一次生成还没结束,跳过本轮,避免请求堆积
+                    print("⏭️  上一轮NPC对话仍在生成,跳过本次更新")
+                    continue
+                self._generation_task = asyncio.create_task(self._update_npc_states())
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -82,17 +125,18 @@ class NPCStateManager:
         try:
             print(f"\n🔄 [{datetime.now().strftime('%H:%M:%S')}] 开始批量更新NPC对话...")
             
-            # 批量生成对话
-            new_dialogues = self.batch_generator.generate_batch_dialogues()
+            # 批量生成对话 (同步LLM调用,放到线程池中执行)
+            loop = asyncio.get_running_loop()
+            new_dialogues = await loop.run_in_executor(
+                None, self.batch_generator.refresh, self._active_npcs()
+            )
             
-            # 更新状态
-            self.current_dialogues = new_dialogues
-            self.last_update = datetime.now()
-            self.next_update_time = datetime.now()
+            # 整体替换状态,读取方要么看到旧快照,要么看到新快照
+            self._snapshot = (MappingProxyType(dict(new_dialogues)), datetime.now())
             
             # 打印更新结果
-            print("📝 NPC对话已更新:")
-            for npc_name, dialogue in new_dialogues.items():
+            print(f"📝 NPC对话已更新 ({len(new_dialogues)}个NPC)")
+            for npc_name, dialogue in list(new_dialogues.items())[:10]:
                 print(f"   - {npc_name}: {dialogue}")
             
         except Exception as e:
@@ -100,16 +144,18 @@ class NPCStateManager:
     
     def get_current_state(self) -> Dict:
         """获取当前状态"""
+        dialogues, last_update = self._snapshot
+
         # 计算下次更新倒计时
-        if self.last_update:
-            elapsed = (datetime.now() - self.last_update).total_seconds()
+        if last_update:
+            elapsed = (datetime.now() - last_update).total_seconds()
             next_update_in = max(0, int(self.update_interval - elapsed))
         else:
             next_update_in = self.update_interval
         
         return {
-            "dialogues": self.current_dialogues,
-            "last_update": self.last_update,
+            "dialogues": dict(dialogues),
+            "last_update": last_update,
             "next_update_in": next_update_in
         }
     
@@ -120,12 +166,17 @@ class NPCStateManager:
     async def force_update(self):
         """强制立即更新"""
         print("⚡ 强制更新NPC状态...")
-        await self._update_npc_states()
+        if self._generation_task and not self._generation_task.done():
+            # 已有生成任务在运行,等待它完成即可,不重复调用LLM
+            await asyncio.shield(self._generation_task)
+            return
+        self._generation_task = asyncio.create_task(self._update_npc_states())
+        await asyncio.shield(self._generation_task)
 
 # 全局单例
 _state_manager = None
 
-def get_state_manager(update_interval: int = 30) -> NPCStateManager:
+def get_state_manager(update_interval: int = settings.NPC_UPDATE_INTERVAL) -> NPCStateManager:
     """获取状态管理器单例"""
     global _state_manager
     if _state_manager is None:
@@ -1,83 +1,302 @@
-"""实时查看对话日志"""
+"""查看对话日志
 
+日志文件是JSON行格式。query命令会先把新增的日志行增量写入SQLite索引
+(logs/index.db,只记录可过滤字段和行在文件中的偏移),再按索引定位到对应行读取,
+不需要逐行扫描日志文本。
+"""
+
+import argparse
+import hashlib
+import json
 import os
+import sqlite3
 import time
-from pathlib import Path
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
 
 # 日志目录
 LOGS_DIR = Path(__file__).parent / "logs"
-today = datetime.now().strftime("%Y-%m-%d")
-LOG_FILE = LOGS_DIR / f"dialogue_{today}.log"
+INDEX_DB = LOGS_DIR / "index.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    signature TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    indexed_offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS log_entries (
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    ts TEXT NOT NULL,
+    level TEXT,
+    event TEXT,
+    npc TEXT,
+    player TEXT,
+    latency_ms REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    affinity_delta REAL,
+    PRIMARY KEY (file_id, offset)
+);
+CREATE INDEX IF NOT EXISTS idx_log_entries_ts ON log_entries (ts);
+CREATE INDEX IF NOT EXISTS idx_log_entries_npc ON log_entries (npc, ts);
+CREATE INDEX IF NOT EXISTS idx_log_entries_player ON log_entries (player, ts);
+CREATE INDEX IF NOT EXISTS idx_log_entries_event ON log_entries (event, ts);
+"""
+
+_INDEXED_FIELDS = (
+    "ts", "level", "event", "npc", "player",
+    "latency_ms", "prompt_tokens", "completion_tokens", "affinity_delta"
+)
+
+
+def today_log_file() -> Path:
+    """当天的日志文件"""
+    return LOGS_DIR / f"dialogue_{datetime.now().strftime('%Y-%m-%d')}.jsonl"
+
+def log_files() -> List[Path]:
+    """所有日志文件 (含按大小轮转出的 .1 .2 ...)"""
+    if not LOGS_DIR.exists():
+        return []
+    return sorted(LOGS_DIR.glob("dialogue_*.jsonl*"), reverse=True)
+
+def format_record(line: str) -> str:
+    """将一行JSON日志转换为便于阅读的文本"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return line.rstrip("\n")
+    ts = record.get("ts", "")
+    return f"{ts[11:19]} - {record.get('message', '')}"
+
+
+class LogIndex:
+    """日志索引
+
+    功能:
+    - 按文件记录已索引到的偏移,每次只读取新增的行
+    - 用首行内容识别文件,文件轮转改名后继续沿用原有索引
+    - 文件被删除或被截断时清理对应的索引
+    """
+
+    def __init__(self, db_path: Path = INDEX_DB):
+        db_path.parent.mkdir(exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.executescript(_SCHEMA)
+
+    def refresh(self) -> int:
+        """将所有日志文件的新增内容写入索引
+
+        Returns:
+            新增的索引条数
+        """
+        added = 0
+        seen_ids = set()
+        with self.conn:
+            for path in log_files():
+                signature = self._signature(path)
+                if signature is None:
+                    continue
+                row = self.conn.execute(
+                    "SELECT id, indexed_offset FROM log_files WHERE signature = ?", (signature,)
+                ).fetchone()
+                if row is None:
+                    cursor = self.conn.execute(
+                        "INSERT INTO log_files (signature, path, indexed_offset) VALUES (?, ?, 0)",
+                        (signature, str(path))
+                    )
+                    file_id, offset = cursor.lastrowid, 0
+                else:
+                    file_id, offset = row
+                    if offset > path.stat().st_size:
+                        # 文件被截断,重新索引
+                        self.conn.execute("DELETE FROM log_entries WHERE file_id = ?", (file_id,))
+                        offset = 0
+                seen_ids.add(file_id)
+                added += self._index_file(file_id, path, offset)
+
+            # 清理已删除文件的索引
+            for (file_id,) in self.conn.execute("SELECT id FROM log_files").fetchall():
+                if file_id not in seen_ids:
+                    self.conn.execute("DELETE FROM log_entries WHERE file_id = ?", (file_id,))
+                    self.conn.execute("DELETE FROM log_files WHERE id = ?", (file_id,))
+        return added
+
+    def query(
+        self,
+        npc: Optional[str] = None,
+        player: Optional[str] = None,
+        event: Optional[str] = None,
+        level: Optional[str] = None,
+        min_latency: Optional[float] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """按字段过滤日志,返回完整的日志记录 (按时间顺序,最多limit条最新记录)"""
+        conditions, params = [], []
+        for column, value in (("npc", npc), ("player", player), ("event", event), ("level", level)):
+            if value is not None:
+                conditions.append(f"e.{column} = ?")
+                params.append(value)
+        if min_latency is not None:
+            conditions.append("e.latency_ms >= ?")
+            params.append(min_latency)
+        if since is not None:
+            conditions.append("e.ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("e.ts < ?")
+            params.append(until)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(
+            f"""SELECT f.path, e.offset FROM log_entries e
+                JOIN log_files f ON f.id = e.file_id
+                {where}
+                ORDER BY e.ts DESC
+                LIMIT ?""",
+            params + [limit]
+        ).fetchall()
+
+        records = []
+        handles = {}
+        try:
+            for path, offset in reversed(rows):
+                f = handles.get(path)
+                if f is None:
+                    f = handles[path] = open(path, "rb")
+                f.seek(offset)
+                records.append(json.loads(f.readline().decode("utf-8")))
+        finally:
+            for f in handles.values():
+                f.close()
+        return records
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[str]:
+        """文件首行的哈希,首行包含毫秒级时间戳,可唯一标识一个日志文件"""
+        try:
+            with open(path, "rb") as f:
+                first_line = f.readline()
+        except OSError:
+            return None
+        if not first_line.endswith(b"\n"):
+            return None
+        return hashlib.sha1(first_line).hexdigest()
+
+    def _index_file(self, file_id: int, path: Path, offset: int) -> int:
+        entries = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                # 只索引完整的行,正在写入的行留到下次
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                    entries.append((file_id, offset) + tuple(record.get(key) for key in _INDEXED_FIELDS))
+                except ValueError:
+                    pass
+                offset += len(line)
+
+        self.conn.executemany(
+            f"""INSERT OR REPLACE INTO log_entries (file_id, offset, {', '.join(_INDEXED_FIELDS)})
+                VALUES ({', '.join('?' * (len(_INDEXED_FIELDS) + 2))})""",
+            entries
+        )
+        self.conn.execute("UPDATE log_files SET path = ?, indexed_offset = ? WHERE id = ?", (str(path), offset, file_id))
+        return len(entries)
+
+
+def tail_log_file(interval=1):
+    """实时查看日志 (类似tail -f,跨天时自动切换到新文件)"""
 
-def tail_log_file(filename, interval=1):
-    """实时查看日志文件 (类似tail -f)"""
-    
     print("\n" + "="*60)
     print(f"📝 实时查看对话日志")
-    print(f"📂 日志文件: {filename}")
+    print(f"📂 日志目录: {LOGS_DIR}")
     print("="*60)
     print("\n按 Ctrl+C 停止查看\n")
-    
-    # 如果文件不存在,等待创建
-    while not filename.exists():
-        print(f"⏳ 等待日志文件创建: {filename}")
-        time.sleep(interval)
-    
-    # 打开文件
-    with open(filename, 'r', encoding='utf-8') as f:
-        # 移动到文件末尾
-        f.seek(0, 2)
-        
-        try:
-            while True:
-                line = f.readline()
-                if line:
-                    print(line, end='')
-                else:
+
+    filename, f = None, None
+    try:
+        while True:
+            current = today_log_file()
+            if current != filename or f is None:
+                if current.exists():
+                    if f is not None:
+                        f.close()
+                    f = open(current, "r", encoding="utf-8")
+                    # 首次打开时跳到文件末尾,跨天后的新文件从头读取
+                    if filename is None:
+                        f.seek(0, 2)
+                    filename = current
+                    print(f"📂 日志文件: {filename}")
+                elif filename is None:
+                    print(f"⏳ 等待日志文件创建: {current}")
                     time.sleep(interval)
-        except KeyboardInterrupt:
-            print("\n\n✅ 停止查看日志")
+                    continue
+
+            line = f.readline() if f is not None else ""
+            if line:
+                print(format_record(line))
+            else:
+                if f is not None and filename.exists() and os.fstat(f.fileno()).st_ino != filename.stat().st_ino:
+                    # 文件按大小轮转,旧文件已改名,重新打开新文件
+                    f.close()
+                    f = open(filename, "r", encoding="utf-8")
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n\n✅ 停止查看日志")
+    finally:
+        if f is not None:
+            f.close()
 
 def view_full_log(filename):
     """查看完整日志"""
-    
+
     print("\n" + "="*60)
     print(f"📝 查看完整对话日志")
     print(f"📂 日志文件: {filename}")
     print("="*60 + "\n")
-    
+
     if not filename.exists():
         print(f"❌ 日志文件不存在: {filename}")
         return
-    
+
     with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        print(content)
-    
+        for line in f:
+            print(format_record(line))
+
     print("\n" + "="*60)
     print("✅ 日志查看完成")
     print("="*60 + "\n")
 
 def list_log_files():
     """列出所有日志文件"""
-    
+
     print("\n" + "="*60)
     print(f"📂 日志文件列表")
     print(f"📁 目录: {LOGS_DIR}")
     print("="*60 + "\n")
-    
+
     if not LOGS_DIR.exists():
         print("❌ 日志目录不存在")
         return
-    
-    log_files = sorted(LOGS_DIR.glob("dialogue_*.log"), reverse=True)
-    
-    if not log_files:
+
+    files = log_files()
+
+    if not files:
         print("📭 暂无日志文件")
         return
-    
-    for i, log_file in enumerate(log_files, 1):
+
+    for i, log_file in enumerate(files, 1):
         size = log_file.stat().st_size
         size_kb = size / 1024
         mtime = datetime.fromtimestamp(log_file.stat().st_mtime)
@@ -86,28 +305,68 @@ def list_log_files():
         print(f"   修改时间: {mtime.strftime('%Y-%m-%d %H:%M:%S')}")
         print()
 
+def query_logs(args):
+    """按字段过滤日志"""
+    index = LogIndex()
+    try:
+        added = index.refresh()
+        records = index.query(
+            npc=args.npc,
+            player=args.player,
+            event=args.event,
+            level=args.level,
+            min_latency=args.min_latency,
+            since=args.since,
+            until=args.until,
+            limit=args.limit
+        )
+    finally:
+        index.close()
+
+    if args.json:
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+        return
+
+    print(f"🔎 新索引{added}条日志,匹配{len(records)}条\n")
+    for record in records:
+        details = [
+            f"{key}={record[key]}"
+            for key in ("npc", "player", "latency_ms", "prompt_tokens", "completion_tokens", "affinity_delta")
+            if record.get(key) is not None
+        ]
+        print(f"{record['ts'][:19]} [{record.get('event')}] {record.get('message', '')}")
+        if details:
+            print(f"    {' '.join(details)}")
+
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
-        
-        if command == "tail":
-            # 实时查看
-            tail_log_file(LOG_FILE)
-        elif command == "view":
-            # 查看完整日志
-            view_full_log(LOG_FILE)
-        elif command == "list":
-            # 列出所有日志
-            list_log_files()
-        else:
-            print(f"❌ 未知命令: {command}")
-            print("\n使用方法:")
-            print("  python view_logs.py tail   # 实时查看日志")
-            print("  python view_logs.py view   # 查看完整日志")
-            print("  python view_logs.py list   # 列出所有日志文件")
+    parser = argparse.ArgumentParser(description="查看对话日志")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("tail", help="实时查看日志 (默认)")
+    view_parser = subparsers.add_parser("view", help="查看完整日志")
+    view_parser.add_argument("--date", help="日期 YYYY-MM-DD,默认今天")
+    subparsers.add_parser("list", help="列出所有日志文件")
+    query_parser = subparsers.add_parser("query", help="按字段过滤日志 (使用索引)")
+    query_parser.add_argument("--npc", help="NPC名称")
+    query_parser.add_argument("--player", help="玩家ID")
+    query_parser.add_argument("--event", help="事件类型,如 dialogue_end / affinity_change / error")
+    query_parser.add_argument("--level", help="日志级别,如 ERROR")
+    query_parser.add_argument("--min-latency", type=float, help="最小对话耗时(毫秒)")
+    query_parser.add_argument("--since", help="起始时间 (ISO格式,如 2024-01-01 或 2024-01-01T12:00)")
+    query_parser.add_argument("--until", help="结束时间 (ISO格式)")
+    query_parser.add_argument("--limit", type=int, default=50, help="最多显示的条数")
+    query_parser.add_argument("--json", action="store_true", help="输出原始JSON行")
+    args = parser.parse_args()
+
+    if args.command == "view":
+        # 查看完整日志
+        view_full_log(LOGS_DIR / f"dialogue_{args.date}.jsonl" if args.date else today_log_file())
+    elif args.command == "list":
+        # 列出所有日志
+        list_log_files()
+    elif args.command == "query":
+        # 按字段过滤
+        query_logs(args)
     else:
         # 默认实时查看
-        tail_log_file(LOG_FILE)
-
+        tail_log_file()
@@ -79,16 +79,20 @@ func _on_chat_request_completed(_result: int, response_code: int, _headers: Pack
 		chat_error.emit("对话失败")
 
 # ==================== NPC状态API ====================
-func get_npc_status() -> void:
-	"""获取NPC状态"""
+func get_npc_status(visible_npcs: Array = []) -> void:
+	"""获取NPC状态,visible_npcs为当前屏幕内的NPC,服务端会优先为它们生成新对话"""
 	# 检查是否正在处理请求
 	if http_status.get_http_client_status() != HTTPClient.STATUS_DISCONNECTED:
 		print("[WARN] NPC状态请求正在处理中,跳过本次请求")
 		return
 
-	print("[API] GET /npcs/status")
+	var url = Config.API_NPC_STATUS
+	if not visible_npcs.is_empty():
+		url += "?npcs=" + ",".join(PackedStringArray(visible_npcs)).uri_encode()
 
-	var error = http_status.request(Config.API_NPC_STATUS)
+	print("[API] GET /npcs/status ", visible_npcs)
+
+	var error = http_status.request(url)
 
 	if error != OK:
 		print("[ERROR] 获取NPC状态失败: ", error)
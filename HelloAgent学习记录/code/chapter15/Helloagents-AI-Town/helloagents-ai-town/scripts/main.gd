@@ -21,7 +21,7 @@ func _ready():
 		api_client.npc_status_received.connect(_on_npc_status_received)
 		
 		# 立即获取一次NPC状态
-		api_client.get_npc_status()
+		api_client.get_npc_status(get_visible_npc_names())
 	else:
 		print("[ERROR] API客户端未找到")
 
@@ -31,7 +31,7 @@ func _process(delta: float):
 	if status_update_timer >= Config.NPC_STATUS_UPDATE_INTERVAL:
 		status_update_timer = 0.0
 		if api_client:
-			api_client.get_npc_status()
+			api_client.get_npc_status(get_visible_npc_names())
 
 func _on_npc_status_received(dialogues: Dictionary):
 	"""收到NPC状态更新"""
@@ -59,3 +59,14 @@ func get_npc_node(npc_name: String) -> Node2D:
 			return npc_wang
 		_:
 			return null
+
+func get_visible_npc_names() -> Array:
+	"""返回当前在屏幕内的NPC名字"""
+	var visible_rect = get_viewport().get_visible_rect()
+	var canvas_transform = get_viewport().get_canvas_transform()
+	var names = []
+	for npc_name in Config.NPC_NAMES:
+		var npc_node = get_npc_node(npc_name)
+		if npc_node and visible_rect.has_point(canvas_transform * npc_node.global_position):
+			names.append(npc_name)
+	return names
@@ -0,0 +1,101 @@
+import argparse
+import multiprocessing
+import resource
+import time
+
+import torch
+
+from Transformer import ATTENTION_BACKENDS, MultiHeadAttention, Transformer
+
+# 对比 MultiHeadAttention 三种计算方式(naive / chunked / sdpa)在CPU上的峰值内存与延迟
+# 每个配置在独立的子进程中运行, 峰值内存 = 运行后与运行前的最大常驻内存(ru_maxrss)之差
+# 用法: python Attention_benchmark.py --lengths 1024 2048 4096 8192
+
+
+def check_equivalence(atol=1e-5):
+    """三种计算方式与原实现(naive)的结果应在数值误差范围内一致"""
+    torch.manual_seed(0)
+    batch_size, seq_len, d_model, num_heads = 2, 67, 64, 4
+
+    # 1. 单个注意力层: 带填充掩码的因果自注意力, 分块大小不整除序列长度
+    attn = MultiHeadAttention(d_model, num_heads, chunk_size=16)
+    x = torch.randn(batch_size, seq_len, d_model)
+    pad_mask = torch.ones(batch_size, 1, 1, seq_len, dtype=torch.bool)
+    pad_mask[1, ..., 50:] = False
+    with torch.no_grad():
+        expected = attn(x, x, x, pad_mask, is_causal=True)
+        for backend in ("chunked", "sdpa"):
+            attn.set_backend(backend)
+            actual = attn(x, x, x, pad_mask, is_causal=True)
+            assert torch.allclose(expected, actual, atol=atol), f"{backend} 注意力层结果与 naive 不一致"
+        attn.set_backend("naive")
+
+    # 2. 整个模型: 前向传播与K/V缓存生成
+    model = Transformer(100, 100, d_model, 2, num_heads, 128, dropout=0.0, max_len=128, attn_chunk_size=16)
+    model.eval()
+    src = torch.randint(1, 100, (batch_size, 40))
+    tgt = torch.randint(1, 100, (batch_size, seq_len))
+    src[1, 30:] = 0
+    tgt[1, 50:] = 0
+    with torch.no_grad():
+        expected_logits = model(src, tgt)
+        expected_tokens = model.generate(src, max_new_tokens=20, beam_size=3)
+        for backend in ("chunked", "sdpa"):
+            model.set_attention_backend(backend)
+            assert torch.allclose(expected_logits, model(src, tgt), atol=atol), f"{backend} 模型输出与 naive 不一致"
+            assert torch.equal(expected_tokens, model.generate(src, max_new_tokens=20, beam_size=3)), \
+                f"{backend} 生成结果与 naive 不一致"
+    print("✅ chunked / sdpa 与 naive 的结果一致")
+
+
+def max_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(backend, seq_len, args):
+    """在子进程中运行: 返回 (峰值内存增量MB, 平均延迟ms)"""
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    attn = MultiHeadAttention(args.d_model, args.num_heads, backend, args.chunk_size)
+    x = torch.randn(args.batch_size, seq_len, args.d_model)
+    pad_mask = torch.ones(args.batch_size, 1, 1, seq_len, dtype=torch.bool)
+
+    with torch.no_grad():
+        baseline = max_rss_mb()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            attn(x, x, x, pad_mask, is_causal=True)
+        elapsed = (time.perf_counter() - start) / args.repeat
+    return max_rss_mb() - baseline, elapsed * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="注意力计算方式的峰值内存与延迟基准测试")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[512, 1024, 2048, 4096, 8192], help="序列长度")
+    parser.add_argument("--backends", nargs="+", default=list(ATTENTION_BACKENDS), choices=ATTENTION_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--d-model", type=int, default=256)
+    parser.add_argument("--num-heads", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=1, help="torch 使用的CPU线程数")
+    parser.add_argument("--naive-max-len", type=int, default=4096, help="超过该长度时跳过 naive(需要 seq^2 的内存)")
+    parser.add_argument("--skip-check", action="store_true", help="跳过数值一致性检查")
+    args = parser.parse_args()
+
+    if not args.skip_check:
+        check_equivalence()
+
+    print(f"{'序列长度':>8} | {'实现':>8} | {'峰值内存(MB)':>12} | {'延迟(ms)':>10}")
+    print("-" * 50)
+    context = multiprocessing.get_context("spawn")
+    for seq_len in args.lengths:
+        for backend in args.backends:
+            if backend == "naive" and seq_len > args.naive_max_len:
+                print(f"{seq_len:>8} | {backend:>8} | {'跳过':>12} | {'-':>10}")
+                continue
+            # 每个配置使用新进程, 避免上一个配置的峰值内存影响结果
+            with context.Pool(1) as pool:
+                peak, latency = pool.apply(run_case, (backend, seq_len, args))
+            print(f"{seq_len:>8} | {backend:>8} | {peak:>12.1f} | {latency:>10.1f}")
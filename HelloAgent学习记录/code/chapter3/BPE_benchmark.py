@@ -0,0 +1,74 @@
+import argparse
+import random
+import time
+
+from BPE import get_stats, merge_vocab
+from BPE_trainer import BPETrainer
+
+# 对比 BPE.py 的朴素实现与 BPE_trainer.py 的增量实现的合并速度(merges/sec)
+# 用法: python BPE_benchmark.py --sizes 10000 100000 1000000 --merges 200
+
+
+def synthetic_word_freqs(num_words, seed=0):
+    """生成 num_words 个不同的合成单词, 词频近似服从Zipf分布"""
+    rng = random.Random(seed)
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    weights = [1.0 / (i + 1) for i in range(len(letters))]  # 常见字母出现得更多
+    word_freqs = {}
+    while len(word_freqs) < num_words:
+        length = rng.randint(3, 12)
+        word = "".join(rng.choices(letters, weights=weights, k=length))
+        if word not in word_freqs:
+            word_freqs[word] = max(1, int(10000 / (len(word_freqs) + 1)))
+    return word_freqs
+
+
+def bench_incremental(word_freqs, num_merges):
+    """增量训练器: 返回 (建索引耗时, merges/sec)"""
+    start = time.perf_counter()
+    trainer = BPETrainer(word_freqs)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merges = trainer.train(num_merges)
+    elapsed = time.perf_counter() - start
+    return build_time, len(merges) / elapsed
+
+
+def bench_naive(word_freqs, num_merges):
+    """BPE.py 中的朴素实现: 返回 merges/sec"""
+    vocab = {" ".join(list(word) + ["</w>"]): freq for word, freq in word_freqs.items()}
+    start = time.perf_counter()
+    done = 0
+    for _ in range(num_merges):
+        pairs = get_stats(vocab)
+        if not pairs:
+            break
+        best = max(pairs, key=pairs.get)
+        vocab = merge_vocab(best, vocab)
+        done += 1
+    elapsed = time.perf_counter() - start
+    return done / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BPE合并速度基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="不同单词数量")
+    parser.add_argument("--merges", type=int, default=200, help="增量实现的合并次数")
+    parser.add_argument("--naive-merges", type=int, default=20, help="朴素实现的合并次数(很慢, 只测少量)")
+    parser.add_argument("--naive-max-size", type=int, default=100_000, help="超过该单词数量时跳过朴素实现")
+    args = parser.parse_args()
+
+    print(f"{'单词数':>10} | {'建索引(s)':>10} | {'增量 merges/s':>14} | {'朴素 merges/s':>14} | {'加速比':>8}")
+    print("-" * 70)
+    for size in args.sizes:
+        word_freqs = synthetic_word_freqs(size)
+        build_time, fast = bench_incremental(word_freqs, args.merges)
+
+        if size <= args.naive_max_size:
+            slow = bench_naive(word_freqs, args.naive_merges)
+            naive_col, speedup_col = f"{slow:14.1f}", f"{fast / slow:7.1f}x"
+        else:
+            naive_col, speedup_col = f"{'跳过':>14}", f"{'-':>8}"
+
+        print(f"{size:>10} | {build_time:>10.2f} | {fast:>14.1f} | {naive_col} | {speedup_col}")
@@ -0,0 +1,240 @@
+import collections
+import heapq
+
+# BPE.py 中的 get_stats/merge_vocab 每次合并都要重新统计整个词表的词元对,
+# 并用正则改写每个词, 单次合并的代价是 O(词表大小 × 词长)。
+# 这里维护两个增量索引:
+#   pair_counts: 词元对 -> 频率
+#   pair_words:  词元对 -> 包含该词元对的词(下标)
+# 每次合并只更新受影响的词, 并用最大堆(惰性删除)选出频率最高的词元对。
+
+END_OF_WORD = "</w>"
+UNK = "<unk>"
+
+
+def iter_words(lines):
+    """把文本行流切分成单词流"""
+    for line in lines:
+        yield from line.split()
+
+
+def iter_file_lines(paths, encoding="utf-8"):
+    """逐行读取语料文件, 不会一次性把整个文件读入内存"""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open(path, encoding=encoding) as f:
+            yield from f
+
+
+def count_words(words):
+    """统计词频"""
+    return collections.Counter(words)
+
+
+class BPETrainer:
+    """带词元对频率索引的增量BPE训练器"""
+
+    def __init__(self, word_freqs):
+        """
+        word_freqs: {单词: 频率}, 单词会被切分成字符并在末尾加上 </w>
+        """
+        self.words = []   # 每个词当前的符号序列
+        self.freqs = []   # 每个词的频率
+        alphabet = set()
+        for word, freq in word_freqs.items():
+            self.words.append(list(word) + [END_OF_WORD])
+            self.freqs.append(freq)
+            alphabet.update(word)
+        self.alphabet = sorted(alphabet) + [END_OF_WORD]
+
+        self.merges = []  # 按学习顺序排列的合并规则, 下标即合并优先级(rank)
+        self.pair_counts = collections.defaultdict(int)
+        self.pair_words = collections.defaultdict(set)
+        for idx, symbols in enumerate(self.words):
+            freq = self.freqs[idx]
+            for pair in zip(symbols, symbols[1:]):
+                self.pair_counts[pair] += freq
+                self.pair_words[pair].add(idx)
+
+        self._heap = [(-count, pair) for pair, count in self.pair_counts.items()]
+        heapq.heapify(self._heap)
+
+    @classmethod
+    def from_lines(cls, lines):
+        """从文本行流(例如打开的文件)构建训练器"""
+        return cls(count_words(iter_words(lines)))
+
+    @classmethod
+    def from_files(cls, paths, encoding="utf-8"):
+        """从一个或多个语料文件流式构建训练器"""
+        return cls.from_lines(iter_file_lines(paths, encoding))
+
+    def best_pair(self):
+        """返回当前频率最高的词元对, 没有可合并的词元对时返回 None"""
+        while self._heap:
+            neg_count, pair = self._heap[0]
+            count = self.pair_counts.get(pair, 0)
+            if count <= 0:
+                heapq.heappop(self._heap)
+                continue
+            if -neg_count != count:
+                # 堆中的频率已经过期, 用当前频率重新入堆
+                heapq.heapreplace(self._heap, (-count, pair))
+                continue
+            return pair
+        return None
+
+    def merge(self, pair):
+        """合并一个词元对, 只更新包含该词元对的词"""
+        first, second = pair
+        merged = first + second
+        changed = set()
+
+        pair_counts = self.pair_counts
+        pair_words = self.pair_words
+        for idx in list(pair_words.get(pair, ())):
+            symbols = self.words[idx]
+            freq = self.freqs[idx]
+
+            # 扫描一遍, 生成合并后的符号序列
+            new_symbols = []
+            i = 0
+            n = len(symbols)
+            while i < n:
+                if i < n - 1 and symbols[i] == first and symbols[i + 1] == second:
+                    new_symbols.append(merged)
+                    i += 2
+                else:
+                    new_symbols.append(symbols[i])
+                    i += 1
+
+            # 该词对各词元对计数的变化量: 旧词元对减去, 新词元对加上
+            delta = {}
+            for p in zip(symbols, symbols[1:]):
+                delta[p] = delta.get(p, 0) - 1
+            for p in zip(new_symbols, new_symbols[1:]):
+                delta[p] = delta.get(p, 0) + 1
+
+            new_pairs = set(zip(new_symbols, new_symbols[1:]))
+            for p, d in delta.items():
+                if d:
+                    pair_counts[p] += d * freq
+                    changed.add(p)
+                if p in new_pairs:
+                    pair_words[p].add(idx)
+                else:
+                    pair_words[p].discard(idx)
+
+            self.words[idx] = new_symbols
+
+        self.pair_counts.pop(pair, None)
+        self.pair_words.pop(pair, None)
+        for p in changed:
+            count = self.pair_counts.get(p, 0)
+            if count > 0:
+                heapq.heappush(self._heap, (-count, p))
+            else:
+                self.pair_counts.pop(p, None)
+                self.pair_words.pop(p, None)
+
+        self.merges.append(pair)
+
+    def train(self, num_merges, verbose=False):
+        """执行最多 num_merges 次合并, 返回学到的合并规则"""
+        for i in range(num_merges):
+            best = self.best_pair()
+            if best is None:
+                break
+            if verbose:
+                print(f"第{i+1}次合并: {best} -> {''.join(best)} (频率 {self.pair_counts[best]})")
+            self.merge(best)
+        return self.merges
+
+    def vocab(self):
+        """返回当前词表 {以空格分隔的符号序列: 频率}, 格式与 BPE.py 相同"""
+        return {" ".join(symbols): freq for symbols, freq in zip(self.words, self.freqs)}
+
+    def tokenizer(self):
+        """用学到的合并规则构建分词器"""
+        return BPETokenizer(self.merges, self.alphabet)
+
+
+class BPETokenizer:
+    """基于合并规则优先级(rank)的BPE编码/解码"""
+
+    def __init__(self, merges, alphabet):
+        self.ranks = {pair: rank for rank, pair in enumerate(merges)}
+        self.alphabet = list(alphabet)
+
+        tokens = [UNK] + self.alphabet + ["".join(pair) for pair in merges]
+        self.token_to_id = {}
+        for token in tokens:
+            self.token_to_id.setdefault(token, len(self.token_to_id))
+        self.id_to_token = {i: t for t, i in self.token_to_id.items()}
+        self._cache = {}
+
+    def tokenize_word(self, word):
+        """按合并优先级切分单个词: 每次合并 rank 最小的相邻词元对"""
+        if word in self._cache:
+            return self._cache[word]
+
+        symbols = list(word) + [END_OF_WORD]
+        while len(symbols) > 1:
+            ranked = [(self.ranks.get(pair, float("inf")), i) for i, pair in enumerate(zip(symbols, symbols[1:]))]
+            rank, i = min(ranked)
+            if rank == float("inf"):
+                break
+            symbols[i:i + 2] = [symbols[i] + symbols[i + 1]]
+
+        self._cache[word] = symbols
+        return symbols
+
+    def tokenize(self, text):
+        """切分文本为BPE词元"""
+        return [token for word in text.split() for token in self.tokenize_word(word)]
+
+    def encode(self, text):
+        """文本 -> 词元ID列表, 训练时没见过的字符映射为 <unk>"""
+        unk_id = self.token_to_id[UNK]
+        return [self.token_to_id.get(token, unk_id) for token in self.tokenize(text)]
+
+    def decode(self, ids):
+        """词元ID列表 -> 文本"""
+        text = "".join(self.id_to_token.get(i, UNK) for i in ids)
+        return text.replace(END_OF_WORD, " ").strip()
+
+    def save(self, path):
+        """保存合并规则(每行一个以空格分隔的词元对)"""
+        merges = sorted(self.ranks, key=self.ranks.get)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("#alphabet " + " ".join(self.alphabet) + "\n")
+            for first, second in merges:
+                f.write(f"{first} {second}\n")
+
+    @classmethod
+    def load(cls, path):
+        """加载 save() 保存的合并规则"""
+        merges, alphabet = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("#alphabet "):
+                    alphabet = line[len("#alphabet "):].split(" ")
+                elif line:
+                    first, second = line.split(" ")
+                    merges.append((first, second))
+        return cls(merges, alphabet)
+
+
+if __name__ == "__main__":
+    # 与 BPE.py 相同的示例语料
+    trainer = BPETrainer({"hug": 1, "pug": 1, "pun": 1, "bun": 1})
+    trainer.train(4, verbose=True)
+    print(f"新词表: {list(trainer.vocab().keys())}")
+    print("-" * 20)
+
+    tokenizer = trainer.tokenizer()
+    ids = tokenizer.encode("hug bun pun")
+    print(f"编码: {tokenizer.tokenize('hug bun pun')} -> {ids}")
+    print(f"解码: {tokenizer.decode(ids)}")
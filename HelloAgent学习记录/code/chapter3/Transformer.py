@@ -1,25 +1,73 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import math
 import copy
 
+# 注意力计算方式:
+#   naive:   原始实现, 一次性计算完整的 (batch, heads, seq, seq) 得分矩阵
+#   chunked: 分块计算, 按查询块和键块逐块做在线 softmax, 不保存完整得分矩阵
+#   sdpa:    调用 torch.nn.functional.scaled_dot_product_attention (PyTorch 2.0+)
+ATTENTION_BACKENDS = ("naive", "chunked", "sdpa")
+
+# 按设备缓存的下三角矩阵, 避免每次前向都重新分配因果掩码
+_causal_masks = {}
+
+
+def causal_mask(q_len, k_len, device):
+    """
+    返回形状为 (q_len, k_len) 的因果掩码(bool)
+    查询与键右下对齐: 第 i 个查询位于位置 k_len - q_len + i, 只能看到不晚于它的键
+    """
+    mask = _causal_masks.get(device)
+    if mask is None or mask.size(0) < k_len:
+        size = max(k_len, 2 * mask.size(0) if mask is not None else 64)
+        mask = torch.tril(torch.ones((size, size), dtype=torch.bool, device=device))
+        _causal_masks[device] = mask
+    return mask[k_len - q_len:k_len, :k_len]
+
+
 class MultiHeadAttention(nn.Module):
     """
     多头注意力机制模块
     """
-    def __init__(self, d_model, num_heads):
+    def __init__(self, d_model, num_heads, attn_backend="naive", chunk_size=1024):
         super(MultiHeadAttention, self).__init__()
         assert d_model % num_heads == 0, "d_model 必须能被 num_heads 整除"
         
         self.d_model = d_model
         self.num_heads = num_heads
         self.d_k = d_model // num_heads
+        self.set_backend(attn_backend, chunk_size)
         
         # 定义 Q, K, V 和输出的线性变换层
         self.W_q = nn.Linear(d_model, d_model)
         self.W_k = nn.Linear(d_model, d_model)
         self.W_v = nn.Linear(d_model, d_model)
         self.W_o = nn.Linear(d_model, d_model)
+
+    def set_backend(self, attn_backend, chunk_size=None):
+        # 切换注意力计算方式, 不影响模型参数
+        if attn_backend not in ATTENTION_BACKENDS:
+            raise ValueError(f"未知的注意力计算方式: {attn_backend}, 可选 {ATTENTION_BACKENDS}")
+        if attn_backend == "sdpa" and not hasattr(F, "scaled_dot_product_attention"):
+            print("⚠️ 当前 PyTorch 不支持 scaled_dot_product_attention, 改用分块注意力")
+            attn_backend = "chunked"
+        self.attn_backend = attn_backend
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+    def attention(self, Q, K, V, mask=None, is_causal=False):
+        # 按 attn_backend 分派, 三种实现的结果在数值误差范围内一致
+        # is_causal: 额外应用因果掩码(右下对齐), 分块/sdpa 实现无需构造完整的掩码矩阵
+        if self.attn_backend == "chunked":
+            return self.chunked_attention(Q, K, V, mask, is_causal)
+        if self.attn_backend == "sdpa":
+            return self.sdpa_attention(Q, K, V, mask, is_causal)
+        if is_causal:
+            causal = causal_mask(Q.size(-2), K.size(-2), Q.device)
+            mask = causal if mask is None else (mask != 0) & causal
+        return self.scaled_dot_product_attention(Q, K, V, mask)
         
     def scaled_dot_product_attention(self, Q, K, V, mask=None):
         # 1. 计算注意力得分 (QK^T)
@@ -36,6 +84,68 @@ class MultiHeadAttention(nn.Module):
         # 4. 加权求和 (权重 * V)
         output = torch.matmul(attn_probs, V)
         return output
+
+    def chunked_attention(self, Q, K, V, mask=None, is_causal=False):
+        # 分块注意力: 每次只计算 (chunk_size, chunk_size) 的得分块,
+        # 用在线 softmax(记录每行的当前最大值与指数和)逐块累加输出,
+        # 峰值内存从 O(seq^2) 降到 O(chunk_size^2)
+        q_len, k_len = Q.size(-2), K.size(-2)
+        offset = k_len - q_len  # 因果掩码右下对齐
+        chunk = self.chunk_size
+        scale = math.sqrt(self.d_k)
+        outputs = []
+        for q_start in range(0, q_len, chunk):
+            q_end = min(q_start + chunk, q_len)
+            q = Q[..., q_start:q_end, :]
+            # 因果注意力中, 对角线右侧的键块全部被遮挡, 直接跳过
+            k_stop = min(k_len, q_end + offset) if is_causal else k_len
+            row_max = row_sum = acc = None
+            for k_start in range(0, k_stop, chunk):
+                k_end = min(k_start + chunk, k_stop)
+                scores = torch.matmul(q, K[..., k_start:k_end, :].transpose(-2, -1)) / scale
+                if mask is not None:
+                    if mask.size(-2) == 1:
+                        block_mask = mask[..., k_start:k_end]
+                    else:
+                        block_mask = mask[..., q_start:q_end, k_start:k_end]
+                    scores = scores.masked_fill(block_mask == 0, -1e9)
+                if is_causal and k_end > q_start + offset + 1:
+                    # 与对角线相交的块: 只为这一块构造因果掩码
+                    q_pos = torch.arange(q_start + offset, q_end + offset, device=Q.device).unsqueeze(1)
+                    k_pos = torch.arange(k_start, k_end, device=Q.device).unsqueeze(0)
+                    scores = scores.masked_fill(k_pos > q_pos, -1e9)
+
+                block_max = scores.amax(dim=-1, keepdim=True)
+                if row_max is None:
+                    row_max = block_max
+                    probs = torch.exp(scores - row_max)
+                    row_sum = probs.sum(dim=-1, keepdim=True)
+                    acc = torch.matmul(probs, V[..., k_start:k_end, :])
+                else:
+                    new_max = torch.maximum(row_max, block_max)
+                    correction = torch.exp(row_max - new_max)
+                    probs = torch.exp(scores - new_max)
+                    row_sum = row_sum * correction + probs.sum(dim=-1, keepdim=True)
+                    acc = acc * correction + torch.matmul(probs, V[..., k_start:k_end, :])
+                    row_max = new_max
+            outputs.append(acc / row_sum)
+        return torch.cat(outputs, dim=-2)
+
+    def sdpa_attention(self, Q, K, V, mask=None, is_causal=False):
+        # 调用 PyTorch 的融合注意力实现; 没有填充时只传 is_causal, 不构造掩码矩阵
+        q_len, k_len = Q.size(-2), K.size(-2)
+        if mask is not None and bool(mask.all()):
+            mask = None
+        if is_causal and q_len > 1:
+            if mask is None and q_len == k_len:
+                return F.scaled_dot_product_attention(Q, K, V, is_causal=True)
+            causal = causal_mask(q_len, k_len, Q.device)
+            mask = causal if mask is None else (mask != 0) & causal
+        if mask is None:
+            return F.scaled_dot_product_attention(Q, K, V)
+        # 与原实现一样用 -1e9 而不是 -inf, 全部被遮挡的行不会产生 NaN
+        attn_bias = torch.zeros(mask.shape, dtype=Q.dtype, device=Q.device).masked_fill(mask == 0, -1e9)
+        return F.scaled_dot_product_attention(Q, K, V, attn_mask=attn_bias)
         
     def split_heads(self, x):
         # 将输入 x 的形状从 (batch_size, seq_length, d_model)
@@ -49,14 +159,26 @@ class MultiHeadAttention(nn.Module):
         batch_size, num_heads, seq_length, d_k = x.size()
         return x.transpose(1, 2).contiguous().view(batch_size, seq_length, self.d_model)
         
-    def forward(self, Q, K, V, mask=None):
+    def forward(self, Q, K, V, mask=None, cache=None, static_kv=False, is_causal=False):
+        # cache: 增量解码时使用的 K/V 缓存字典 {"k": ..., "v": ...}, 会被原地更新
+        # static_kv: K/V 来自不变的输入(交叉注意力中的编码器输出), 只需计算一次
         # 1. 对 Q, K, V 进行线性变换
         Q = self.split_heads(self.W_q(Q))
-        K = self.split_heads(self.W_k(K))
-        V = self.split_heads(self.W_v(V))
+        if static_kv and cache is not None and "k" in cache:
+            # 交叉注意力: 直接复用第一步计算好的编码器 K/V
+            K, V = cache["k"], cache["v"]
+        else:
+            K = self.split_heads(self.W_k(K))
+            V = self.split_heads(self.W_v(V))
+            if cache is not None:
+                if not static_kv and "k" in cache:
+                    # 自注意力: 只为新位置计算 K/V, 拼接到历史 K/V 之后
+                    K = torch.cat([cache["k"], K], dim=2)
+                    V = torch.cat([cache["v"], V], dim=2)
+                cache["k"], cache["v"] = K, V
         
         # 2. 计算缩放点积注意力
-        attn_output = self.scaled_dot_product_attention(Q, K, V, mask)
+        attn_output = self.attention(Q, K, V, mask, is_causal)
         
         # 3. 合并多头输出并进行最终的线性变换
         output = self.W_o(self.combine_heads(attn_output))
@@ -104,19 +226,19 @@ class PositionalEncoding(nn.Module):
         # 将 pe 注册为 buffer，这样它就不会被视为模型参数，但会随模型移动（例如 to(device)）
         self.register_buffer('pe', pe.unsqueeze(0))
 
-    def forward(self, x: torch.Tensor) -> torch.Tensor:
-        # x.size(1) 是当前输入的序列长度
+    def forward(self, x: torch.Tensor, start_pos: int = 0) -> torch.Tensor:
+        # x.size(1) 是当前输入的序列长度, start_pos 是第一个位置的下标(增量解码时非0)
         # 将位置编码加到输入向量上
-        x = x + self.pe[:, :x.size(1)]
+        x = x + self.pe[:, start_pos:start_pos + x.size(1)]
         return self.dropout(x)
 
 class EncoderLayer(nn.Module):
     """
     编码器核心层
     """
-    def __init__(self, d_model, num_heads, d_ff, dropout):
+    def __init__(self, d_model, num_heads, d_ff, dropout, attn_backend="naive", chunk_size=1024):
         super(EncoderLayer, self).__init__()
-        self.self_attn = MultiHeadAttention(d_model, num_heads)
+        self.self_attn = MultiHeadAttention(d_model, num_heads, attn_backend, chunk_size)
         self.feed_forward = PositionWiseFeedForward(d_model, d_ff, dropout)
         self.norm1 = nn.LayerNorm(d_model)
         self.norm2 = nn.LayerNorm(d_model)
@@ -137,23 +259,31 @@ class DecoderLayer(nn.Module):
     """
     解码器核心层
     """
-    def __init__(self, d_model, num_heads, d_ff, dropout):
+    def __init__(self, d_model, num_heads, d_ff, dropout, attn_backend="naive", chunk_size=1024):
         super(DecoderLayer, self).__init__()
-        self.self_attn = MultiHeadAttention(d_model, num_heads)
-        self.cross_attn = MultiHeadAttention(d_model, num_heads)
+        self.self_attn = MultiHeadAttention(d_model, num_heads, attn_backend, chunk_size)
+        self.cross_attn = MultiHeadAttention(d_model, num_heads, attn_backend, chunk_size)
         self.feed_forward = PositionWiseFeedForward(d_model, d_ff, dropout)
         self.norm1 = nn.LayerNorm(d_model)
         self.norm2 = nn.LayerNorm(d_model)
         self.norm3 = nn.LayerNorm(d_model)
         self.dropout = nn.Dropout(dropout)
         
-    def forward(self, x, encoder_output, src_mask, tgt_mask):
+    def forward(self, x, encoder_output, src_mask, tgt_mask, cache=None, is_causal=False):
+        # cache: 该层的缓存 {"self": {...}, "cross": {...}}, 为 None 时不使用缓存
+        # is_causal: 自注意力额外应用因果掩码, 此时 tgt_mask 只需包含填充掩码
+        self_cache = cross_cache = None
+        if cache is not None:
+            self_cache = cache.setdefault("self", {})
+            cross_cache = cache.setdefault("cross", {})
+        
         # 1. 掩码多头自注意力 (对自己)
-        attn_output = self.self_attn(x, x, x, tgt_mask)
+        attn_output = self.self_attn(x, x, x, tgt_mask, cache=self_cache, is_causal=is_causal)
         x = self.norm1(x + self.dropout(attn_output))
         
         # 2. 交叉注意力 (对编码器输出)
-        cross_attn_output = self.cross_attn(x, encoder_output, encoder_output, src_mask)
+        cross_attn_output = self.cross_attn(x, encoder_output, encoder_output, src_mask,
+                                            cache=cross_cache, static_kv=True)
         x = self.norm2(x + self.dropout(cross_attn_output))
         
         # 3. 前馈网络
@@ -163,11 +293,13 @@ class DecoderLayer(nn.Module):
         return x
 
 class Encoder(nn.Module):
-    def __init__(self, vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len):
+    def __init__(self, vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len,
+                 attn_backend="naive", chunk_size=1024):
         super(Encoder, self).__init__()
         self.embedding = nn.Embedding(vocab_size, d_model)
         self.pos_encoder = PositionalEncoding(d_model, dropout, max_len)
-        self.layers = nn.ModuleList([EncoderLayer(d_model, num_heads, d_ff, dropout) for _ in range(num_layers)])
+        self.layers = nn.ModuleList([EncoderLayer(d_model, num_heads, d_ff, dropout, attn_backend, chunk_size)
+                                     for _ in range(num_layers)])
         self.norm = nn.LayerNorm(d_model)
 
     def forward(self, x, mask):
@@ -178,26 +310,41 @@ class Encoder(nn.Module):
         return self.norm(x)
 
 class Decoder(nn.Module):
-    def __init__(self, vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len):
+    def __init__(self, vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len,
+                 attn_backend="naive", chunk_size=1024):
         super(Decoder, self).__init__()
         self.embedding = nn.Embedding(vocab_size, d_model)
         self.pos_encoder = PositionalEncoding(d_model, dropout, max_len)
-        self.layers = nn.ModuleList([DecoderLayer(d_model, num_heads, d_ff, dropout) for _ in range(num_layers)])
+        self.layers = nn.ModuleList([DecoderLayer(d_model, num_heads, d_ff, dropout, attn_backend, chunk_size)
+                                     for _ in range(num_layers)])
         self.norm = nn.LayerNorm(d_model)
 
-    def forward(self, x, encoder_output, src_mask, tgt_mask):
+    def forward(self, x, encoder_output, src_mask, tgt_mask, caches=None, start_pos=0, is_causal=False):
+        # caches: 每层一个缓存字典的列表; start_pos: x 中第一个词元的位置
         x = self.embedding(x)
-        x = self.pos_encoder(x)
-        for layer in self.layers:
-            x = layer(x, encoder_output, src_mask, tgt_mask)
+        x = self.pos_encoder(x, start_pos)
+        for i, layer in enumerate(self.layers):
+            cache = caches[i] if caches is not None else None
+            x = layer(x, encoder_output, src_mask, tgt_mask, cache, is_causal)
         return self.norm(x)
 
 class Transformer(nn.Module):
-    def __init__(self, src_vocab_size, tgt_vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len=5000):
+    def __init__(self, src_vocab_size, tgt_vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len=5000,
+                 attn_backend="naive", attn_chunk_size=1024):
         super(Transformer, self).__init__()
-        self.encoder = Encoder(src_vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len)
-        self.decoder = Decoder(tgt_vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len)
+        self.attn_backend = attn_backend
+        self.encoder = Encoder(src_vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len,
+                               attn_backend, attn_chunk_size)
+        self.decoder = Decoder(tgt_vocab_size, d_model, num_layers, num_heads, d_ff, dropout, max_len,
+                               attn_backend, attn_chunk_size)
         self.final_linear = nn.Linear(d_model, tgt_vocab_size)
+
+    def set_attention_backend(self, attn_backend, chunk_size=None):
+        # 切换所有注意力层的计算方式 ("naive" / "chunked" / "sdpa")
+        for module in self.modules():
+            if isinstance(module, MultiHeadAttention):
+                module.set_backend(attn_backend, chunk_size)
+        self.attn_backend = attn_backend
     
     def generate_mask(self, src, tgt):
         # src_mask: (batch_size, 1, 1, src_len)
@@ -206,21 +353,164 @@ class Transformer(nn.Module):
         # tgt_mask: (batch_size, 1, tgt_len, tgt_len)
         tgt_pad_mask = (tgt != 0).unsqueeze(1).unsqueeze(2) # (batch_size, 1, 1, tgt_len)
         tgt_len = tgt.size(1)
-        # 下三角矩阵，用于防止看到未来的 token
-        tgt_sub_mask = torch.tril(torch.ones((tgt_len, tgt_len), device=src.device)).bool() # (tgt_len, tgt_len)
+        # 下三角矩阵，用于防止看到未来的 token (取自缓存, 不再每次重新分配)
+        tgt_sub_mask = causal_mask(tgt_len, tgt_len, tgt.device) # (tgt_len, tgt_len)
         tgt_mask = tgt_pad_mask & tgt_sub_mask
         
         return src_mask, tgt_mask
+
+    def decoder_mask(self, tgt):
+        # 返回 (tgt_mask, is_causal)
+        # naive 使用完整的 (batch_size, 1, tgt_len, tgt_len) 掩码;
+        # 其他实现只传填充掩码, 因果关系在注意力内部处理, 不构造 tgt_len^2 的掩码
+        tgt_pad_mask = (tgt != 0).unsqueeze(1).unsqueeze(2)
+        if self.attn_backend == "naive":
+            return tgt_pad_mask & causal_mask(tgt.size(1), tgt.size(1), tgt.device), False
+        return tgt_pad_mask, True
     
     def forward(self, src, tgt):
-        src_mask, tgt_mask = self.generate_mask(src, tgt)
+        src_mask = (src != 0).unsqueeze(1).unsqueeze(2)
+        tgt_mask, is_causal = self.decoder_mask(tgt)
         
         encoder_output = self.encoder(src, src_mask)
-        decoder_output = self.decoder(tgt, encoder_output, src_mask, tgt_mask)
+        decoder_output = self.decoder(tgt, encoder_output, src_mask, tgt_mask, is_causal=is_causal)
         
         output = self.final_linear(decoder_output)
         return output
 
+    # --- 自回归生成 ---
+    # 不使用缓存时, 每生成一个词元都要把整个已生成序列重新送入解码器,
+    # 并重新计算交叉注意力中编码器输出的 K/V。
+    # 使用缓存时, 每层自注意力只为新词元计算 K/V 并拼接到缓存中,
+    # 交叉注意力的 K/V 在第一步计算一次后一直复用。
+    # 约定: 0 为填充(pad)词元, bos_id 不能为 0。
+
+    def encode(self, src):
+        # 编码源序列, 返回 (encoder_output, src_mask)
+        src_mask = (src != 0).unsqueeze(1).unsqueeze(2)
+        return self.encoder(src, src_mask), src_mask
+
+    def decode_step(self, tokens, encoder_output, src_mask, caches=None):
+        """
+        计算下一个词元的 logits, 形状 (batch_size, tgt_vocab_size)
+        tokens: 目前已生成的完整序列 (batch_size, cur_len)
+        caches: 为 None 时重新计算整个序列; 否则只把最后一个词元送入解码器
+        """
+        if caches is None:
+            tgt_mask, is_causal = self.decoder_mask(tokens)
+            decoder_output = self.decoder(tokens, encoder_output, src_mask, tgt_mask, is_causal=is_causal)
+        else:
+            # 新词元可以看到所有历史词元, 不需要因果掩码
+            decoder_output = self.decoder(tokens[:, -1:], encoder_output, src_mask, None,
+                                          caches=caches, start_pos=tokens.size(1) - 1)
+        return self.final_linear(decoder_output[:, -1])
+
+    def init_cache(self):
+        # 每个解码器层一个缓存字典
+        return [{} for _ in self.decoder.layers]
+
+    @staticmethod
+    def reorder_cache(caches, index):
+        # 束搜索中按选中的束重新排列自注意力缓存
+        # 同一样本的各个束共享编码器输出, 交叉注意力缓存不需要重排
+        for cache in caches:
+            self_cache = cache.get("self")
+            if self_cache:
+                self_cache["k"] = self_cache["k"].index_select(0, index)
+                self_cache["v"] = self_cache["v"].index_select(0, index)
+
+    @torch.no_grad()
+    def generate(self, src, max_new_tokens, bos_id=1, eos_id=2, beam_size=1,
+                 use_cache=True, length_penalty=1.0):
+        """
+        自回归生成目标序列 (调用前请先 model.eval() 关闭 dropout)
+        src: 源序列 (batch_size, src_len), 以 0 填充
+        max_new_tokens: 最多生成的词元数
+        eos_id: 结束词元, 为 None 时一直生成到 max_new_tokens
+        beam_size: 1 为贪心搜索, 大于 1 为束搜索
+        use_cache: 是否使用 K/V 缓存
+        length_penalty: 束搜索结束时按 得分 / 长度^length_penalty 选择最优序列
+        返回: (batch_size, 1 + 生成长度), 以 bos_id 开头, 结束后的位置用 0 填充
+        """
+        if bos_id == 0:
+            raise ValueError("bos_id 不能与填充词元 0 相同")
+        max_positions = self.decoder.pos_encoder.pe.size(1)
+        if max_new_tokens + 1 > max_positions:
+            raise ValueError(f"生成长度超出位置编码的最大长度 {max_positions}")
+
+        encoder_output, src_mask = self.encode(src)
+        if beam_size == 1:
+            return self._greedy_search(encoder_output, src_mask, max_new_tokens, bos_id, eos_id, use_cache)
+        return self._beam_search(encoder_output, src_mask, max_new_tokens, bos_id, eos_id,
+                                 beam_size, use_cache, length_penalty)
+
+    def _greedy_search(self, encoder_output, src_mask, max_new_tokens, bos_id, eos_id, use_cache):
+        batch_size = encoder_output.size(0)
+        device = encoder_output.device
+        tokens = torch.full((batch_size, 1), bos_id, dtype=torch.long, device=device)
+        finished = torch.zeros(batch_size, dtype=torch.bool, device=device)
+        caches = self.init_cache() if use_cache else None
+
+        for _ in range(max_new_tokens):
+            logits = self.decode_step(tokens, encoder_output, src_mask, caches)
+            next_token = logits.argmax(dim=-1)
+            # 已结束的序列继续填充 0
+            next_token = next_token.masked_fill(finished, 0)
+            tokens = torch.cat([tokens, next_token.unsqueeze(1)], dim=1)
+            if eos_id is not None:
+                finished |= next_token == eos_id
+                if finished.all():
+                    break
+        return tokens
+
+    def _beam_search(self, encoder_output, src_mask, max_new_tokens, bos_id, eos_id,
+                     beam_size, use_cache, length_penalty):
+        batch_size = encoder_output.size(0)
+        device = encoder_output.device
+
+        # 每个样本复制 beam_size 份: (batch_size * beam_size, ...)
+        encoder_output = encoder_output.repeat_interleave(beam_size, dim=0)
+        src_mask = src_mask.repeat_interleave(beam_size, dim=0)
+
+        tokens = torch.full((batch_size * beam_size, 1), bos_id, dtype=torch.long, device=device)
+        finished = torch.zeros(batch_size * beam_size, dtype=torch.bool, device=device)
+        lengths = torch.zeros(batch_size * beam_size, device=device)
+        # 第一步所有束相同, 只保留第 0 个束, 避免选出重复的候选
+        scores = torch.full((batch_size, beam_size), float("-inf"), device=device)
+        scores[:, 0] = 0.0
+        scores = scores.view(-1)
+        batch_offset = (torch.arange(batch_size, device=device) * beam_size).unsqueeze(1)
+        caches = self.init_cache() if use_cache else None
+
+        for _ in range(max_new_tokens):
+            logits = self.decode_step(tokens, encoder_output, src_mask, caches)
+            log_probs = torch.log_softmax(logits, dim=-1)
+            vocab_size = log_probs.size(-1)
+            # 已结束的束只能以概率 1 继续填充 0, 得分保持不变
+            log_probs[finished] = float("-inf")
+            log_probs[finished, 0] = 0.0
+
+            candidates = (scores.unsqueeze(1) + log_probs).view(batch_size, beam_size * vocab_size)
+            top_scores, top_index = candidates.topk(beam_size, dim=-1)
+            beam_index = (top_index // vocab_size + batch_offset).view(-1)
+            next_token = (top_index % vocab_size).view(-1)
+
+            scores = top_scores.view(-1)
+            tokens = torch.cat([tokens.index_select(0, beam_index), next_token.unsqueeze(1)], dim=1)
+            finished = finished.index_select(0, beam_index)
+            lengths = lengths.index_select(0, beam_index) + (~finished).float()
+            if caches is not None:
+                self.reorder_cache(caches, beam_index)
+            if eos_id is not None:
+                finished |= next_token == eos_id
+                if finished.all():
+                    break
+
+        # 按长度归一化后的得分选出每个样本的最优束
+        normalized = (scores / lengths.clamp(min=1) ** length_penalty).view(batch_size, beam_size)
+        best = normalized.argmax(dim=-1) + batch_offset.squeeze(1)
+        return tokens.index_select(0, best)
+
 # --- 演示如何使用模型 ---
 if __name__ == "__main__":
     # 1. 定义超参数
@@ -246,4 +536,11 @@ if __name__ == "__main__":
     
     # 5. 打印输出形状
     print("模型输出的形状:", output.shape)
-    # 预期输出: torch.Size([2, 12, 5000]) -> (batch_size, tgt_seq_len, tgt_vocab_size)
\ No newline at end of file
+    # 预期输出: torch.Size([2, 12, 5000]) -> (batch_size, tgt_seq_len, tgt_vocab_size)
+
+    # 6. 自回归生成 (贪心搜索 与 束搜索)
+    model.eval()
+    greedy = model.generate(src, max_new_tokens=20)
+    beam = model.generate(src, max_new_tokens=20, beam_size=4)
+    print("贪心搜索输出的形状:", greedy.shape)
+    print("束搜索输出的形状:", beam.shape)
\ No newline at end of file
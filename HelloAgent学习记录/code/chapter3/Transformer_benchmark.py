@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import torch
+
+from Transformer import Transformer
+
+# 对比 Transformer.generate 使用/不使用 K/V 缓存时的生成速度(tokens/sec, CPU)
+# 用法: python Transformer_benchmark.py --lengths 64 128 256 512 1024
+
+
+def build_model(args):
+    torch.manual_seed(0)
+    model = Transformer(args.vocab_size, args.vocab_size, args.d_model, args.num_layers,
+                        args.num_heads, args.d_ff, dropout=0.0, max_len=max(args.lengths) + 1)
+    model.eval()
+    return model
+
+
+def bench_generate(model, src, length, use_cache, beam_size=1):
+    """生成 length 个词元(不提前结束), 返回 (输出, tokens/sec)"""
+    start = time.perf_counter()
+    output = model.generate(src, max_new_tokens=length, eos_id=None, beam_size=beam_size, use_cache=use_cache)
+    elapsed = time.perf_counter() - start
+    return output, src.size(0) * length / elapsed
+
+
+def check_equivalence(model, src):
+    """缓存与不缓存的生成结果应完全一致"""
+    for beam_size in (1, 4):
+        cached = model.generate(src, max_new_tokens=16, beam_size=beam_size, use_cache=True)
+        uncached = model.generate(src, max_new_tokens=16, beam_size=beam_size, use_cache=False)
+        assert torch.equal(cached, uncached), f"beam_size={beam_size} 时缓存与不缓存的结果不一致"
+    print("✅ 缓存与不缓存的生成结果一致 (贪心搜索 / 束搜索)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transformer K/V缓存生成速度基准测试")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[64, 128, 256, 512, 1024], help="生成长度")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--src-len", type=int, default=32)
+    parser.add_argument("--vocab-size", type=int, default=1000)
+    parser.add_argument("--d-model", type=int, default=256)
+    parser.add_argument("--num-layers", type=int, default=3)
+    parser.add_argument("--num-heads", type=int, default=4)
+    parser.add_argument("--d-ff", type=int, default=1024)
+    parser.add_argument("--no-cache-max-len", type=int, default=512, help="超过该长度时跳过不缓存的实现(很慢)")
+    parser.add_argument("--threads", type=int, default=None, help="torch 使用的CPU线程数")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model = build_model(args)
+    src = torch.randint(1, args.vocab_size, (args.batch_size, args.src_len))
+    # 模拟填充过的批次: 第二个样本较短
+    if args.batch_size > 1:
+        src[1, args.src_len // 2:] = 0
+
+    check_equivalence(model, src)
+
+    print(f"{'生成长度':>8} | {'缓存 tok/s':>12} | {'不缓存 tok/s':>12} | {'加速比':>8}")
+    print("-" * 52)
+    for length in args.lengths:
+        _, fast = bench_generate(model, src, length, use_cache=True)
+        if length <= args.no_cache_max_len:
+            _, slow = bench_generate(model, src, length, use_cache=False)
+            slow_col, speedup_col = f"{slow:12.1f}", f"{fast / slow:7.1f}x"
+        else:
+            slow_col, speedup_col = f"{'跳过':>12}", f"{'-':>8}"
+        print(f"{length:>8} | {fast:>12.1f} | {slow_col} | {speedup_col}")